@@ -0,0 +1,21 @@
+import sys
+from timeit import repeat
+
+from terra.map.maputils import generate_bitmap_from_simplex_noise
+
+# Benchmark simplex map generation across a range of map sizes.
+# Run from the project root with: python -m benchmarks.mapgeneration [repeats]
+map_sizes = [(16, 16), (32, 32), (64, 64), (128, 128), (256, 256), (512, 512)]
+
+
+def benchmark_map_generation(repeats=5):
+    print("{:>10} {:>12} {:>14}".format("size", "best (ms)", "us per tile"))
+    for width, height in map_sizes:
+        best = min(repeat(lambda: generate_bitmap_from_simplex_noise(width, height, mirror_x=True, seed=1),
+                          number=1, repeat=repeats))
+        print("{:>10} {:>12.2f} {:>14.3f}".format("{}x{}".format(width, height), best * 1000,
+                                                  best * 1000000 / (width * height)))
+
+
+if __name__ == "__main__":
+    benchmark_map_generation(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,108 @@
+import sys
+from random import Random
+from timeit import default_timer
+
+from terra.ai.clustergraph import get_cluster_graph
+from terra.ai.distancefield import compute_distance_fields
+from terra.ai.pathfinder import navigate, navigate_all
+from terra.map.mapmanager import MapManager
+from terra.map.maputils import generate_bitmap_from_simplex_noise
+from terra.piece.movementtype import MovementType
+
+# Benchmark point to point pathfinding on generated maps, reporting how many tiles each search expands.
+# Breadth-first expansions (every tile closer to the start than the goal) are shown for comparison.
+# Run from the project root with: python -m benchmarks.pathfinding [searches per map]
+map_sizes = [(32, 32), (64, 64), (128, 128), (256, 256)]
+
+
+def benchmark_pathfinding(searches=20):
+    print("{:>10} {:>16} {:>16} {:>12}".format("size", "A* expanded", "BFS expanded", "ms/search"))
+    for width, height in map_sizes:
+        map = MapManager(generate_bitmap_from_simplex_noise(width, height, seed=1))
+        tiles = [(x, y) for y in range(height) for x in range(width)
+                 if map.is_tile_passable(x, y, MovementType.GROUND)]
+        rng = Random(1)
+
+        stats = {}
+        breadth_first_expanded = 0
+        elapsed = 0
+        for _ in range(searches):
+            start, goal = rng.choice(tiles), rng.choice(tiles)
+            _, distance = navigate_all(start, map, MovementType.GROUND)
+            if goal not in distance:
+                continue
+            breadth_first_expanded += len([d for d in distance.values() if d < distance[goal]])
+
+            started = default_timer()
+            navigate(start, goal, map, movement_type=MovementType.GROUND, stats=stats)
+            elapsed += default_timer() - started
+
+        print("{:>10} {:>16} {:>16} {:>12.2f}".format("{}x{}".format(width, height), stats.get('expanded', 0),
+                                                      breadth_first_expanded, elapsed * 1000 / searches))
+
+
+# Compare tile by tile A* against hierarchical pathfinding on large maps, including the time to build the graph
+def benchmark_hierarchical_pathfinding(searches=20):
+    print("{:>10} {:>12} {:>14} {:>14} {:>14}".format("size", "build (ms)", "A* ms/search", "HPA ms/search",
+                                                      "extra steps"))
+    for width, height in [(128, 128), (256, 256), (512, 512)]:
+        map = MapManager(generate_bitmap_from_simplex_noise(width, height, seed=1))
+        tiles = [(x, y) for y in range(height) for x in range(width)
+                 if map.is_tile_passable(x, y, MovementType.GROUND)]
+        rng = Random(1)
+
+        started = default_timer()
+        graph = get_cluster_graph(map, MovementType.GROUND)
+        build_elapsed = default_timer() - started
+
+        search_elapsed = 0
+        hierarchical_elapsed = 0
+        extra_steps = 0
+        for _ in range(searches):
+            start, goal = rng.choice(tiles), rng.choice(tiles)
+
+            started = default_timer()
+            came_from, cost_so_far = navigate(start, goal, map, movement_type=MovementType.GROUND)
+            search_elapsed += default_timer() - started
+
+            started = default_timer()
+            path = graph.get_path(start, goal)
+            hierarchical_elapsed += default_timer() - started
+
+            if path:
+                extra_steps += len(path) - 1 - cost_so_far[goal]
+
+        print("{:>10} {:>12.1f} {:>14.2f} {:>14.2f} {:>14}".format(
+            "{}x{}".format(width, height), build_elapsed * 1000, search_elapsed * 1000 / searches,
+            hierarchical_elapsed * 1000 / searches, extra_steps))
+
+
+# Compare building distance maps to many targets with navigate_all, one target at a time, against computing
+# all of the distance fields in one pass
+def benchmark_distance_fields(num_targets=40):
+    print("{:>10} {:>8} {:>18} {:>18}".format("size", "targets", "navigate_all (ms)", "fields (ms)"))
+    for width, height in map_sizes:
+        map = MapManager(generate_bitmap_from_simplex_noise(width, height, seed=1))
+        tiles = [(x, y) for y in range(height) for x in range(width)
+                 if map.is_tile_passable(x, y, MovementType.GROUND)]
+        targets = Random(1).sample(tiles, min(num_targets, len(tiles)))
+
+        started = default_timer()
+        for target in targets:
+            navigate_all(target, map, MovementType.GROUND)
+        navigate_all_elapsed = default_timer() - started
+
+        started = default_timer()
+        compute_distance_fields(map.passable_masks[MovementType.GROUND], targets)
+        fields_elapsed = default_timer() - started
+
+        print("{:>10} {:>8} {:>18.1f} {:>18.1f}".format("{}x{}".format(width, height), len(targets),
+                                                        navigate_all_elapsed * 1000, fields_elapsed * 1000))
+
+
+if __name__ == "__main__":
+    benchmark_pathfinding(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+    print()
+    benchmark_hierarchical_pathfinding()
+    print()
+    benchmark_distance_fields()
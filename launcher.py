@@ -1,15 +1,20 @@
 # Launcher for the game.
 # When compiled into an executable, this file takes the place of the executable in the directory structure.
+# AI planning worker processes re-import this file, so the game is only started when it's run directly.
+from multiprocessing import freeze_support
 from sys import exc_info
 
-from terra.main import Main
-from terra.managers.errorlogger import ERROR_LOGGER
+if __name__ == "__main__":
+    freeze_support()
 
-try:
-    Main().run()
-except Exception as err:
-    ERROR_LOGGER.exception("Caught exception in the launcher.", err)
+    from terra.main import Main
+    from terra.managers.errorlogger import ERROR_LOGGER
 
-    # Allow the exception to propagate normally
-    exc = exc_info()
-    raise exc[0].with_traceback(exc[1], exc[2])
+    try:
+        Main().run()
+    except Exception as err:
+        ERROR_LOGGER.exception("Caught exception in the launcher.", err)
+
+        # Allow the exception to propagate normally
+        exc = exc_info()
+        raise exc[0].with_traceback(exc[1], exc[2])
@@ -17,7 +17,7 @@ setup(name="Terra",
       version="0.1",
       description="Terra game",
       options=options,
-      requires=['pygame', 'cx_Freeze', 'opensimplex'],
+      requires=['pygame', 'cx_Freeze', 'numpy'],
       executables=[Executable("launcher.py", base="Win32GUI")])
 
 # Zip up the created file
@@ -5,10 +5,13 @@ from threading import Thread
 from pygame import USEREVENT
 from pygame.event import Event
 
+from terra.ai import planningworker
+from terra.ai.assignmentengine import AssignmentEngine
 from terra.ai.pathcache import PathCache
-from terra.ai.pathfinder import navigate_all
+from terra.ai.planningbudget import PlanningBudget
 from terra.ai.personality import personality_method, PersonalityType
-from terra.ai.task import Task, TaskType, Assignment
+from terra.ai.reservationtable import ReservationTable
+from terra.ai.task import Task, TaskType, Assignment, combat_task_types, task_type_to_piece_archetype
 from terra.economy.upgradeattribute import UpgradeAttribute
 from terra.economy.upgrades import base_upgrades
 from terra.economy.upgradetype import UpgradeType
@@ -21,27 +24,49 @@ from terra.menu.option import Option
 from terra.mode import Mode
 from terra.piece.attribute import Attribute
 from terra.piece.damagetype import DamageType
+from terra.piece.orders import deserialize_order
 from terra.piece.piece import Piece
 from terra.piece.piecearchetype import PieceArchetype, counter_archetype
 from terra.piece.piecesubtype import PieceSubtype
 from terra.piece.piecetype import PieceType
 from terra.util.mathutil import wrap
 
+# Share of the planning budget that scoring assignments may use. The rest is kept for confirming them.
+scoring_budget_share = 0.5
+
+# Seconds of planning between each time the orders confirmed so far are passed to the partial orders listener, while
+# confirming assignments. See publish_partial_orders.
+partial_orders_interval = 1
+
+# How much worse attacking an enemy scores for each piece already attacking it, to spread attackers out.
+# 0 to let every piece pick its own best target. Assignments are only rescored as pieces are confirmed if this is set.
+attacker_crowding_penalty = 0
+
+# If set, combat pieces are matched to combat tasks for the best total score, with at most this many attackers per
+# enemy, before any assignments are confirmed. None to let every combat piece pick its own best task.
+attackers_per_target = None
+
 
 # An AI player, in charge of giving orders to a team.
 # When the Orders phase begins, it'll provide orders to its team.
 class AIPlayer(GameObject):
-    def __init__(self, team, personality_type=PersonalityType.DEFAULT):
+    def __init__(self, team, personality_type=PersonalityType.DEFAULT, analysis=None):
         self.team = team
 
         # Turn planning data
         self.planned_spending = 0
-        self.planned_occupied_coords = []
+        self.reservations = ReservationTable()
         self.tasks = []
-        self.assignments = []
+        self.assignments = AssignmentEngine()
         self.income = 0
         self.is_thinking = False
 
+        # Time budget for the turn being planned, and how much of the planning got done within it
+        self.budget = PlanningBudget()
+        self.planning_stats = {}
+        # Called with a valid order set (see get_planned_orders) every so often while confirming assignments, if set
+        self.partial_orders_listener = None
+
         # Aliases for commonly accessed data
         self.my_pieces = None
         self.my_piece_counts = None
@@ -53,8 +78,12 @@ class AIPlayer(GameObject):
 
         self.personality = personality_method[personality_type]()
 
+        # Board analysis shared with other AI teams planning the same turn, if any (see SharedAnalysis)
+        self.analysis = analysis
+
         # General map navigation
-        self.path_cache = PathCache(self.get_manager(Manager.PIECE), self.get_manager(Manager.MAP), self.team)
+        self.path_cache = PathCache(self.get_manager(Manager.PIECE), self.get_manager(Manager.MAP), self.team,
+                                    shared_paths=analysis.get_paths(team) if analysis else None)
 
         self.debug_print_tasks = False
         self.debug_print_assignments = False
@@ -78,10 +107,13 @@ class AIPlayer(GameObject):
         event_bus.register_handler(EventType.E_CHANGE_AI_PERSONALITY, self.change_personality)
 
         if self.do_threaded_planning:
-            # When the player submits their turn, plan out the AI turn on a separate thread
-            event_bus.register_handler(EventType.AI_REPLAN_TURN, self.begin_threaded_planning)
-            event_bus.register_handler(EventType.E_TURN_SUBMITTED, self.begin_threaded_planning)
             event_bus.register_handler(EventType.AI_EXCEPTION, self.handle_ai_exception)
+
+            # With process planning, the PlanningScheduler plans every AI team's turn at once
+            if not planningworker.use_process_planning:
+                # When the player submits their turn, plan out the AI turn on a separate thread
+                event_bus.register_handler(EventType.AI_REPLAN_TURN, self.begin_threaded_planning)
+                event_bus.register_handler(EventType.E_TURN_SUBMITTED, self.begin_threaded_planning)
         else:
             # At start of turn, do preplanning. Then complete planning the turn when the player submits their turn
             event_bus.register_handler(EventType.AI_REPLAN_TURN, self.do_all_planning)
@@ -112,9 +144,12 @@ class AIPlayer(GameObject):
 
         self.income = piece_manager.get_income(self.team)
         self.planned_spending = 0
-        # Mark buildings as planned occupied tiles to start
-        self.planned_occupied_coords = [(piece.gx, piece.gy) for piece in self.my_pieces
-                                        if piece.piece_subtype == PieceSubtype.BUILDING]
+        # Reserve tiles with buildings on them to start
+        self.reservations = ReservationTable((piece.gx, piece.gy) for piece in self.my_pieces
+                                             if piece.piece_subtype == PieceSubtype.BUILDING)
+
+        # Rebuild move cost grids, in case upgrades have changed since they were built
+        piece_manager.move_costs.clear()
 
         self.path_cache.generate_paths()
 
@@ -365,8 +400,7 @@ class AIPlayer(GameObject):
             return piece.gx, piece.gy
         else:
             gx, gy = piece.gx, piece.gy
-            possible_tiles, distance = navigate_all((piece.gx, piece.gy), self.map, piece.attr(Attribute.MOVEMENT_TYPE),
-                                                    max_distance=piece.attr(Attribute.MOVEMENT_RANGE))
+            movement_range = piece.get_movement_range()
 
             # Determine if the enemy will move (not healing or ranged attacking)
             odds_out_of_ten = 3 if piece.attr(Attribute.DAMAGE_TYPE) == DamageType.RANGED else 7
@@ -374,7 +408,11 @@ class AIPlayer(GameObject):
 
             if moving:
                 # Assume they'll move about their full range
-                possible_tiles = [tile for tile, distance in distance.items() if distance >= piece.attr(Attribute.MOVEMENT_RANGE) - 1]
+                possible_tiles = self.analysis.get_movable_tiles(piece) if self.analysis else None
+                if possible_tiles is None:
+                    possible_tiles = self.get_manager(Manager.PIECE).reachability.get_movable_tiles(
+                        piece.gx, piece.gy, piece.attr(Attribute.MOVEMENT_TYPE), movement_range - 1, movement_range,
+                        piece.team, piece.piece_type)
 
                 # Sort by distance to our base
                 our_base = self.get_manager(Manager.PIECE).get_all_pieces_for_team(self.team, piece_type=PieceType.BASE)
@@ -395,79 +433,160 @@ class AIPlayer(GameObject):
         return [piece_type for piece_type in buildable_at_barracks
                 if team_manager.attr(self.team, piece_type, Attribute.ARCHETYPE) == piece_archetype]
 
-    # Create assignments for each task
+    # Create assignments for each task, returning them as an AssignmentEngine to confirm them from.
+    # Tasks are scored most important first, until the scoring share of the budget is spent.
     def assign_tasks(self, tasks):
-        assignments = []
+        assignments = AssignmentEngine(rescore=self.rescore_assignment if attacker_crowding_penalty else None)
+        tasks_scored = 0
         # For each task, create assignments of each eligible piece and score it by suitability
         for task in tasks:
-            for eligible_piece in task.get_eligible_pieces_for_task(self.get_manager(Manager.PIECE)):
+            if self.budget.is_spent(scoring_budget_share):
+                self.planning_stats['out_of_budget'] = True
+                break
+
+            tasks_scored += 1
+            for eligible_piece in task.get_eligible_pieces_for_task(self.get_manager(Manager.PIECE), self.map):
                 score, end_pos = task.score_piece_for_task(eligible_piece, self.path_cache)
-                assignments.append(Assignment(eligible_piece, task, score, end_pos=end_pos))
+                assignments.add(Assignment(eligible_piece, task, score, end_pos=end_pos))
+
+        if attackers_per_target:
+            assignments.match_optimally(self.is_combat_assignment, attackers_per_target)
 
-        # Sort assignments by their score (lowest scores first)
-        assignments.sort(key=lambda a: a.value)
+        self.planning_stats['tasks_scored'] = tasks_scored
+        self.planning_stats['assignments'] = len(assignments)
 
         if self.debug_print_assignments:
             print("== Assignments ==")
-            for assignment in assignments:
+            for assignment in assignments.get_sorted():
                 print(assignment)
 
         return assignments
 
-    # Assign orders to pieces for each assignment
+    # Return true if the assignment is for a piece that fights, to a combat task
+    def is_combat_assignment(self, assignment):
+        return assignment.task.task_type in combat_task_types and \
+            assignment.piece.piece_archetype in task_type_to_piece_archetype[TaskType.ATTACK_ENEMY]
+
+    # Score the assignment again, now that other pieces have been confirmed to the same task
+    def rescore_assignment(self, assignment, assignees):
+        score, _ = assignment.task.score_piece_for_task(assignment.piece, self.path_cache)
+        return score + attacker_crowding_penalty * assignees
+
+    # Assign orders to pieces for each assignment, best first, until the budget is spent.
+    # Every confirmed piece reserves the tile it'll end up on. If a piece would end up on a tile another piece has
+    # already reserved, it's moved somewhere nearby instead of dropping the assignment (see repair_end_position).
     def confirm_assignments(self, assignments):
         if self.debug_print_confirmations:
             print("== Confirming {} assignments".format(len(assignments)))
 
-        assigned_pieces = []
-        assigned_tasks = []
-
-        for assignment in assignments:
-            if assignment.value < 99999 and assignment.piece not in assigned_pieces and \
-                    assignment.task not in assigned_tasks:
-                enough_money = True
-                tiles_free = True
-
-                # Only confirm the assignment if we can afford it
-                new_spending = assignment.task.get_planned_spending(self.get_manager(Manager.TEAM))
-                if new_spending > 0 and self.planned_spending + new_spending > \
-                        self.get_manager(Manager.TEAM).resources[self.team]:
-                    enough_money = False
-
-                # Only confirm the assignment if it won't occupy the same tile twice
-                newly_occupied_tiles = assignment.get_end_position(self.path_cache, self.planned_occupied_coords)
-                if newly_occupied_tiles is None:
-                    tiles_free = False
-                elif not set(self.planned_occupied_coords).isdisjoint(set(newly_occupied_tiles)):
-                    tiles_free = False
-
-                # If no other objections, allow the assignment to happen
-                if enough_money and tiles_free:
-                    # Remove the piece from the eligible pool
-                    assigned_pieces.append(assignment.piece)
-
-                    # Remove the task from the eligible pool
-                    if not assignment.task.allow_multiple_assignments:
-                        assigned_tasks.append(assignment.task)
-
-                    # Set an order to the piece in the assignment
-                    self.set_order_for_task(assignment)
-
-                    # Mark planned spending
-                    self.planned_spending += new_spending
-                    # Mark occupied locations
-                    for coord in newly_occupied_tiles:
-                        self.planned_occupied_coords.append(coord)
-
-                    if self.debug_print_confirmations:
-                        print("+ Set order for assignment {}".format(assignment))
-                elif self.debug_print_confirmations:
-                    print("- Elected not to set order for assignment {} due to objections:\n"
-                          "   Enough money? {}, {}\n"
-                          "   Tiles free? {}, {}".format(assignment, enough_money, new_spending,
-                                                         tiles_free, newly_occupied_tiles))
-
-        return assigned_pieces, assigned_tasks
+        considered = 0
+        next_partial_orders = 0
+
+        while True:
+            if self.partial_orders_listener and self.budget.get_spent() >= next_partial_orders:
+                self.publish_partial_orders(assignments.assigned_pieces)
+                next_partial_orders = self.budget.get_spent() + partial_orders_interval
+
+            assignment = assignments.pop_next()
+            if assignment is None:
+                break
+
+            if self.budget.is_spent():
+                self.planning_stats['out_of_budget'] = True
+                break
+
+            considered += 1
+            enough_money = True
+            tiles_free = True
+
+            # Only confirm the assignment if we can afford it
+            new_spending = assignment.task.get_planned_spending(self.get_manager(Manager.TEAM))
+            if new_spending > 0 and self.planned_spending + new_spending > \
+                    self.get_manager(Manager.TEAM).resources[self.team]:
+                enough_money = False
+
+            # Only confirm the assignment if it won't occupy the same tile twice
+            newly_occupied_tiles = assignment.get_end_position(self.path_cache, self.reservations)
+            if newly_occupied_tiles is not None and not self.reservations.are_free(newly_occupied_tiles):
+                newly_occupied_tiles = self.repair_end_position(assignment)
+
+            if newly_occupied_tiles is None:
+                tiles_free = False
+
+            # If no other objections, allow the assignment to happen
+            if enough_money and tiles_free:
+                # Remove the piece (and task, unless it allows more pieces) from the eligible pool
+                assignments.confirm(assignment)
+
+                # Set an order to the piece in the assignment
+                self.set_order_for_task(assignment)
+
+                # Mark planned spending
+                self.planned_spending += new_spending
+                # Reserve the tiles we'll occupy
+                for coord in newly_occupied_tiles:
+                    self.reservations.reserve(coord)
+
+                if self.debug_print_confirmations:
+                    print("+ Set order for assignment {}".format(assignment))
+            elif self.debug_print_confirmations:
+                print("- Elected not to set order for assignment {} due to objections:\n"
+                      "   Enough money? {}, {}\n"
+                      "   Tiles free? {}, {}".format(assignment, enough_money, new_spending,
+                                                     tiles_free, newly_occupied_tiles))
+
+        self.planning_stats['assignments_considered'] = considered
+        self.planning_stats['assignments_confirmed'] = len(assignments.assigned_pieces)
+
+        return assignments.assigned_pieces, assignments.assigned_tasks
+
+    # Find somewhere else for the assignment's piece to stop, when another piece has already reserved the tile it
+    # would have stopped on. Picks the free tile within movement range that's closest to the task's target.
+    # Returns the new end position, or None if the piece has to stay put (or has nowhere to go).
+    def repair_end_position(self, assignment):
+        piece = assignment.piece
+        task = assignment.task
+        movement_range = piece.get_movement_range()
+
+        if not task.requires_pathfinding() or len(assignment.end_pos) > 0 or movement_range <= 0 or \
+                self.is_ranged_attack_in_range(assignment) or self.is_mining_in_range(assignment):
+            return None
+
+        piece_manager = self.get_manager(Manager.PIECE)
+        movable_tiles = piece_manager.reachability.get_movable_tiles(
+            piece.gx, piece.gy, piece.attr(Attribute.MOVEMENT_TYPE), 1, movement_range, self.team, piece.piece_type)
+
+        # Skip reserved tiles, and enemy buildings if we can't attack them
+        cant_attack_buildings = piece.attr(Attribute.CANT_ATTACK_BUILDINGS)
+        free_tiles = [tile for tile in movable_tiles if tile not in self.reservations and not (
+            cant_attack_buildings and
+            piece_manager.get_enemy_pieces_at(tile[0], tile[1], self.team, piece_subtype=PieceSubtype.BUILDING))]
+
+        if len(free_tiles) == 0:
+            return None
+
+        assignment.tx, assignment.ty = min(free_tiles,
+                                           key=lambda tile: abs(tile[0] - task.tx) + abs(tile[1] - task.ty))
+        return [(assignment.tx, assignment.ty)]
+
+    # Return true if the assignment is a ranged attack on a target that's already in range, so the piece stays put
+    def is_ranged_attack_in_range(self, assignment):
+        piece = assignment.piece
+        task = assignment.task
+        if task.task_type != TaskType.ATTACK_ENEMY or piece.attr(Attribute.DAMAGE_TYPE) != DamageType.RANGED:
+            return False
+
+        if isinstance(task.target, Piece):
+            ranged_distance = abs(task.target.gx - piece.gx) + abs(task.target.gy - piece.gy)
+        else:
+            ranged_distance = 0
+        return piece.attr(Attribute.MIN_RANGE) <= ranged_distance <= piece.attr(Attribute.MAX_RANGE)
+
+    # Return true if the assignment is mining a tile the piece is already next to, so the piece stays put
+    def is_mining_in_range(self, assignment):
+        piece = assignment.piece
+        task = assignment.task
+        return task.task_type == TaskType.MINE and abs(piece.gx - task.tx) + abs(piece.gy - task.ty) <= 1
 
     # Translate a task into an order for the piece to follow
     def set_order_for_task(self, assignment):
@@ -480,22 +599,15 @@ class AIPlayer(GameObject):
         tx = assignment.tx
         ty = assignment.ty
 
-        if isinstance(task.target, Piece):
-            ranged_distance = abs(task.target.gx - piece.gx) + abs(task.target.gy - piece.gy)
-        else:
-            ranged_distance = 0
-
         if task.task_type in [TaskType.MOVE_TO_RESOURCE, TaskType.ATTACK_ENEMY, TaskType.MINE]:
             # Ranged units should issue attack orders instead of move orders when close enough to their target
-            if piece.attr(Attribute.DAMAGE_TYPE) == DamageType.RANGED and \
-                    task.task_type in [TaskType.ATTACK_ENEMY] and \
-                    piece.attr(Attribute.MIN_RANGE) <= ranged_distance <= piece.attr(Attribute.MAX_RANGE):
+            if self.is_ranged_attack_in_range(assignment):
                 # Conduct a ranged attack on the target
                 order = Option.MENU_RANGED_ATTACK
                 tx = task.tx
                 ty = task.ty
             # Mining orders should conduct the mine action when adjacent
-            elif task.task_type in [TaskType.MINE] and abs(piece.gx - task.tx) + abs(piece.gy - task.ty) <= 1:
+            elif self.is_mining_in_range(assignment):
                 order = Option.MENU_MINE_TILE
                 tx = task.tx
                 ty = task.ty
@@ -530,11 +642,12 @@ class AIPlayer(GameObject):
             movement_type = piece.attr(Attribute.MOVEMENT_TYPE)
 
             if movement_range > 0:
-                if (piece.gx, piece.gy) in self.planned_occupied_coords:
-                    valid_tiles = self.map.get_tiles_in_range(piece.gx, piece.gy, 0, movement_range, movement_type)
+                if (piece.gx, piece.gy) in self.reservations:
+                    valid_tiles = self.get_manager(Manager.PIECE).reachability.get_movable_tiles(
+                        piece.gx, piece.gy, movement_type, 1, piece.get_movement_range(), self.team, piece.piece_type)
 
-                    # Remove planned coords from valid tiles
-                    valid_tiles = list(set(valid_tiles) - set(self.planned_occupied_coords))
+                    # Remove reserved tiles from valid tiles. The closest remaining tiles come first.
+                    valid_tiles = [tile for tile in valid_tiles if tile not in self.reservations]
 
                     # Pick an arbitrary tile and pathfind to it
                     # destination = valid_tiles[randint(0, len(valid_tiles) - 1)]
@@ -545,9 +658,9 @@ class AIPlayer(GameObject):
                         }))
                     else:
                         destination = valid_tiles[0]
-                        path = piece.get_path_to_target(destination, self.path_cache, self.planned_occupied_coords,
+                        path = piece.get_path_to_target(destination, self.path_cache, self.reservations,
                                                         movement_type=movement_type)
-                        final_goal = piece.step_along_path(path, self.planned_occupied_coords)
+                        final_goal = piece.step_along_path(path, self.reservations)
 
                         if final_goal == (piece.gx, piece.gy):
                             # We couldn't find a path to get out of the way, so delete ourselves
@@ -555,8 +668,8 @@ class AIPlayer(GameObject):
                                 'option': Option.MENU_DEMOLISH_SELF,
                             }))
                         else:
-                            # Update the planned occupied coords, issue the order
-                            self.planned_occupied_coords.append(final_goal)
+                            # Reserve where we're going, issue the order
+                            self.reservations.reserve(final_goal)
 
                             piece.set_order(Event(USEREVENT, {
                                 'option': Option.MENU_MOVE,
@@ -564,14 +677,49 @@ class AIPlayer(GameObject):
                                 'dy': final_goal[1],
                             }))
                 else:
-                    # Add ourselves to the planned occupied coords
-                    self.planned_occupied_coords.append((piece.gx, piece.gy))
-
-    # Begin planning the AI turn
+                    # Reserve where we are
+                    self.reservations.reserve((piece.gx, piece.gy))
+
+    # Return (gx, gy, piece type, serialized order) for each of our pieces
+    def get_planned_orders(self):
+        return [(piece.gx, piece.gy, piece.piece_type, piece.current_order.serialize() if piece.current_order else None)
+                for piece in self.my_pieces]
+
+    # Pass the orders confirmed so far to the partial orders listener, with every other piece moved out of the way as
+    # if planning stopped here. Those pieces' orders and reservations are put back afterwards, so planning can go on.
+    def publish_partial_orders(self, assigned_pieces):
+        leftovers = [piece for piece in self.my_pieces if piece not in assigned_pieces]
+        leftover_orders = [piece.current_order for piece in leftovers]
+        reservations = self.reservations
+
+        self.reservations = ReservationTable(reservations)
+        self.move_leftover_pieces(leftovers)
+        self.partial_orders_listener(self.get_planned_orders())
+
+        self.reservations = reservations
+        for piece, order in zip(leftovers, leftover_orders):
+            piece.current_order = order
+
+    # Begin planning the AI turn on a separate thread
     def begin_threaded_planning(self, event=None):
         thread = Thread(target=self.do_all_planning)
         thread.start()
 
+    # Issue orders planned elsewhere (e.g. in a worker process), and submit our turn.
+    # Orders are (gx, gy, piece type, serialized order) for each of our pieces.
+    def apply_planned_orders(self, orders):
+        piece_manager = self.get_manager(Manager.PIECE)
+        for gx, gy, piece_type, order in orders:
+            for piece in piece_manager.get_pieces_at(gx, gy, piece_type, self.team):
+                piece.current_order = deserialize_order(order) if order else None
+
+        self.submit_turn()
+
+    # Mark the turn as submitted so the game can progress when the player is ready
+    def submit_turn(self):
+        self.get_manager(Manager.TEAM).set_turn_submitted(self.team)
+        self.is_thinking = False
+
     # Handle exceptions passed back into the main thread from the AI planning thread
     def handle_ai_exception(self, event):
         raise event.exc_info[0].with_traceback(event.exc_info[1], event.exc_info[2])
@@ -589,29 +737,45 @@ class AIPlayer(GameObject):
                 'exc_info': exc_info(),
             })
 
-    # Calculate what the world looks like right now
+    # Issue concrete orders to our pieces from our assignments, without submitting the turn
+    # If the budget runs out, lower priority assignments are dropped, but every piece still gets a valid order.
+    def plan_orders(self):
+        self.budget.resume()
+
+        # Confirm assignments in order of importance, issue concrete orders.
+        assigned_pieces, assigned_tasks = self.confirm_assignments(self.assignments)
+
+        # Pieces without orders should get out of the way of pieces with more important orders
+        self.move_leftover_pieces([piece for piece in self.my_pieces if piece not in assigned_pieces])
+
+        self.budget.pause()
+        self.planning_stats['budget_spent'] = self.budget.get_spent()
+
+    # Calculate what the world looks like right now.
+    # Starts a new planning budget for the turn. Time between preplanning and acting on it doesn't count against it.
     def do_preplanning(self, event=None):
         self.is_thinking = True
+        self.budget = PlanningBudget(self.personality.planning_budget)
+        self.planning_stats = {'out_of_budget': False}
 
         # Grok the board state, build some common aliases / queries
         self.parse_board_state()
 
         # Generate all potential tasks the AI might want to accomplish
         self.tasks = self.generate_tasks()
+        self.planning_stats['tasks'] = len(self.tasks)
 
         # Generate assignments between tasks and pieces that can possibly execute the task
         self.assignments = self.assign_tasks(self.tasks)
+
+        self.budget.pause()
         self.is_thinking = False
 
     # Act on planning and issue orders
     def act_on_planning(self, event=None):
         self.is_thinking = True
 
-        # Confirm assignments in order of importance, issue concrete orders.
-        assigned_pieces, assigned_tasks = self.confirm_assignments(self.assignments)
-
-        # Pieces without orders should get out of the way of pieces with more important orders
-        self.move_leftover_pieces(list(set(self.my_pieces) - set(assigned_pieces)))
+        self.plan_orders()
 
         # Mark the turn as submitted so the game can progress when the player is ready
         self.get_manager(Manager.TEAM).set_turn_submitted(self.team)
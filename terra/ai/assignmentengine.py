@@ -0,0 +1,194 @@
+from heapq import heapify, heappush, heappop
+
+# Assignments scoring at least this much can never be carried out (see Task.score_piece_for_task)
+infeasible_score = 99999
+
+
+# Hands out candidate assignments best (lowest score) first, for the AI to confirm one at a time.
+# Candidates are kept in a heap. Candidates for pieces or tasks that have already been assigned are skipped as they
+# come up, instead of being searched for and removed, so confirming a turn's worth of assignments is O(N log N).
+# If a rescore function is provided, confirming a piece to a task that allows multiple assignments marks that task's
+# other candidates as stale. Stale candidates are rescored when they reach the top of the heap, and put back if they
+# no longer come first.
+class AssignmentEngine:
+    def __init__(self, assignments=None, rescore=None):
+        self.rescore = rescore
+
+        # Heap of (score, insertion order, task version, assignment). Insertion order breaks ties, so equal scores
+        # come out in the order they went in.
+        self.heap = []
+        self.count = 0
+
+        self.assigned_pieces = set()
+        self.assigned_tasks = set()
+
+        # How many pieces have been confirmed to each task allowing multiple assignments, and how many times it's
+        # been marked stale. Candidates scored against an older version get rescored.
+        self.task_assignees = {}
+        self.task_versions = {}
+
+        for assignment in assignments or []:
+            self.heap.append(self.__entry__(assignment))
+        heapify(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __entry__(self, assignment):
+        self.count += 1
+        return assignment.value, self.count, self.task_versions.get(assignment.task, 0), assignment
+
+    # Add a candidate assignment
+    def add(self, assignment):
+        heappush(self.heap, self.__entry__(assignment))
+
+    # Return all remaining candidates, best first, without removing them
+    def get_sorted(self):
+        return [entry[3] for entry in sorted(self.heap)]
+
+    # Return true if the assignment's piece or task has already been taken
+    def is_taken(self, assignment):
+        return assignment.piece in self.assigned_pieces or assignment.task in self.assigned_tasks
+
+    # Remove and return the best remaining candidate whose piece and task are still free, or None if there are none.
+    # Candidates that can never be carried out are never returned.
+    def pop_next(self):
+        while self.heap:
+            value, _, version, assignment = heappop(self.heap)
+            if value >= infeasible_score:
+                # Everything after this is infeasible too
+                self.heap = []
+                return None
+            if self.is_taken(assignment):
+                continue
+
+            if version != self.task_versions.get(assignment.task, 0):
+                assignment.value = self.rescore(assignment, self.task_assignees[assignment.task])
+                heappush(self.heap, self.__entry__(assignment))
+                continue
+
+            return assignment
+        return None
+
+    # Mark the assignment as carried out, so its piece (and task, unless it allows multiple assignments) is taken
+    def confirm(self, assignment):
+        self.assigned_pieces.add(assignment.piece)
+
+        task = assignment.task
+        if not task.allow_multiple_assignments:
+            self.assigned_tasks.add(task)
+        elif self.rescore:
+            self.task_assignees[task] = self.task_assignees.get(task, 0) + 1
+            self.task_versions[task] = self.task_versions.get(task, 0) + 1
+
+    # Replace the candidates matching the filter with the best matching of them: each piece gets at most one task,
+    # and each task at most `capacity` pieces (or one, if it doesn't allow multiple assignments), with the lowest
+    # total score. Pieces are left out of the matching if there aren't enough tasks to go around.
+    # Other candidates are left alone.
+    def match_optimally(self, is_candidate, capacity):
+        candidates = {}
+        others = []
+        for entry in self.heap:
+            if is_candidate(entry[3]) and entry[0] < infeasible_score:
+                candidates[entry[3]] = entry
+            else:
+                others.append(entry)
+
+        matched = match_assignments(list(candidates), capacity)
+        self.heap = others + [candidates[assignment] for assignment in matched]
+        heapify(self.heap)
+        return matched
+
+
+# Return the subset of assignments with the lowest total score where each piece works at most one task, and each task
+# has at most `capacity` pieces (one if it doesn't allow multiple assignments).
+def match_assignments(assignments, capacity):
+    pieces = []
+    slots = []
+    piece_rows = {}
+    task_slots = {}
+    for assignment in assignments:
+        if assignment.piece not in piece_rows:
+            piece_rows[assignment.piece] = len(pieces)
+            pieces.append(assignment.piece)
+        if assignment.task not in task_slots:
+            slot_count = capacity if assignment.task.allow_multiple_assignments else 1
+            task_slots[assignment.task] = list(range(len(slots), len(slots) + slot_count))
+            slots.extend([assignment.task] * slot_count)
+
+    if len(pieces) == 0:
+        return []
+
+    # Pairs that aren't candidates cost more than any matching of candidates, and are dropped afterwards.
+    # Padding with unusable slots lets every piece be matched, even when there are more pieces than slots.
+    unusable = 1 + sum(abs(assignment.value) for assignment in assignments) * 2
+    column_count = max(len(slots), len(pieces))
+    costs = [[unusable] * column_count for _ in pieces]
+    chosen = {}
+    for assignment in assignments:
+        row = piece_rows[assignment.piece]
+        for column in task_slots[assignment.task]:
+            if assignment.value < costs[row][column]:
+                costs[row][column] = assignment.value
+                chosen[(row, column)] = assignment
+
+    return [chosen[(row, column)] for row, column in enumerate(solve_min_cost_matching(costs))
+            if (row, column) in chosen]
+
+
+# Hungarian algorithm. Given a cost matrix with no more rows than columns, return the column matched to each row,
+# minimizing the total cost. O(rows^2 * columns).
+def solve_min_cost_matching(costs):
+    row_count = len(costs)
+    column_count = len(costs[0])
+
+    # Potentials, and the row matched to each column. Row and column 0 are placeholders, so indexes are offset by 1.
+    row_potential = [0] * (row_count + 1)
+    column_potential = [0] * (column_count + 1)
+    column_match = [0] * (column_count + 1)
+    previous_column = [0] * (column_count + 1)
+
+    for row in range(1, row_count + 1):
+        column_match[0] = row
+        current_column = 0
+        min_slack = [float('inf')] * (column_count + 1)
+        used = [False] * (column_count + 1)
+
+        # Grow an alternating path from the new row until it reaches an unmatched column
+        while True:
+            used[current_column] = True
+            current_row = column_match[current_column]
+            delta = float('inf')
+            next_column = 0
+            for column in range(1, column_count + 1):
+                if not used[column]:
+                    slack = costs[current_row - 1][column - 1] - row_potential[current_row] - column_potential[column]
+                    if slack < min_slack[column]:
+                        min_slack[column] = slack
+                        previous_column[column] = current_column
+                    if min_slack[column] < delta:
+                        delta = min_slack[column]
+                        next_column = column
+
+            for column in range(column_count + 1):
+                if used[column]:
+                    row_potential[column_match[column]] += delta
+                    column_potential[column] -= delta
+                else:
+                    min_slack[column] -= delta
+
+            current_column = next_column
+            if column_match[current_column] == 0:
+                break
+
+        # Flip the matching along the path
+        while current_column:
+            column = previous_column[current_column]
+            column_match[current_column] = column_match[column]
+            current_column = column
+
+    row_matches = [0] * row_count
+    for column in range(1, column_count + 1):
+        if column_match[column]:
+            row_matches[column_match[column] - 1] = column - 1
+    return row_matches
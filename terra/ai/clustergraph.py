@@ -0,0 +1,311 @@
+from heapq import heappush, heappop
+from weakref import WeakKeyDictionary, proxy
+
+import numpy as np
+
+from terra.ai.distancefield import compute_distance_fields, compute_path_directions, get_field_distance, \
+    FieldPaths, UNREACHABLE
+
+# Hierarchical pathfinding for large maps.
+# The map is split into square clusters. Tiles on either side of each open stretch of a cluster border are
+# entrances, and the distances between entrances inside each cluster are precomputed. Paths are found by searching
+# the (much smaller) graph of entrances first, then refining each step of the abstract path within its cluster.
+# Paths are close to, but not always exactly, the shortest.
+# https://webdocs.cs.ualberta.ca/~mmueller/ps/hpastar.pdf
+
+# Width and height of each cluster, in tiles
+CLUSTER_SIZE = 16
+
+# Open stretches of border at least this long get an entrance at each end instead of one in the middle
+MIN_DOUBLE_ENTRANCE_LENGTH = 6
+
+
+# Graphs for each map and movement type, built the first time they're needed. Graphs only hold a weak reference to
+# their map, so they're thrown out along with it.
+# cluster_graphs[map][movement type] = ClusterGraph
+cluster_graphs = WeakKeyDictionary()
+
+
+# Return the hierarchical pathfinding graph for the map and movement type.
+# Graphs rebuild their own changed clusters by checking the map's terrain version.
+def get_cluster_graph(map, movement_type):
+    graphs = cluster_graphs.setdefault(map, {})
+    if movement_type not in graphs:
+        graphs[movement_type] = ClusterGraph(proxy(map), movement_type)
+    return graphs[movement_type]
+
+
+# Manhattan distance between two tiles. Never overestimates the number of steps between them.
+def manhattan_distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+# Entrance graph over a map, for a single movement type.
+# Clusters are rebuilt the next time the graph is used after any of their tiles change.
+class ClusterGraph:
+    def __init__(self, map, movement_type, cluster_size=CLUSTER_SIZE):
+        self.map = map
+        self.movement_type = movement_type
+        self.cluster_size = cluster_size
+
+        self.clusters_wide = (map.width + cluster_size - 1) // cluster_size
+        self.clusters_high = (map.height + cluster_size - 1) // cluster_size
+
+        # Entrance pairs on each border, keyed by the clusters on either side of it
+        # self.border_entrances[((cx, cy), (cx, cy))] = [(tile, tile)]
+        self.border_entrances = {}
+        # Entrance tiles in each cluster
+        # self.cluster_entrances[(cx, cy)] = [tile]
+        self.cluster_entrances = {}
+        # Edges between entrances. Intra-cluster edges cost their distance within the cluster, border edges cost 1.
+        # self.edges[tile] = {tile: cost}
+        self.edges = {}
+        # 'came_from' maps to each entrance from the rest of its cluster, built the first time they're needed
+        # self.entrance_paths[tile] = FieldPaths
+        self.entrance_paths = {}
+
+        # Copy of the passable mask the graph was built from, to find which clusters have changed
+        self.passable = None
+        self.terrain_version = None
+
+        self.update()
+
+    # Return the cluster the tile is in
+    def get_cluster(self, tile):
+        return tile[0] // self.cluster_size, tile[1] // self.cluster_size
+
+    # Return the (x0, y0, x1, y1) bounds of the cluster, with exclusive x1 and y1
+    def get_cluster_bounds(self, cluster):
+        x0 = cluster[0] * self.cluster_size
+        y0 = cluster[1] * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, self.map.width), min(y0 + self.cluster_size, self.map.height)
+
+    # Return the clusters next to the cluster, ordered N, W, E, S
+    def get_adjacent_clusters(self, cluster):
+        cx, cy = cluster
+        return [(x, y) for x, y in ((cx, cy - 1), (cx - 1, cy), (cx + 1, cy), (cx, cy + 1))
+                if 0 <= x < self.clusters_wide and 0 <= y < self.clusters_high]
+
+    # Rebuild any clusters whose tiles have changed since the graph was last used
+    def update(self):
+        if self.terrain_version == self.map.terrain_version:
+            return
+
+        passable = self.map.passable_masks[self.movement_type]
+        if self.passable is None:
+            clusters = [(cx, cy) for cy in range(self.clusters_high) for cx in range(self.clusters_wide)]
+        else:
+            ys, xs = np.nonzero(passable != self.passable)
+            clusters = list(dict.fromkeys(zip((xs // self.cluster_size).tolist(), (ys // self.cluster_size).tolist())))
+
+        self.passable = passable.copy()
+        self.terrain_version = self.map.terrain_version
+        if len(clusters) > 0:
+            self.rebuild_clusters(clusters)
+
+    # Rebuild the entrances on every border of the clusters, and the edges of every cluster those entrances touch
+    def rebuild_clusters(self, clusters):
+        borders = set()
+        for cluster in clusters:
+            for neighbor in self.get_adjacent_clusters(cluster):
+                borders.add((min(cluster, neighbor), max(cluster, neighbor)))
+
+        touched_clusters = set(clusters)
+        for border in borders:
+            self.border_entrances[border] = self.find_border_entrances(*border)
+            touched_clusters.update(border)
+
+        for cluster in touched_clusters:
+            self.build_cluster_edges(cluster)
+
+    # Find the entrance pairs between two adjacent clusters, where a is above or left of b.
+    # Each open stretch of border gets an entrance in its middle, or one at each end if it's long enough.
+    def find_border_entrances(self, a, b):
+        ax0, ay0, ax1, ay1 = self.get_cluster_bounds(a)
+        bx0, by0, bx1, by1 = self.get_cluster_bounds(b)
+
+        if a[0] == b[0]:
+            # Horizontal border: a's bottom row against b's top row
+            pairs = [((x, ay1 - 1), (x, by0)) for x in range(ax0, ax1)]
+        else:
+            # Vertical border: a's right column against b's left column
+            pairs = [((ax1 - 1, y), (bx0, y)) for y in range(ay0, ay1)]
+
+        entrances = []
+        stretch = []
+        for tile_a, tile_b in pairs + [(None, None)]:
+            if tile_a and self.passable[tile_a[1], tile_a[0]] and self.passable[tile_b[1], tile_b[0]]:
+                stretch.append((tile_a, tile_b))
+            elif len(stretch) > 0:
+                if len(stretch) >= MIN_DOUBLE_ENTRANCE_LENGTH:
+                    entrances.extend([stretch[0], stretch[-1]])
+                else:
+                    entrances.append(stretch[len(stretch) // 2])
+                stretch = []
+
+        return entrances
+
+    # Rebuild the edges to and from every entrance in the cluster
+    def build_cluster_edges(self, cluster):
+        for entrance in self.cluster_entrances.get(cluster, []):
+            self.edges.pop(entrance, None)
+            self.entrance_paths.pop(entrance, None)
+
+        # Collect this cluster's side of every entrance on its borders
+        entrances = {}
+        for neighbor in self.get_adjacent_clusters(cluster):
+            border = (min(cluster, neighbor), max(cluster, neighbor))
+            for tile_a, tile_b in self.border_entrances.get(border, []):
+                inside, outside = (tile_a, tile_b) if border[0] == cluster else (tile_b, tile_a)
+                entrances.setdefault(inside, {})[outside] = 1
+
+        # Connect entrances that can reach each other without leaving the cluster
+        tiles = list(entrances)
+        if len(tiles) > 0:
+            fields = self.compute_cluster_fields(cluster, tiles)
+            for index, tile in enumerate(tiles):
+                for other in tiles:
+                    distance = self.get_cluster_distance(cluster, fields[index], other)
+                    if other != tile and distance != UNREACHABLE:
+                        entrances[tile][other] = distance
+
+        self.cluster_entrances[cluster] = tiles
+        self.edges.update(entrances)
+
+    # Compute distance fields to each source, without leaving the cluster. Fields are indexed relative to the cluster.
+    def compute_cluster_fields(self, cluster, sources):
+        x0, y0, x1, y1 = self.get_cluster_bounds(cluster)
+        return compute_distance_fields(self.passable[y0:y1, x0:x1], [(x - x0, y - y0) for x, y in sources])
+
+    # Return the distance to the tile in a field from compute_cluster_fields
+    def get_cluster_distance(self, cluster, field, tile):
+        x0, y0, _, _ = self.get_cluster_bounds(cluster)
+        return get_field_distance(field, (tile[0] - x0, tile[1] - y0))
+
+    # Return the distances from the tile to each of the other tiles in its cluster that it can reach
+    def get_local_distances(self, tile, others):
+        cluster = self.get_cluster(tile)
+        field = self.compute_cluster_fields(cluster, [tile])[0]
+
+        distances = {}
+        for other in others:
+            distance = self.get_cluster_distance(cluster, field, other)
+            if other != tile and distance != UNREACHABLE:
+                distances[other] = distance
+        return distances
+
+    # Search the entrance graph for the cheapest route from the start to the goal, using A*.
+    # Returns the list of waypoints from the start to the goal, or None if there's no route.
+    # If is_excluded is provided, entrances it returns true for aren't used as waypoints.
+    # If stats is provided, the number of waypoints expanded is added to stats['expanded'].
+    def find_abstract_path(self, start, goal, stats=None, is_excluded=None):
+        # Tiles in the same cluster may also be able to reach each other directly
+        start_cluster = self.get_cluster(start)
+        start_edges = self.get_local_distances(start, self.cluster_entrances.get(start_cluster, []) +
+                                               ([goal] if self.get_cluster(goal) == start_cluster else []))
+        goal_edges = self.get_local_distances(goal, self.cluster_entrances.get(self.get_cluster(goal), []))
+
+        frontier = [(0, 0, start)]
+        tiebreak = 1
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        closed = set()
+
+        while frontier:
+            _, _, current = heappop(frontier)
+            if current in closed:
+                continue
+
+            if current == goal:
+                break
+
+            closed.add(current)
+
+            edges = list(self.edges.get(current, {}).items())
+            if current == start:
+                edges.extend(start_edges.items())
+            if current in goal_edges:
+                edges.append((goal, goal_edges[current]))
+
+            for next, cost in edges:
+                if is_excluded and next != goal and is_excluded(next):
+                    continue
+
+                new_cost = cost_so_far[current] + cost
+                if next not in cost_so_far or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    came_from[next] = current
+                    closed.discard(next)
+                    heappush(frontier, (new_cost + manhattan_distance(next, goal), tiebreak, next))
+                    tiebreak += 1
+
+        if stats is not None:
+            stats['expanded'] = stats.get('expanded', 0) + len(closed)
+
+        if goal not in came_from:
+            return None
+
+        waypoints = []
+        current = goal
+        while current is not None:
+            waypoints.append(current)
+            current = came_from[current]
+        waypoints.reverse()
+        return waypoints
+
+    # Return a 'came_from' map to the goal from the rest of its cluster, with coords relative to the cluster
+    def get_cluster_paths(self, goal):
+        cluster = self.get_cluster(goal)
+        x0, y0, x1, y1 = self.get_cluster_bounds(cluster)
+        return FieldPaths(compute_path_directions(self.compute_cluster_fields(cluster, [goal])[0]), x1 - x0, y1 - y0)
+
+    # Return the cached 'came_from' map to the entrance from the rest of its cluster
+    def get_entrance_paths(self, entrance):
+        if entrance not in self.entrance_paths:
+            self.entrance_paths[entrance] = self.get_cluster_paths(entrance)
+        return self.entrance_paths[entrance]
+
+    # Return the tile by tile path between two tiles in the same cluster, without leaving it.
+    # Paths to and from entrances use the cached paths. Otherwise paths are grown from the start, so a start
+    # the piece is already standing on doesn't need to be passable.
+    def refine_path(self, start, goal):
+        x0, y0, _, _ = self.get_cluster_bounds(self.get_cluster(start))
+        if goal in self.edges and self.passable[start[1], start[0]]:
+            came_from = self.get_entrance_paths(goal)
+            current = start
+        elif start in self.edges:
+            came_from = self.get_entrance_paths(start)
+            current = goal
+        else:
+            came_from = self.get_cluster_paths(start)
+            current = goal
+
+        path = []
+        current = (current[0] - x0, current[1] - y0)
+        while current is not None:
+            path.append((current[0] + x0, current[1] + y0))
+            current = came_from[current]
+
+        if path[0] != start:
+            path.reverse()
+        return path
+
+    # Return the shortest path (or close to it) from the start to the goal, including both ends.
+    # Returns None if there's no path.
+    def get_path(self, start, goal, stats=None):
+        self.update()
+        if not self.passable[goal[1], goal[0]]:
+            return None
+
+        waypoints = self.find_abstract_path(start, goal, stats)
+        if waypoints is None:
+            return None
+
+        path = [start]
+        for current, next in zip(waypoints, waypoints[1:]):
+            if self.get_cluster(current) != self.get_cluster(next):
+                # Stepping across a border
+                path.append(next)
+            else:
+                path.extend(self.refine_path(current, next)[1:])
+        return path
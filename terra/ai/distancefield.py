@@ -0,0 +1,222 @@
+from collections import deque
+
+import numpy as np
+
+# Distance fields: whole-map arrays of the number of steps from every tile to a source tile.
+# Fields are grown as array wavefronts, one ring of tiles per step, rather than tile by tile.
+# Distances are indexed [y, x]. Tiles that can't reach a source are UNREACHABLE.
+UNREACHABLE = -1
+
+# Neighbor offsets (dx, dy), ordered N, W, E, S to match the map's adjacent tile order
+neighbor_offsets = [(0, -1), (-1, 0), (1, 0), (0, 1)]
+
+
+# Return true if the coord is within the bounds of the field
+def is_in_field(field, coord):
+    height, width = field.shape[-2:]
+    return 0 <= coord[0] < width and 0 <= coord[1] < height
+
+
+# Wavefronts are grown over a flattened copy of the passable mask with a one tile impassable border,
+# so stepping off the edge of the map never wraps around to another row.
+def pad_passable(passable):
+    return np.pad(passable, 1, mode='constant', constant_values=False).ravel()
+
+
+# Return the index of the coord in the flattened, padded field
+def get_padded_index(coord, width):
+    return (coord[1] + 1) * (width + 2) + coord[0] + 1
+
+
+# Return the offsets from a tile to each of its children in the flattened, padded field.
+# Ordered so that children whose parent is their N, W, E, then S neighbor come first.
+def get_child_offsets(width):
+    return np.array([width + 2, 1, -1, -(width + 2)])
+
+
+# Compute a separate distance field for each source, all in the same pass.
+# The passable mask is indexed [y, x]. Sources are the start of their own field, even if they aren't passable.
+# Tiles are only included if they're less than max_distance away (if provided).
+# Returns an array of distances, indexed [source, y, x].
+def compute_distance_fields(passable, sources, max_distance=None):
+    height, width = passable.shape
+    padded_size = (height + 2) * (width + 2)
+    padded_passable = pad_passable(passable)
+    child_offsets = get_child_offsets(width)
+
+    # Tiles for every field are numbered field * padded_size + tile, so all fields grow in one set of array operations
+    distances = np.full(len(sources) * padded_size, UNREACHABLE, dtype=np.int32)
+    frontier = np.array([index * padded_size + get_padded_index(source, width)
+                         for index, source in enumerate(sources) if is_in_field(passable, source)], dtype=np.int64)
+    distances[frontier] = 0
+
+    step = 0
+    while len(frontier) > 0:
+        step += 1
+        if max_distance and step >= max_distance:
+            break
+
+        children = (frontier[:, None] + child_offsets).ravel()
+        children = children[padded_passable[children % padded_size] & (distances[children] == UNREACHABLE)]
+        frontier = np.unique(children)
+        distances[frontier] = step
+
+    return distances.reshape(len(sources), height + 2, width + 2)[:, 1:-1, 1:-1]
+
+
+# Compute a single distance field from many sources at once, labelling every tile with its nearest source.
+# Ties go to the source reached through the first neighbor, in N, W, E, S order.
+# If stop_at is provided, stop as soon as that tile has been reached.
+# Returns (distances, labels), both indexed [y, x]. Labels are indexes into sources, or UNREACHABLE.
+def compute_nearest_sources(passable, sources, max_distance=None, stop_at=None):
+    height, width = passable.shape
+    padded_passable = pad_passable(passable)
+    child_offsets = get_child_offsets(width)
+
+    distances = np.full(len(padded_passable), UNREACHABLE, dtype=np.int32)
+    labels = np.full(len(padded_passable), UNREACHABLE, dtype=np.int32)
+
+    for index, source in reversed(list(enumerate(sources))):
+        if is_in_field(passable, source):
+            distances[get_padded_index(source, width)] = 0
+            labels[get_padded_index(source, width)] = index
+    frontier = np.nonzero(distances == 0)[0]
+    stop_index = get_padded_index(stop_at, width) if stop_at and is_in_field(passable, stop_at) else None
+
+    step = 0
+    while len(frontier) > 0:
+        if stop_index is not None and distances[stop_index] != UNREACHABLE:
+            break
+
+        step += 1
+        if max_distance and step >= max_distance:
+            break
+
+        # Each newly reached tile takes the label of its first neighbor on the previous ring
+        reached = []
+        for offset in child_offsets:
+            children = frontier + offset
+            is_new = padded_passable[children] & (distances[children] == UNREACHABLE)
+            children = children[is_new]
+            distances[children] = step
+            labels[children] = labels[frontier[is_new]]
+            reached.append(children)
+        frontier = np.concatenate(reached)
+
+    return distances.reshape(height + 2, width + 2)[1:-1, 1:-1], labels.reshape(height + 2, width + 2)[1:-1, 1:-1]
+
+
+# Return the distance at the coord in the field, or UNREACHABLE if it's off the map or can't reach a source
+def get_field_distance(distances, coord):
+    if is_in_field(distances, coord):
+        return int(distances[coord[1], coord[0]])
+    return UNREACHABLE
+
+
+# Compact direction codes for each tile's next step along the path to the source.
+# Codes 1-4 step to the tile's N, W, E, or S neighbor (neighbor_offsets[code - 1]).
+DIRECTION_NONE = 0
+DIRECTION_SOURCE = 5
+
+
+# Return the direction code of every tile in the distance field, as a row by row bytearray.
+# Each tile steps to its first neighbor (N, W, E, S) that is one step closer to the source.
+def compute_path_directions(distances):
+    height, width = distances.shape
+    padded = np.pad(distances, 1, mode='constant', constant_values=UNREACHABLE)
+
+    directions = np.full((height, width), DIRECTION_NONE, dtype=np.uint8)
+    directions[distances == 0] = DIRECTION_SOURCE
+    for code, (dx, dy) in enumerate(neighbor_offsets, 1):
+        neighbor_distances = padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+        is_next_step = (directions == DIRECTION_NONE) & (distances > 0) & (neighbor_distances == distances - 1)
+        directions[is_next_step] = code
+
+    return bytearray(directions.tobytes())
+
+
+# A read-only 'came_from' map over a field's direction codes, as returned from navigate_all.
+# Looking up a tile that can't reach the source raises a KeyError, the same as a missing 'came_from' entry.
+class FieldPaths:
+    def __init__(self, directions, width, height):
+        self.directions = directions
+        self.width = width
+        self.height = height
+
+    def __getitem__(self, coord):
+        x, y = coord
+        code = self.directions[y * self.width + x] if 0 <= x < self.width and 0 <= y < self.height \
+            else DIRECTION_NONE
+
+        if code == DIRECTION_NONE:
+            raise KeyError(coord)
+        elif code == DIRECTION_SOURCE:
+            return None
+        else:
+            dx, dy = neighbor_offsets[code - 1]
+            return x + dx, y + dy
+
+    def __contains__(self, coord):
+        return self.get(coord, DIRECTION_NONE) != DIRECTION_NONE
+
+    def get(self, coord, default=None):
+        try:
+            return self[coord]
+        except KeyError:
+            return default
+
+
+# Lower distances outwards from tiles that have just become passable, without growing the whole field again.
+# Only tiles whose distance goes down are visited. Opened tiles that no reachable tile is next to are left alone.
+# Returns a lowered copy of the distances, and the set of (x, y) coords whose distance changed.
+def lower_distance_field(distances, passable, opened):
+    height, width = distances.shape
+    lowered = distances.copy()
+    changed = set()
+
+    def is_lower(x, y, distance):
+        return 0 <= x < width and 0 <= y < height and passable[y, x] and \
+            (lowered[y, x] == UNREACHABLE or distance < lowered[y, x])
+
+    frontier = deque()
+    for x, y in opened:
+        neighbor_distances = [int(lowered[y + dy, x + dx]) for dx, dy in neighbor_offsets
+                              if 0 <= x + dx < width and 0 <= y + dy < height and lowered[y + dy, x + dx] != UNREACHABLE]
+        if len(neighbor_distances) > 0 and is_lower(x, y, min(neighbor_distances) + 1):
+            lowered[y, x] = min(neighbor_distances) + 1
+            changed.add((x, y))
+            frontier.append((x, y))
+
+    while frontier:
+        x, y = frontier.popleft()
+        next_distance = int(lowered[y, x]) + 1
+        for dx, dy in neighbor_offsets:
+            if is_lower(x + dx, y + dy, next_distance):
+                lowered[y + dy, x + dx] = next_distance
+                changed.add((x + dx, y + dy))
+                frontier.append((x + dx, y + dy))
+
+    return lowered, changed
+
+
+# Return a copy of the direction codes from compute_path_directions, updated for the distances at the changed
+# coords. Codes of the changed tiles and their neighbors are worked out again, the same way as the whole field is.
+def update_path_directions(directions, distances, changed):
+    height, width = distances.shape
+    directions = bytearray(directions)
+
+    tiles = set(changed)
+    for x, y in changed:
+        tiles.update((x + dx, y + dy) for dx, dy in neighbor_offsets if 0 <= x + dx < width and 0 <= y + dy < height)
+
+    for x, y in tiles:
+        distance = int(distances[y, x])
+        code = DIRECTION_SOURCE if distance == 0 else DIRECTION_NONE
+        if distance > 0:
+            for neighbor_code, (dx, dy) in enumerate(neighbor_offsets, 1):
+                if get_field_distance(distances, (x + dx, y + dy)) == distance - 1:
+                    code = neighbor_code
+                    break
+        directions[y * width + x] = code
+
+    return directions
@@ -1,103 +1,335 @@
-from terra.ai.pathfinder import navigate_all
+from collections import OrderedDict
+
+import numpy as np
+
+from terra.ai.distancefield import compute_distance_fields, compute_nearest_sources, compute_path_directions, \
+    get_field_distance, lower_distance_field, update_path_directions, FieldPaths, UNREACHABLE, DIRECTION_NONE, \
+    DIRECTION_SOURCE
 from terra.engine.gameobject import GameObject
 from terra.event.event import EventType
 from terra.piece.attribute import Attribute
 from terra.piece.movementtype import MovementType
 
 cached_movement_types = [MovementType.GROUND, MovementType.HEAVY, MovementType.HOVER, MovementType.FLYING]
-terraforming_affected_movement_types = [MovementType.GROUND, MovementType.HEAVY, MovementType.HOVER]
+
+# How many bytes of paths each AI's cache may hold before the least recently used paths are thrown out
+default_memory_budget = 16 * 1024 * 1024
+
+
+# Cached paths to a single target: a direction code and a distance for every tile on the map.
+# Paths may be shared between keys, so they're never changed once cached. Repairs make new paths instead.
+# Distances are stored as 16 bit integers, unless the field has paths too long to fit.
+class CachedPaths:
+    def __init__(self, distances, directions=None):
+        self.height, self.width = distances.shape
+        self.directions = directions if directions is not None else compute_path_directions(distances)
+        self.distances = distances.astype(np.int16 if distances.max(initial=0) <= np.iinfo(np.int16).max
+                                          else np.int32)
+
+    # Return new paths with distances lowered through the opened tiles, which have just become passable.
+    # Only the tiles whose distance goes down (and their neighbors' directions) are worked out again.
+    def lower_through(self, passable, opened):
+        distances, changed = lower_distance_field(self.distances, passable, opened)
+        return CachedPaths(distances, update_path_directions(self.directions, distances, changed))
+
+    # Return the number of bytes used by these paths
+    def get_size(self):
+        return len(self.directions) + self.distances.nbytes
+
+    # Return a 'came_from' map over these paths
+    def get_map(self):
+        return FieldPaths(self.directions, self.width, self.height)
+
+    # Return the path from the tile at the packed index (y * width + x) to the target, as packed indexes.
+    # Returns None if the tile can't reach the target.
+    def get_path(self, index):
+        directions = self.directions
+        # Packed index offsets for each direction code
+        steps = (0, -self.width, -1, 1, self.width)
+
+        path = [index]
+        code = directions[index]
+        while code != DIRECTION_SOURCE:
+            if code == DIRECTION_NONE:
+                return None
+            index += steps[code]
+            path.append(index)
+            code = directions[index]
+
+        return path
 
 
 # Cache for AI pathfinding.
-# Stores BFS results for enemies, broken down by movement types.
+# Stores paths to enemies, broken down by movement types.
+# Entries are keyed by (target, movement type, terrain version), so paths for old terrain are never used.
+# Once the cache is over its memory budget, the least recently used paths are evicted.
 class PathCache(GameObject):
-    def __init__(self, piece_manager, map_manager, team):
+    def __init__(self, piece_manager, map_manager, team, memory_budget=default_memory_budget, shared_paths=None):
         super().__init__()
 
         self.piece_manager = piece_manager
         self.map_manager = map_manager
         self.team = team
 
-        # Pathfinding map to a goal, from all start points
-        # self.paths[MovementType][(x, y)] = came_from map
-        self.came_froms = {}
+        # Cached paths, least recently used first. The same paths may be cached under several keys.
+        # self.paths[((x, y), MovementType, terrain version)] = CachedPaths
+        self.paths = OrderedDict()
+        self.memory_budget = memory_budget
+        self.memory_used = 0
 
-        # Actual distances to a goal, from all start points
-        # self.distances[MovementType][(x, y)] = distance map
-        self.distances = {}
+        # How many keys each cached paths object is cached under, so shared paths are only counted once
+        # self.path_references[id(CachedPaths)] = count
+        self.path_references = {}
 
+        # Counters for cache performance
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Nearest enemy to every tile, and the distance to it
+        # self.nearest_targets[MovementType] = (distance array, target index array, targets)
+        self.nearest_targets = {}
+
+        # Current targets for each movement type
+        self.targets = {}
         for movement_type in cached_movement_types:
-            self.came_froms[movement_type] = {}
-            self.distances[movement_type] = {}
+            self.targets[movement_type] = []
+
+        # Start with any paths already computed for another team (see SharedAnalysis)
+        if shared_paths:
+            for key, paths in shared_paths.items():
+                self.__add_paths__(key, paths)
 
         self.generate_paths()
 
     def register_handlers(self, event_bus):
         super().register_handlers(event_bus)
 
-        event_bus.register_handler(EventType.E_TILE_MINED, self.handle_tile_modified)
+        event_bus.register_handler(EventType.E_TERRAIN_CHANGED, self.handle_terrain_changed)
+
+    # Return the key for the paths to the target with the current terrain
+    def get_key(self, target, movement_type):
+        return target, movement_type, self.map_manager.terrain_version
+
+    # Return the cached paths to the target, if any. Counts as a use of the paths.
+    def __get_paths__(self, target, movement_type):
+        key = self.get_key(target, movement_type)
+        paths = self.paths.get(key)
+        if paths:
+            self.hits += 1
+            self.paths.move_to_end(key)
+        else:
+            self.misses += 1
+        return paths
+
+    # Count a new key for the paths. Paths only count against the memory budget once, however many keys they have.
+    def __retain_paths__(self, paths):
+        references = self.path_references.get(id(paths), 0)
+        if references == 0:
+            self.memory_used += paths.get_size()
+        self.path_references[id(paths)] = references + 1
+
+    # Stop counting a key for the paths. Their memory is only freed once no keys are left.
+    def __release_paths__(self, paths):
+        references = self.path_references.pop(id(paths)) - 1
+        if references == 0:
+            self.memory_used -= paths.get_size()
+        else:
+            self.path_references[id(paths)] = references
+
+    # Add paths to the cache, evicting the least recently used paths if we're over budget
+    def __add_paths__(self, key, paths):
+        if key in self.paths:
+            self.__release_paths__(self.paths.pop(key))
+
+        self.paths[key] = paths
+        self.__retain_paths__(paths)
+
+        while self.memory_used > self.memory_budget and len(self.paths) > 1:
+            _, evicted = self.paths.popitem(last=False)
+            self.__release_paths__(evicted)
+            self.evictions += 1
 
-    # When a tile is modified, throw out pathing for GROUND, HEAVY, and HOVER types. (FLYING is fine)
-    def handle_tile_modified(self, event=None):
-        for movement_type in terraforming_affected_movement_types:
-            self.came_froms[movement_type] = {}
-            self.distances[movement_type] = {}
+    # Return counters describing how well the cache is performing
+    def get_stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.paths),
+            'memory_used': self.memory_used,
+        }
+
+    # Group movement types whose passable tiles are the same, so one pass can serve all of them
+    def group_movement_types(self, movement_types):
+        groups = {}
+        for movement_type in movement_types:
+            mask = self.map_manager.passable_masks[movement_type]
+            groups.setdefault(mask.tobytes(), []).append(movement_type)
+
+        return list(groups.values())
+
+    # Compute paths to all the targets in one pass, and cache them for every movement type in the group
+    def compute_paths(self, targets, movement_types):
+        if len(targets) > 0:
+            fields = compute_distance_fields(self.map_manager.passable_masks[movement_types[0]], targets)
+            for index, target in enumerate(targets):
+                paths = CachedPaths(fields[index])
+                for movement_type in movement_types:
+                    self.__add_paths__(self.get_key(target, movement_type), paths)
+
+    # When tiles change, carry over cached paths to the new terrain version.
+    # Paths the changed tiles can't affect are kept as they are. Paths only affected by tiles that have opened up
+    # are repaired locally, by lowering distances outwards from the opened tiles (see CachedPaths.lower_through).
+    # Paths through a tile that has closed, and paths for any older terrain, are thrown out.
+    def handle_terrain_changed(self, event):
+        paths_by_key = self.paths
+        self.paths = OrderedDict()
+        self.memory_used = 0
+        self.path_references = {}
+
+        # Paths shared between movement types are only repaired once, for each way the changed tiles can be passable
+        # repaired[(id(paths), opened tiles)] = CachedPaths
+        repaired = {}
+
+        for (target, movement_type, version), paths in paths_by_key.items():
+            if version == event.version - 1:
+                passable = self.map_manager.passable_masks[movement_type]
+                opened = [(x, y) for x, y in event.coords if passable[y, x]]
+                affected = [(x, y) for x, y in event.coords
+                            if self.__is_field_affected__(paths.distances, passable, x, y)]
+
+                if len(affected) == 0:
+                    version = event.version
+                elif all(passable[y, x] for x, y in affected):
+                    repair_key = (id(paths), tuple(opened))
+                    if repair_key not in repaired:
+                        repaired[repair_key] = paths.lower_through(passable, opened)
+                    paths = repaired[repair_key]
+                    version = event.version
+
+            if version >= event.version:
+                self.paths[(target, movement_type, version)] = paths
+                self.__retain_paths__(paths)
+
+        self.nearest_targets = {}
+
+    # Return true if the changed tile at x, y could change the paths with the provided distances.
+    # Paths are affected if a reachable tile is now closed, or an open tile is now next to a reachable tile.
+    @staticmethod
+    def __is_field_affected__(distances, passable, x, y):
+        distance = get_field_distance(distances, (x, y))
+        if passable[y, x]:
+            return distance == UNREACHABLE and any(get_field_distance(distances, neighbor) != UNREACHABLE
+                                                   for neighbor in ((x, y - 1), (x - 1, y), (x + 1, y), (x, y + 1)))
+        else:
+            return distance > 0
 
     # Generate paths to all enemies and store them.
     # Additionally, generate paths to open resource tiles
-    def generate_paths(self, event=None):
-        pieces = self.piece_manager.get_all_pieces_for_team(self.team)
+    # Paths can be generated for another team's enemies instead, to share the cache between teams.
+    def generate_paths(self, event=None, team=None):
+        team = team or self.team
+        pieces = self.piece_manager.get_all_pieces_for_team(team)
 
         # Targets include enemy pieces to start
-        targets = [(piece.gx, piece.gy) for piece in self.piece_manager.get_all_enemy_pieces(self.team)]
+        targets = list(dict.fromkeys((piece.gx, piece.gy) for piece in self.piece_manager.get_all_enemy_pieces(team)))
 
         # Determine which movement types we need to path for
         movement_types = set([piece.attr(Attribute.MOVEMENT_TYPE) for piece in pieces])\
             .intersection(set(cached_movement_types))
 
-        # For each movement type and enemy, path to the target
-        for movement_type in movement_types:
-            for target in targets:
-                # Check if we already have a path to this target. If so, skip pathing and just use the cache
-                existing_path = self.get_map(target, movement_type)
-                if not existing_path:
-                    self.cache_path(target, movement_type)
+        # For each group of movement types, path to any targets we don't already have a path to
+        for group in self.group_movement_types([movement_type for movement_type in cached_movement_types
+                                                if movement_type in movement_types]):
+            missing_targets = [target for target in targets
+                               if any(self.get_key(target, movement_type) not in self.paths
+                                      for movement_type in group)]
+            self.compute_paths(missing_targets, group)
+
+            for movement_type in group:
+                self.targets[movement_type] = targets
+                self.nearest_targets.pop(movement_type, None)
 
     # Return the 'came_from' map to the target, for the provided movement type.
     def get_map(self, target, movement_type):
-        return self.came_froms.get(movement_type, {}).get(target, None)
+        paths = self.__get_paths__(target, movement_type)
+        return paths.get_map() if paths else None
 
-    # Return the 'distance' map to the target, for the provided movement type.
+    # Return the distance array to the target (indexed [y, x]), for the provided movement type.
     def get_distance(self, target, movement_type):
-        return self.distances.get(movement_type, {}).get(target, None)
+        paths = self.__get_paths__(target, movement_type)
+        return paths.distances if paths else None
+
+    # Return the closest current target to the coord and the distance to it, for the provided movement type.
+    # Returns (None, UNREACHABLE) if no target can be reached.
+    def get_nearest_target(self, coord, movement_type):
+        targets = self.targets.get(movement_type)
+        if not targets:
+            return None, UNREACHABLE
+
+        if movement_type not in self.nearest_targets:
+            distances, labels = compute_nearest_sources(self.map_manager.passable_masks[movement_type], targets)
+            self.nearest_targets[movement_type] = (distances, labels, targets)
+
+        distances, labels, targets = self.nearest_targets[movement_type]
+        label = get_field_distance(labels, coord)
+        if label == UNREACHABLE:
+            return None, UNREACHABLE
+        return targets[label], get_field_distance(distances, coord)
 
     # Return the start among starts with the shortest distance to the target
     def get_shortest_distance_to_target(self, target, starts, movement_type):
-        shortest = 999
-        min_start = starts[0]
+        distances = self.get_distance(target, movement_type)
+        if distances is not None:
+            shortest = 999
+            min_start = starts[0]
 
-        for start in starts:
-            distances = self.get_distance(target, movement_type)
-            if distances:
-                distance = distances.get(start, 999)
-            else:
-                # Just use the manhattan distance (ignoring terrain)
-                distance = abs(start[0] - target[0]) + abs(start[1] - target[1])
+            for start in starts:
+                distance = get_field_distance(distances, start)
+                if distance == UNREACHABLE:
+                    distance = 999
 
-            if distance <= shortest:
-                shortest = distance
-                min_start = start
+                if distance <= shortest:
+                    shortest = distance
+                    min_start = start
 
-        return min_start
+            return min_start
 
-    # Pathfind to the target for all possible contiguous start points, and cache it in 'paths' and 'distances'
-    def cache_path(self, target, movement_type):
-        came_from, distance = navigate_all(target, self.map_manager, movement_type)
+        # Grow outwards from all of the starts that can reach the target at once, until the target is reached
+        passable = self.map_manager.passable_masks.get(movement_type)
+        if passable is not None:
+            reachable_starts = [start for start in starts
+                                if self.map_manager.are_tiles_connected(start, target, movement_type)]
+            if len(reachable_starts) > 0:
+                _, labels = compute_nearest_sources(passable, reachable_starts, stop_at=target)
+                label = get_field_distance(labels, target)
+                if label != UNREACHABLE:
+                    return reachable_starts[label]
+
+        # Just use the manhattan distance (ignoring terrain)
+        return min(reversed(starts), key=lambda start: abs(start[0] - target[0]) + abs(start[1] - target[1]))
+
+    # Return the path from the start to the target for the provided movement type, caching paths to the target
+    # if they aren't cached already. Returns None if the start can't reach the target.
+    def get_path(self, target, start, movement_type):
+        paths = self.__get_paths__(target, movement_type)
+        if not paths:
+            self.compute_paths([target], [movement_type])
+            paths = self.paths[self.get_key(target, movement_type)]
 
-        self.came_froms[movement_type][target] = came_from
-        self.distances[movement_type][target] = distance
+        index = self.map_manager.pack_coord(start[0], start[1])
+        if index is None:
+            return None
 
-        return came_from
+        coords = self.map_manager.coords
+        path = paths.get_path(index)
+        return [coords[index] for index in path] if path is not None else None
+
+    # Pathfind to the target for all possible contiguous start points, and cache it
+    def cache_path(self, target, movement_type):
+        self.compute_paths([target], [movement_type])
+        return self.paths[self.get_key(target, movement_type)].get_map()
 
     def render(self, game_screen, ui_screen):
         super().render(game_screen, ui_screen)
@@ -1,67 +1,200 @@
-from queue import PriorityQueue, Queue
+from collections import deque
+from heapq import heappush, heappop
 
+from terra.ai.clustergraph import get_cluster_graph
 from terra.piece.attribute import Attribute
 
 
 # Utility methods for pathfinding around the map in various ways.
 # This file owes its life to: https://www.redblobgames.com/pathfinding/a-star/introduction.html
 
+# Maps with at least this many tiles find point to point paths hierarchically (see clustergraph.py),
+# instead of searching tile by tile. Set to None to always search tile by tile.
+hierarchical_pathfinding_min_tiles = 200 * 200
 
-# Pathfind a piece to the specified goal
-def navigate(start, goal, map, piece=None, movement_type=None, blocked_coords=None):
-    blocked = blocked_coords if not None else []
+
+# Manhattan distance between two tiles. Never overestimates the number of steps between them.
+def manhattan_distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+# Return a set of the packed indexes of the coords that are on the map
+def pack_coords(coords, map):
+    if not coords:
+        return set()
+    return {map.pack_coord(x, y) for x, y in coords if map.is_on_map(x, y)}
+
+
+# Return a copy of a map keyed by packed tile indexes (see MapManager.pack_coord), keyed by (x, y) coords instead.
+# Packed index values (like 'came_from' entries) are unpacked too.
+def unpack_map(packed, map, unpack_values=False):
+    coords = map.coords
+    if unpack_values:
+        return {coords[index]: coords[value] if value is not None else None for index, value in packed.items()}
+    return {coords[index]: value for index, value in packed.items()}
+
+
+# Return a list of packed tile indexes as (x, y) coords. Returns None if there's no path.
+def unpack_path(path, map):
+    if path is None:
+        return None
+    coords = map.coords
+    return [coords[index] for index in path]
+
+
+# Pathfind a piece to the specified goal, using A*.
+# Paths cost one per step. With a piece, the remaining cost is estimated with its move score (distance to the goal,
+# plus penalties for tiles it'd rather avoid, read from its move cost grid), otherwise with the Manhattan distance.
+# Blocked coords don't change the path (see MoveCostGrid.get_move_score).
+# If stats is provided, the number of tiles expanded is added to stats['expanded'].
+def navigate(start, goal, map, piece=None, movement_type=None, blocked_coords=None, stats=None):
     if piece and not movement_type:
         movement_type = piece.attr(Attribute.MOVEMENT_TYPE)
 
-    frontier = PriorityQueue()
-    frontier.put(start, 0)
+    # Don't bother searching if the goal can't be reached from here at all
+    if not map.is_on_map(start[0], start[1]) or not map.are_tiles_connected(start, goal, movement_type):
+        return {start: None}, {start: 0}
+
+    came_from, cost_so_far = navigate_indexes(map.pack_coord(start[0], start[1]), map.pack_coord(goal[0], goal[1]),
+                                              map, movement_type, piece.get_move_cost_grid() if piece else None, stats)
+    return unpack_map(came_from, map, unpack_values=True), unpack_map(cost_so_far, map)
+
+
+# A* search between two packed tile indexes, which must be on the map. See navigate.
+# Returns the 'came_from' and 'cost_so_far' maps, keyed by packed index.
+def navigate_indexes(start, goal, map, movement_type, cost_grid=None, stats=None):
+    neighbors = map.get_neighbor_table(movement_type)
+    coords = map.coords
+    goal_x, goal_y = coords[goal]
+    if cost_grid is not None:
+        penalties = cost_grid.flat_penalties
+        impeded = cost_grid.flat_impeded
+
+    # Frontier entries are (priority, tiebreak, tile). The tiebreak pops equal priorities first-in first-out.
+    frontier = [(0, 0, start)]
+    tiebreak = 1
 
     came_from = {start: None}
     cost_so_far = {start: 0}
+    closed = set()
+    expanded = 0
+
+    while frontier:
+        _, _, current = heappop(frontier)
 
-    while not frontier.empty():
-        current = frontier.get()
+        # Skip stale entries for tiles we've already expanded
+        if current in closed:
+            continue
 
         if current == goal:
             break
 
-        for next in map.get_valid_adjacent_tiles_for_movement_type(current[0], current[1], movement_type):
-            new_cost = cost_so_far[current] + 1
+        closed.add(current)
+        expanded += 1
+
+        new_cost = cost_so_far[current] + 1
+        for next in neighbors[current]:
             if next not in cost_so_far or new_cost < cost_so_far[next]:
                 cost_so_far[next] = new_cost
+                came_from[next] = current
+                closed.discard(next)
 
-                priority = new_cost + piece.get_move_score(goal, next, blocked) if piece else new_cost
+                x, y = coords[next]
+                distance = abs(goal_x - x) + abs(goal_y - y)
 
                 # If there's an enemy on this tile, and we are susceptible to impedance, we can go no further. Stop here
-                if piece and not piece.is_enemy_at_tile(next):
-                    frontier.put(next, priority)
-                came_from[next] = current
+                if cost_grid is None:
+                    heappush(frontier, (new_cost + distance, tiebreak, next))
+                    tiebreak += 1
+                elif not impeded[next]:
+                    # Same as MoveCostGrid.get_move_score
+                    score = distance + penalties[next]
+                    heappush(frontier, (new_cost + score, tiebreak, next))
+                    tiebreak += 1
+
+    if stats is not None:
+        stats['expanded'] = stats.get('expanded', 0) + expanded
 
     return came_from, cost_so_far
 
 
 # Generate all paths to a goal, as well as all distances to that goal.
 def navigate_all(goal, map, movement_type, max_distance=None):
-    frontier = Queue()
-    frontier.put(goal)
+    if not map.is_on_map(goal[0], goal[1]):
+        return {goal: None}, {goal: 0}
+
+    came_from, distance = navigate_all_indexes(map.pack_coord(goal[0], goal[1]), map, movement_type, max_distance)
+    return unpack_map(came_from, map, unpack_values=True), unpack_map(distance, map)
+
+
+# Breadth-first search outwards from a packed tile index. See navigate_all.
+def navigate_all_indexes(goal, map, movement_type, max_distance=None):
+    neighbors = map.get_neighbor_table(movement_type)
+    frontier = deque([goal])
 
     # Track both distance and where we came from
     came_from = {goal: None}
     distance = {goal: 0}
 
-    while not frontier.empty():
-        current = frontier.get()
+    while frontier:
+        current = frontier.popleft()
+        next_distance = distance[current] + 1
+        if max_distance and next_distance >= max_distance:
+            continue
 
-        for next in map.get_valid_adjacent_tiles_for_movement_type(current[0], current[1], movement_type):
+        for next in neighbors[current]:
             if next not in came_from:
-                if not max_distance or (1 + distance[current] < max_distance):
-                    frontier.put(next)
-                    came_from[next] = current
-                    distance[next] = 1 + distance[current]
+                frontier.append(next)
+                came_from[next] = current
+                distance[next] = next_distance
 
     return came_from, distance
 
 
+# Search outwards from the start for the nearest of the goals, stopping once the closest goals have been reached.
+# With a piece, enemy tiles that would impede it can be moved onto, but not past.
+# Returns the 'came_from' and 'distance' maps from the start, and the list of goals at the shortest distance.
+def navigate_to_nearest(start, goals, map, movement_type, piece=None):
+    if not map.is_on_map(start[0], start[1]):
+        return {start: None}, {start: 0}, [start] if start in goals else []
+
+    came_from, distance, nearest = navigate_to_nearest_indexes(map.pack_coord(start[0], start[1]),
+                                                               pack_coords(goals, map), map, movement_type,
+                                                               piece.get_move_cost_grid() if piece else None)
+    return unpack_map(came_from, map, unpack_values=True), unpack_map(distance, map), unpack_path(nearest, map)
+
+
+# Breadth-first search from a packed tile index to the nearest of a set of packed goal indexes.
+# Enemy tiles on the cost grid (if provided) can be moved onto, but not past. See navigate_to_nearest.
+def navigate_to_nearest_indexes(start, goals, map, movement_type, cost_grid=None):
+    neighbors = map.get_neighbor_table(movement_type)
+    impeded = cost_grid.flat_impeded if cost_grid is not None else None
+
+    came_from = {start: None}
+    distance = {start: 0}
+    frontier = [start]
+    nearest = [start] if start in goals else []
+
+    while frontier and not nearest:
+        next_frontier = []
+        for current in frontier:
+            if impeded is not None and current != start and impeded[current]:
+                continue
+
+            next_distance = distance[current] + 1
+            for next in neighbors[current]:
+                if next not in distance:
+                    came_from[next] = current
+                    distance[next] = next_distance
+                    next_frontier.append(next)
+
+                    if next in goals:
+                        nearest.append(next)
+        frontier = next_frontier
+
+    return came_from, distance, nearest
+
+
 # Given a goal and the 'came_from' map, reconstruct a single path to the goal
 # If there's not actually a path to the destination, returns None.
 def reconstruct_path(start, goal, came_from):
@@ -87,9 +220,59 @@ def reconstruct_breadth_first_path(start, goal, came_from):
     return path
 
 
+# Return true if paths on the map should be found hierarchically
+def use_hierarchical_pathfinding(map):
+    return hierarchical_pathfinding_min_tiles is not None and \
+        map.width * map.height >= hierarchical_pathfinding_min_tiles
+
+
+# Find a path between two tiles hierarchically. A route through cluster entrances is planned first (see
+# clustergraph.py), then each step of it is searched tile by tile with A*, using the move costs.
+# Entrances that are blocked, penalized, or would impede the piece aren't used as waypoints.
+# Blocked is a set of packed indexes. Returns a list of packed indexes, or None if there's no route through the
+# entrances or a step of it can't be refined, in which case the whole map should be searched instead.
+def get_hierarchical_path(start, goal, map, movement_type, cost_grid=None, blocked=None, stats=None):
+    graph = get_cluster_graph(map, movement_type)
+    graph.update()
+    if blocked is None:
+        blocked = set()
+
+    def is_excluded(tile):
+        index = map.pack_coord(tile[0], tile[1])
+        return index in blocked or (cost_grid is not None and
+                                    (cost_grid.flat_impeded[index] or cost_grid.flat_penalties[index] > 0))
+
+    waypoints = graph.find_abstract_path(map.coords[start], map.coords[goal], stats, is_excluded)
+    if waypoints is None:
+        return None
+
+    path = [start]
+    for current, next in zip(waypoints, waypoints[1:]):
+        current_index, next_index = map.pack_coord(current[0], current[1]), map.pack_coord(next[0], next[1])
+        came_from, _ = navigate_indexes(current_index, next_index, map, movement_type, cost_grid, stats)
+        step = reconstruct_path(current_index, next_index, came_from)
+        if step is None:
+            return None
+        path.extend(step[1:])
+    return path
+
+
 # Navigate and reconstruct the optimal path to the goal all in one.
-def get_path_to_destination(start, goal, map, piece, blocked_coords=None):
-    came_from, cost_so_far = navigate(start, goal, map, piece=piece, blocked_coords=blocked_coords)
-    return reconstruct_path(start, goal, came_from)
+# On very large maps, paths are found hierarchically where possible (see get_hierarchical_path). These may be
+# slightly longer than the optimal path.
+def get_path_to_destination(start, goal, map, piece, blocked_coords=None, stats=None, movement_type=None):
+    movement_type = movement_type or piece.attr(Attribute.MOVEMENT_TYPE)
+    if not map.is_on_map(start[0], start[1]) or not map.are_tiles_connected(start, goal, movement_type):
+        return reconstruct_path(start, goal, {start: None})
 
+    start_index = map.pack_coord(start[0], start[1])
+    goal_index = map.pack_coord(goal[0], goal[1])
+    cost_grid = piece.get_move_cost_grid()
+    blocked = pack_coords(blocked_coords, map)
+    if use_hierarchical_pathfinding(map):
+        path = get_hierarchical_path(start_index, goal_index, map, movement_type, cost_grid, blocked, stats)
+        if path is not None:
+            return unpack_path(path, map)
 
+    came_from, _ = navigate_indexes(start_index, goal_index, map, movement_type, cost_grid, stats)
+    return unpack_path(reconstruct_path(start_index, goal_index, came_from), map)
@@ -4,6 +4,9 @@ from enum import Enum
 from terra.ai.task import TaskType, base_task_priority
 from terra.piece.piecearchetype import PieceArchetype
 
+# Seconds an AI may spend planning its turn, unless its personality says otherwise. None for no limit.
+default_planning_budget = 5
+
 
 # Aliases for personality types, and the associated method to create them
 class PersonalityType(Enum):
@@ -24,9 +27,11 @@ class PersonalityType(Enum):
 #   * Retreat Threshold - What health percentage this AI will start ordering units to retreat
 #   * Unit Preference - How much this AI favors specific piece archetypes. e.x.: {PieceArchetype.GROUND: 1.0}
 #   * Research to Consider - How many research items to consider each round
+#   * Planning Budget - How many seconds this AI may spend planning its turn (None for no limit)
 class Personality:
     def __init__(self, personality_type=PersonalityType.DEFAULT, aggressive=1.0, defensive=1.0, constructive=1.0,
-                 scientific=1.0, retreat_threshold=0.6, unit_preference=None, research_to_consider=3, new_unit_tier_priority=3):
+                 scientific=1.0, retreat_threshold=0.6, unit_preference=None, research_to_consider=3, new_unit_tier_priority=3,
+                 planning_budget=default_planning_budget):
         self.personality_type = personality_type
         self.aggressive = aggressive
         self.defensive = defensive
@@ -35,6 +40,7 @@ class Personality:
         self.retreat_threshold = retreat_threshold
         self.research_to_consider = research_to_consider
         self.new_unit_tier_priority = new_unit_tier_priority
+        self.planning_budget = planning_budget
 
         self.unit_preference = unit_preference if unit_preference else {}
 
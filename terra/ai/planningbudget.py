@@ -0,0 +1,30 @@
+from time import perf_counter
+
+
+# Time budget for planning a turn. Planning checks in with the budget as it goes, and wraps up once it's spent.
+# The budget can be paused, so only time spent actually planning counts against it.
+class PlanningBudget:
+    def __init__(self, seconds=None):
+        # Seconds of planning allowed. None for no limit.
+        self.seconds = seconds
+        self.spent = 0
+        self.resumed_at = perf_counter()
+
+    # Stop counting time against the budget
+    def pause(self):
+        if self.resumed_at is not None:
+            self.spent += perf_counter() - self.resumed_at
+            self.resumed_at = None
+
+    # Start counting time against the budget again
+    def resume(self):
+        if self.resumed_at is None:
+            self.resumed_at = perf_counter()
+
+    # Return how many seconds have been spent
+    def get_spent(self):
+        return self.spent + (perf_counter() - self.resumed_at if self.resumed_at is not None else 0)
+
+    # Return true if at least the fraction of the budget has been spent
+    def is_spent(self, fraction=1.0):
+        return self.seconds is not None and self.get_spent() >= self.seconds * fraction
@@ -0,0 +1,180 @@
+from threading import Timer
+from time import perf_counter
+
+from terra.ai import planningworker
+from terra.engine.gameobject import GameObject
+from terra.event.event import EventType, publish_game_event
+from terra.mode import Mode
+
+# Seconds all AI teams have to plan their turn, once planning begins. Teams that haven't finished planning by then
+# submit the orders their worker has confirmed so far, or no new orders if it hasn't got that far yet.
+# Set to None to wait as long as planning takes.
+planning_deadline = 20
+
+
+# Plans the turn for every AI team at once, in planning worker processes (see planningworker.py).
+# The board is snapshotted and analyzed once for all teams (see SharedAnalysis), then each team plans concurrently.
+# Planned orders are applied on the main thread as they arrive. Teams still planning at the deadline fall back to their
+# latest partial orders.
+class PlanningScheduler(GameObject):
+    def __init__(self, ais):
+        # The AI players to plan for, by team. Shared with the PlayerManager, so AIs added or removed are picked up.
+        self.ais = ais
+
+        # Incremented each time we start planning, so results from outdated plans can be ignored
+        self.planning_id = 0
+        self.pending_teams = set()
+        self.start_time = None
+        self.deadline_timer = None
+
+        # How long the last round of planning took: seconds to analyze the board, and per team stats
+        # self.team_stats[team] = {'latency': seconds until orders were applied, 'planning_time': seconds spent
+        #                          planning in the worker, 'timed_out': True if the team missed the deadline,
+        #                          'partial_orders': True if the team submitted partial orders at the deadline,
+        #                          plus the AI's planning stats, see AIPlayer.planning_stats}
+        self.analysis_time = None
+        self.team_stats = {}
+
+        self.debug_print_latency = False
+
+        super().__init__()
+
+    def destroy(self):
+        super().destroy()
+        self.cancel_deadline()
+
+    def register_handlers(self, event_bus):
+        super().register_handlers(event_bus)
+
+        if planningworker.use_process_planning:
+            # When the player submits their turn, plan out all AI turns in worker processes
+            event_bus.register_handler(EventType.AI_REPLAN_TURN, self.begin_planning)
+            event_bus.register_handler(EventType.E_TURN_SUBMITTED, self.begin_planning)
+            event_bus.register_handler(EventType.AI_ORDERS_PLANNED, self.apply_planned_orders)
+            event_bus.register_handler(EventType.AI_PLANNING_DEADLINE, self.handle_planning_deadline)
+
+    def is_accepting_events(self):
+        return self.get_mode() in [Mode.BATTLE, Mode.CAMPAIGN, Mode.LOBBY]
+
+    # Snapshot the board, and start planning for every AI team
+    def begin_planning(self, event=None):
+        if len(self.ais) == 0:
+            return
+
+        self.cancel_deadline()
+        self.planning_id += 1
+        planning_id = self.planning_id
+
+        # Throw out partial orders left over from earlier plans
+        planningworker.collect_partial_orders()
+
+        snapshot = planningworker.capture_planning_snapshot()
+        personalities = {team: ai.personality for team, ai in self.ais.items()}
+        for ai in self.ais.values():
+            ai.is_thinking = True
+
+        self.pending_teams = set(personalities)
+        self.start_time = perf_counter()
+        self.analysis_time = None
+        self.team_stats = {}
+
+        future = planningworker.get_planning_pool().submit(planningworker.analyze_snapshot, snapshot,
+                                                           list(personalities))
+        future.add_done_callback(lambda done: self.plan_teams(done, planning_id, snapshot, personalities))
+
+        if planning_deadline is not None:
+            self.deadline_timer = Timer(planning_deadline, publish_game_event, [EventType.AI_PLANNING_DEADLINE, {
+                'planning_id': planning_id,
+            }])
+            self.deadline_timer.daemon = True
+            self.deadline_timer.start()
+
+    def cancel_deadline(self):
+        if self.deadline_timer:
+            self.deadline_timer.cancel()
+            self.deadline_timer = None
+
+    # Once the board is analyzed, plan each team's turn concurrently. Runs on a pool thread, not the main thread.
+    def plan_teams(self, future, planning_id, snapshot, personalities):
+        if future.cancelled() or planning_id != self.planning_id:
+            return
+
+        exception = future.exception()
+        if exception:
+            self.publish_exception(exception)
+            return
+
+        analysis, self.analysis_time = future.result()
+        for team, personality in personalities.items():
+            team_future = planningworker.get_planning_pool().submit(planningworker.plan_orders_from_snapshot,
+                                                                    snapshot, team, personality, analysis, planning_id)
+            team_future.add_done_callback(lambda done, team=team: self.publish_planned_orders(done, planning_id, team))
+
+    # Pass a team's planned orders back to the main thread. Runs on a pool thread, not the main thread.
+    def publish_planned_orders(self, future, planning_id, team):
+        if future.cancelled():
+            return
+
+        exception = future.exception()
+        if exception:
+            self.publish_exception(exception)
+        else:
+            orders, stats = future.result()
+            publish_game_event(EventType.AI_ORDERS_PLANNED, {
+                'team': team,
+                'planning_id': planning_id,
+                'orders': orders,
+                'stats': stats,
+            })
+
+    # Something's gone wrong, so re-raise this exception with an event in the main thread
+    def publish_exception(self, exception):
+        publish_game_event(EventType.AI_EXCEPTION, {
+            'exception': exception,
+            'exc_info': (type(exception), exception, exception.__traceback__),
+        })
+
+    # Issue a team's planned orders. Orders from outdated plans, or that arrive after the deadline, are ignored.
+    def apply_planned_orders(self, event):
+        if event.planning_id != self.planning_id or event.team not in self.pending_teams:
+            return
+
+        ai = self.ais.get(event.team)
+        if ai:
+            ai.apply_planned_orders(event.orders)
+        self.finish_team(event.team, event.stats)
+
+    # Submit turns for any teams still planning, with the latest orders their worker confirmed (see
+    # AIPlayer.publish_partial_orders), or without new orders if it hasn't published any yet
+    def handle_planning_deadline(self, event):
+        if event.planning_id != self.planning_id:
+            return
+
+        partial_orders = planningworker.collect_partial_orders()
+        for team in list(self.pending_teams):
+            orders = partial_orders.get((self.planning_id, team))
+            ai = self.ais.get(team)
+            if ai and orders is not None:
+                ai.apply_planned_orders(orders)
+            elif ai:
+                ai.submit_turn()
+            self.finish_team(team, {'planning_time': None, 'partial_orders': orders is not None}, timed_out=True)
+
+    # Record how long the team took to plan, and how much of its planning it got through
+    def finish_team(self, team, stats=None, timed_out=False):
+        self.pending_teams.discard(team)
+        self.team_stats[team] = dict(stats or {'planning_time': None},
+                                     latency=perf_counter() - self.start_time,
+                                     timed_out=timed_out)
+
+        if len(self.pending_teams) == 0:
+            self.cancel_deadline()
+
+            if self.debug_print_latency:
+                print("== Planning latency (analysis: {:.0f}ms) ==".format((self.analysis_time or 0) * 1000))
+                for stats_team, stats in self.team_stats.items():
+                    print(stats_team, stats)
+
+    # Return per team planning stats from the last round of planning. See team_stats.
+    def get_stats(self):
+        return dict(self.team_stats)
@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from queue import Empty
+from multiprocessing import get_context
+from time import perf_counter
+
+# AI turns are planned in worker processes, so planning doesn't hold up the game loop (or share the GIL with it).
+# Workers plan from a picklable snapshot of the game state, and hand back serialized orders for the main thread to
+# apply. Set to False to plan on a thread in the main process instead.
+use_process_planning = True
+
+# How many worker processes to plan with. None uses one per spare core.
+planning_worker_count = None
+
+# Shared pool of planning workers, started the first time it's needed
+planning_pool = None
+
+# Queue that workers put partial orders on while they plan, as (planning id, team, orders). Shared with the pool.
+partial_orders_queue = None
+
+
+# Return the shared pool of planning workers, starting it if needed.
+# Workers are spawned fresh (not forked) so they don't inherit the game's window, sound, or event queue.
+def get_planning_pool():
+    global planning_pool, partial_orders_queue
+    if planning_pool is None:
+        worker_count = planning_worker_count or max(1, (os.cpu_count() or 2) - 1)
+        context = get_context("spawn")
+        partial_orders_queue = context.Queue()
+        planning_pool = ProcessPoolExecutor(max_workers=worker_count, mp_context=context,
+                                            initializer=init_planning_worker, initargs=(partial_orders_queue,))
+    return planning_pool
+
+
+# Stop the planning workers, abandoning any planning in progress
+def shut_down_planning_pool():
+    global planning_pool, partial_orders_queue
+    if planning_pool is not None:
+        planning_pool.shutdown(wait=False, cancel_futures=True)
+        planning_pool = None
+        partial_orders_queue = None
+
+
+# Set up a worker process for planning. Workers never open a window or play sounds.
+# Partial orders left on the queue when a worker exits are dropped, rather than holding up the exit.
+def init_planning_worker(queue=None):
+    global partial_orders_queue
+    partial_orders_queue = queue
+    if queue is not None:
+        queue.cancel_join_thread()
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    import pygame
+    from terra.resources.assets import load_assets
+
+    pygame.init()
+    load_assets()
+
+
+# Return a picklable copy of the current game state, to plan from in a worker process
+def capture_planning_snapshot():
+    from terra.managers.session import SESSION, Manager
+    from terra.piece.boardsnapshot import capture_board_snapshot
+
+    board = capture_board_snapshot(SESSION.get(Manager.PIECE), SESSION.get(Manager.MAP), SESSION.get(Manager.TEAM))
+    return SESSION.map_name, SESSION.current_mode, board
+
+
+# Work out the board analysis shared by all the AI teams planning this turn. Runs in a worker process.
+# Returns the SharedAnalysis, and how many seconds it took.
+def analyze_snapshot(snapshot, teams):
+    from terra.ai.sharedanalysis import SharedAnalysis
+    from terra.managers.session import Session, SESSION, Manager
+
+    start_time = perf_counter()
+    Session.set_up_planning_session(snapshot)
+    analysis = SharedAnalysis(SESSION.get(Manager.PIECE), SESSION.get(Manager.MAP), teams)
+
+    return analysis, perf_counter() - start_time
+
+
+# Plan a turn for the team from a game state snapshot, using the shared analysis if provided. Runs in a worker process.
+# The AI plans with the provided personality, including its planning budget.
+# If a planning id is provided, the orders confirmed so far are put on the partial orders queue as planning goes (see
+# AIPlayer.publish_partial_orders), so they can be used if planning doesn't finish in time.
+# Returns a list of (gx, gy, piece type, serialized order) for each of the team's pieces, and the AI's planning stats
+# plus how many seconds planning took in total. Orders are looked up by piece type as well as position, since units
+# can share a tile with a building.
+def plan_orders_from_snapshot(snapshot, team, personality, analysis=None, planning_id=None):
+    from terra.ai.aiplayer import AIPlayer
+    from terra.managers.session import Session
+
+    start_time = perf_counter()
+    Session.set_up_planning_session(snapshot)
+
+    ai_player = AIPlayer(team, personality.personality_type, analysis)
+    ai_player.personality = personality
+    if planning_id is not None and partial_orders_queue is not None:
+        ai_player.partial_orders_listener = lambda orders: partial_orders_queue.put((planning_id, team, orders))
+    ai_player.do_preplanning()
+    ai_player.plan_orders()
+    orders = ai_player.get_planned_orders()
+    stats = dict(ai_player.planning_stats, planning_time=perf_counter() - start_time)
+    ai_player.destroy()
+
+    return orders, stats
+
+
+# Return the latest partial orders put on the queue for each (planning id, team), emptying the queue.
+# Runs in the main process.
+def collect_partial_orders():
+    partial_orders = {}
+    while partial_orders_queue is not None:
+        try:
+            planning_id, team, orders = partial_orders_queue.get_nowait()
+        except Empty:
+            break
+        partial_orders[(planning_id, team)] = orders
+    return partial_orders
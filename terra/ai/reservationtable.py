@@ -0,0 +1,23 @@
+# Tiles that a team's pieces are planned to occupy at the end of the turn.
+# The AI reserves tiles as it confirms each piece's orders, so later pieces can plan around them.
+# Reserved tiles are kept in a set, so checking and reserving tiles doesn't depend on how many are reserved.
+class ReservationTable:
+    def __init__(self, coords=None):
+        self.reserved = set(coords) if coords else set()
+
+    def __contains__(self, coord):
+        return coord in self.reserved
+
+    def __iter__(self):
+        return iter(self.reserved)
+
+    def __len__(self):
+        return len(self.reserved)
+
+    # Reserve a tile for one of our pieces
+    def reserve(self, coord):
+        self.reserved.add(coord)
+
+    # Return true if none of the tiles are reserved yet
+    def are_free(self, coords):
+        return self.reserved.isdisjoint(coords)
@@ -0,0 +1,46 @@
+from terra.ai.pathcache import PathCache, default_memory_budget
+from terra.piece.attribute import Attribute
+from terra.piece.piecesubtype import PieceSubtype
+
+
+# Analysis of the board that every AI team planning the same turn can use, so it's worked out once per turn
+# instead of once per team. Holds no references to the managers, so it can be sent to planning workers.
+class SharedAnalysis:
+    def __init__(self, piece_manager, map_manager, teams):
+        # Distance fields to every team's enemies, keyed like PathCache entries: (target, movement type, version)
+        path_cache = PathCache(piece_manager, map_manager, teams[0], memory_budget=default_memory_budget * len(teams))
+        for team in teams[1:]:
+            path_cache.generate_paths(team=team)
+        self.paths = dict(path_cache.paths)
+        path_cache.destroy()
+
+        # The (target, movement type) pairs each team would have generated paths for itself
+        self.team_keys = {}
+        for team in teams:
+            movement_types = {piece.attr(Attribute.MOVEMENT_TYPE)
+                              for piece in piece_manager.get_all_pieces_for_team(team)}
+            self.team_keys[team] = {((piece.gx, piece.gy), movement_type)
+                                    for piece in piece_manager.get_all_enemy_pieces(team)
+                                    for movement_type in movement_types}
+
+        # Tiles each enemy unit could move about its full range to, for predicting where enemies will go.
+        # self.movable_tiles[(gx, gy, team, piece_type)] = [tiles]
+        self.movable_tiles = {}
+        for piece in piece_manager.__get_all_pieces__():
+            if piece.piece_subtype == PieceSubtype.UNIT and any(team != piece.team for team in teams):
+                movement_range = piece.get_movement_range()
+                self.movable_tiles[(piece.gx, piece.gy, piece.team, piece.piece_type)] = \
+                    piece_manager.reachability.get_movable_tiles(piece.gx, piece.gy,
+                                                                 piece.attr(Attribute.MOVEMENT_TYPE),
+                                                                 movement_range - 1, movement_range,
+                                                                 piece.team, piece.piece_type)
+
+    # Return the paths the team would have generated itself, to start its path cache with.
+    # Paths to other targets are left out, so the team plans exactly as if it had generated its own paths.
+    def get_paths(self, team):
+        team_keys = self.team_keys.get(team, set())
+        return {key: paths for key, paths in self.paths.items() if key[:2] in team_keys}
+
+    # Return the tiles the piece could move about its full range to, or None if they weren't worked out
+    def get_movable_tiles(self, piece):
+        return self.movable_tiles.get((piece.gx, piece.gy, piece.team, piece.piece_type))
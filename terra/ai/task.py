@@ -26,6 +26,9 @@ class TaskType(Enum):
 
 all_archetypes = [archetype for archetype in PieceArchetype]
 
+# Tasks for fighting, as opposed to building up the economy
+combat_task_types = [TaskType.ATTACK_ENEMY, TaskType.HEAL_SELF, TaskType.RETREAT]
+
 # What piece archetypes are eligible for each task
 task_type_to_piece_archetype = {
     TaskType.MOVE_TO_RESOURCE: [PieceArchetype.WORKER],
@@ -97,8 +100,25 @@ class Task:
             TaskType.MINE,
         ]
 
+    # Return the min and max range from the task's tile that the piece should path to
+    def get_destination_range(self, piece):
+        if self.target_adjacent:
+            return 1, 1
+        elif piece.attr(Attribute.DAMAGE_TYPE) == DamageType.RANGED:
+            return piece.attr(Attribute.MIN_RANGE), piece.attr(Attribute.MAX_RANGE)
+        else:
+            return 0, 0
+
+    # Return true if the piece could ever reach a tile to work this task from, ignoring other pieces
+    def is_reachable_by_piece(self, piece, map_manager):
+        movement_type = piece.attr(Attribute.MOVEMENT_TYPE)
+        min_range, max_range = self.get_destination_range(piece)
+        return any(map_manager.are_tiles_connected((piece.gx, piece.gy), destination, movement_type)
+                   for destination in map_manager.get_tiles_in_range(self.tx, self.ty, min_range, max_range,
+                                                                      movement_type))
+
     # Return all pieces for this team that can work this task
-    def get_eligible_pieces_for_task(self, piece_manager):
+    def get_eligible_pieces_for_task(self, piece_manager, map_manager=None):
         pieces = []
         for archetype in task_type_to_piece_archetype[self.task_type]:
             pieces.extend(piece_manager.get_all_pieces_by_archetype(self.team, archetype))
@@ -130,6 +150,10 @@ class Task:
             # Only pieces with the 'mining' attribute can work on this task
             pieces = [piece for piece in pieces if piece.attr(Attribute.MINING)]
 
+        # Pieces that can never get to the task can't work it
+        if map_manager and self.task_type in [TaskType.MOVE_TO_RESOURCE, TaskType.ATTACK_ENEMY, TaskType.MINE]:
+            pieces = [piece for piece in pieces if self.is_reachable_by_piece(piece, map_manager)]
+
         return pieces
 
     # Return a score for this task. Higher values means a lower priority
@@ -223,26 +247,18 @@ class Assignment:
         return "{} with {}. Score: {}".format(self.piece, self.task, self.value)
 
     # Return a list of coords that will be occupied if this assignment is carried out
-    def get_end_position(self, path_cache, planned_occupied_coords):
+    def get_end_position(self, path_cache, reservations):
         if self.task.requires_pathfinding() and len(self.end_pos) == 0:
-            # Pathfind, taking into account the planned occupied coords
+            # Pathfind, taking into account the tiles other pieces have reserved
             destination = (self.tx, self.ty)
-            min_range = 0
-            max_range = 0
-
-            if self.task.target_adjacent:
-                min_range = 1
-                max_range = 1
-            elif self.piece.attr(Attribute.DAMAGE_TYPE) == DamageType.RANGED:
-                min_range = self.piece.attr(Attribute.MIN_RANGE)
-                max_range = self.piece.attr(Attribute.MAX_RANGE)
+            min_range, max_range = self.task.get_destination_range(self.piece)
 
-            path = self.piece.get_path_to_target(destination, path_cache, planned_occupied_coords,
+            path = self.piece.get_path_to_target(destination, path_cache, reservations,
                                                  min_range, max_range, self.piece.attr(Attribute.MOVEMENT_TYPE))
 
             if path:
                 # Step along the path and modify the destination to be the furthest we can go along this path
-                self.tx, self.ty = self.piece.step_along_path(path, planned_occupied_coords)
+                self.tx, self.ty = self.piece.step_along_path(path, reservations)
                 return [(self.tx, self.ty)]
             else:
                 # Return None to indicate no path
@@ -12,6 +12,9 @@ CAMERA_HEIGHT = 240
 GRID_WIDTH = 24
 GRID_HEIGHT = 24
 
+# Size of each pre-rendered terrain chunk, in tiles
+TERRAIN_CHUNK_SIZE = 8
+
 # General constants
 TICK_RATE = 120
 TARGET_FRAME_RATE = 120
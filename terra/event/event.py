@@ -63,6 +63,7 @@ class EventType(Enum):
     E_PIECE_HEALED = auto()
     E_PIECE_ON_INVALID_TERRAIN = auto()
     E_TILE_MINED = auto()
+    E_TERRAIN_CHANGED = auto()
     E_PLAYER_CONCEDED = auto()
     E_TEAM_DEFEATED = auto()
     E_DEATH_AOE = auto()
@@ -108,6 +109,8 @@ class EventType(Enum):
     # AI control events
     AI_REPLAN_TURN = auto()
     AI_EXCEPTION = auto()
+    AI_ORDERS_PLANNED = auto()
+    AI_PLANNING_DEADLINE = auto()
 
 
 # Publish the specified game event, with the data provided.
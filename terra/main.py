@@ -1,5 +1,6 @@
 import pygame
 
+from terra.ai.planningworker import shut_down_planning_pool
 from terra.constants import RESOLUTION_HEIGHT, RESOLUTION_WIDTH, TICK_RATE
 from terra.control.inputcontroller import INPUT_CONTROLLER
 from terra.engine.animatedgameobject import AnimatedGameObject
@@ -134,6 +135,7 @@ class Main:
         self.set_screen_from_mode(Mode.RESULTS, results=event.results)
 
     def quit(self):
+        shut_down_planning_pool()
         pygame.quit()
         self.should_quit = True
 
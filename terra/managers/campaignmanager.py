@@ -4,7 +4,7 @@ from terra.engine.gameobject import GameObject
 from terra.event.event import EventType
 from terra.managers.session import Manager
 from terra.resources.assetloading import get_asset, AssetType
-from terra.map.maputils import get_loadable_maps
+from terra.map.mapcatalog import get_map_catalog
 
 
 # Manager for campaign progress. Reads / writes to the campaign data file.
@@ -27,7 +27,7 @@ class CampaignManager(GameObject):
 # Return a list of completed campaign maps from the progress file
 def load_campaign_progress():
     try:
-        all_maps = get_loadable_maps(AssetType.CAMPAIGN_MAP)
+        all_maps = get_map_catalog().get_loadable_maps(AssetType.CAMPAIGN_MAP)
         progress_path = get_asset(AssetType.ATTRIBUTES, "campaign.cfg")
         progress = []
 
@@ -45,7 +45,7 @@ def load_campaign_progress():
 
 # Record that a map has been cleared
 def save_campaign_progress(map_name):
-    all_maps = get_loadable_maps(AssetType.CAMPAIGN_MAP)
+    all_maps = get_map_catalog().get_loadable_maps(AssetType.CAMPAIGN_MAP)
     progress = load_campaign_progress()
 
     # Trim the map name if necessary (.sav -> .map)
@@ -72,7 +72,7 @@ def save_campaign_progress(map_name):
 
 # Return a list
 def get_open_maps():
-    all_maps = get_loadable_maps(AssetType.CAMPAIGN_MAP)
+    all_maps = get_map_catalog().get_loadable_maps(AssetType.CAMPAIGN_MAP)
     completed_maps = load_campaign_progress()
 
     num_completed = len(completed_maps)
@@ -1,9 +1,14 @@
 from enum import Enum
 
+from terra.map.binarymap import encode_binary_map
 from terra.map.maputils import load_map_from_file, generate_map, parse_map_from_string, map_exists
 from terra.mode import Mode
 from terra.resources.assetloading import AssetType, get_asset
 
+# Write save files in the compact binary format. Map files are always written as text.
+# Off by default, since builds from before the binary format can't open binary saves. Both formats always load.
+use_binary_saves = False
+
 
 class Manager(Enum):
     COMBAT_LOGGER = "combat_logger"
@@ -92,6 +97,29 @@ class Session:
 
         return bitmap, pieces, teams, upgrades, meta
 
+    # Set up a bare session to plan an AI turn in, from a board snapshot of another session's game state.
+    # Only the managers the AI reads the board from are created. See planningworker.py.
+    @staticmethod
+    def set_up_planning_session(snapshot):
+        from terra.map.mapmanager import MapManager
+        from terra.piece.piecemanager import PieceManager
+        from terra.team.teammanager import TeamManager
+
+        map_name, mode, board = snapshot
+
+        global SESSION
+        SESSION.reset()
+        SESSION.map_name = map_name
+        SESSION.current_mode = mode
+        SESSION.managers[Manager.TEAM] = TeamManager(board.serialize_teams(), board.serialize_upgrades())
+        SESSION.managers[Manager.MAP] = MapManager(board.convert_bitmap_from_grid())
+        SESSION.managers[Manager.PIECE] = PieceManager(board.serialize_pieces())
+
+        # Piece strings only hold whole HP, so restore any partial HP from the board
+        for piece, hp in zip(SESSION.get(Manager.PIECE).__get_all_pieces__(), board.hps.tolist()):
+            if piece.hp != hp:
+                piece.hp = hp
+
     # Remove and delete our managers, starting over.
     def reset(self):
         self.is_network_game = False
@@ -152,61 +180,72 @@ class Session:
 
         return metadata
 
-    # Save the current game state to a string
-    def save_game_to_string(self, save=True, autosave=False):
-        # Ask each manager to serialize itself
+    # Ask each manager to serialize itself. Returns the bitmap, pieces, teams, upgrades, and metadata.
+    def serialize_game_state(self):
         bitmap = self.get(Manager.MAP).convert_bitmap_from_grid()
         pieces = self.get(Manager.PIECE).serialize_pieces()
         teams = self.get(Manager.TEAM).serialize_teams()
         upgrades = self.get(Manager.TEAM).serialize_upgrades()
         meta = self.serialize_metadata()
 
+        return bitmap, pieces, teams, upgrades, meta
+
+    # Return the path to save the current game or map to
+    def get_save_path(self, save=True, autosave=False):
         # Strip '.map' from the map name
         save_name = "autosave-" + self.map_name[:-4] if autosave else self.map_name[:-4]
         postfix = ".sav" if save else ".map"
         if self.current_mode == Mode.CAMPAIGN:
-            save_path = get_asset(AssetType.CAMPAIGN_SAVE if save else AssetType.CAMPAIGN_MAP, save_name + postfix)
+            return get_asset(AssetType.CAMPAIGN_SAVE if save else AssetType.CAMPAIGN_MAP, save_name + postfix)
         else:
-            save_path = get_asset(AssetType.SAVE if save else AssetType.MAP, save_name + postfix)
+            return get_asset(AssetType.SAVE if save else AssetType.MAP, save_name + postfix)
+
+    # Save the current game state to a string
+    def save_game_to_string(self, save=True, autosave=False):
+        bitmap, pieces, teams, upgrades, meta = self.serialize_game_state()
 
         # Serialize to a string
-        lines = ""
+        lines = []
         # Append map
         for row in bitmap:
-            line = ""
-            for column in row:
-                line += "{} ".format(column)
-            line += "\n"
-            lines += line
+            lines.append("".join("{} ".format(column) for column in row))
 
         # Append pieces
-        lines += "# Pieces\n"
-        for piece in pieces:
-            lines += piece + "\n"
+        lines.append("# Pieces")
+        lines.extend(pieces)
 
         # Append teams
-        lines += "# Teams\n"
-        for team in teams:
-            lines += team + "\n"
+        lines.append("# Teams")
+        lines.extend(teams)
 
         # Append upgrades
-        lines += "# Upgrades\n"
-        for upgrade in upgrades:
-            lines += upgrade + "\n"
+        lines.append("# Upgrades")
+        lines.extend(upgrades)
 
         # Append any meta information
-        lines += "# Meta\n"
+        lines.append("# Meta")
         for metadata in meta:
-            lines += "{} {} \n".format(metadata[0], metadata[1])
+            lines.append("{} {} ".format(metadata[0], metadata[1]))
+
+        return "\n".join(lines) + "\n", self.get_save_path(save, autosave)
 
-        return lines, save_path
+    # Save the current game state to bytes, in the binary map format
+    def save_game_to_bytes(self, save=True, autosave=False):
+        bitmap, pieces, teams, upgrades, meta = self.serialize_game_state()
+        return encode_binary_map(bitmap, pieces, teams, upgrades, meta), self.get_save_path(save, autosave)
 
     # Save the current state to a save file
     def save_game_to_file(self, autosave=False):
-        lines, save_path = self.save_game_to_string(save=True, autosave=autosave)
+        if use_binary_saves:
+            data, save_path = self.save_game_to_bytes(save=True, autosave=autosave)
+
+            with open(save_path, 'wb') as save_file:
+                save_file.write(data)
+        else:
+            lines, save_path = self.save_game_to_string(save=True, autosave=autosave)
 
-        with open(save_path, 'w') as save_file:
-            save_file.write(lines)
+            with open(save_path, 'w') as save_file:
+                save_file.write(lines)
 
     # Save the current state to a map file
     def save_map_to_file(self, autosave=False):
@@ -0,0 +1,124 @@
+from struct import Struct
+
+from terra.map.mapreadingstep import MapReadingStep, map_sections
+
+# Compact binary encoding for map and save files, used alongside the plain text format.
+#   Header:         magic (4 bytes), version (uint8), width (uint16), height (uint16), section count (uint8)
+#   Section table:  section id (uint8), offset from start of file (uint32), length (uint32) for each section
+#   Sections:       MAP is the raw tile grid, one byte per tile, row by row.
+#                   PIECES, TEAMS, UPGRADES, and META are newline separated UTF-8 text, one entry per line.
+# Only the header and section table are read up front. Sections are read and parsed when they're asked for.
+BINARY_MAP_MAGIC = b"TRRA"
+BINARY_MAP_VERSION = 1
+
+header_format = Struct("<4sBHHB")
+section_format = Struct("<BII")
+
+# Section ids for each part of the map
+section_ids = {
+    MapReadingStep.MAP: 0,
+    MapReadingStep.PIECES: 1,
+    MapReadingStep.TEAMS: 2,
+    MapReadingStep.UPGRADES: 3,
+    MapReadingStep.META: 4,
+}
+
+
+# Return true if the provided data (or the start of it) is in the binary map format
+def is_binary_map(data):
+    return data[:len(BINARY_MAP_MAGIC)] == BINARY_MAP_MAGIC
+
+
+# Encode a map's bitmap, pieces, teams, upgrades, and meta into the binary format.
+# Meta may be a dict, or a list of (key, value) pairs.
+def encode_binary_map(bitmap, pieces, teams, upgrades, meta):
+    height = len(bitmap)
+    width = len(bitmap[0]) if height > 0 else 0
+
+    meta_pairs = meta.items() if isinstance(meta, dict) else meta
+
+    sections = [
+        (MapReadingStep.MAP, bytes(tile for row in bitmap for tile in row)),
+        (MapReadingStep.PIECES, "\n".join(pieces).encode("utf-8")),
+        (MapReadingStep.TEAMS, "\n".join(teams).encode("utf-8")),
+        (MapReadingStep.UPGRADES, "\n".join(upgrades).encode("utf-8")),
+        (MapReadingStep.META, "\n".join("{} {}".format(key, value) for key, value in meta_pairs).encode("utf-8")),
+    ]
+
+    header = header_format.pack(BINARY_MAP_MAGIC, BINARY_MAP_VERSION, width, height, len(sections))
+
+    offset = header_format.size + section_format.size * len(sections)
+    section_table = []
+    for step, body in sections:
+        section_table.append(section_format.pack(section_ids[step], offset, len(body)))
+        offset += len(body)
+
+    return b"".join([header] + section_table + [body for _, body in sections])
+
+
+# Parse the body of a single section into the same structures parse_map_from_string returns
+def parse_section(step, body, width, height):
+    if step == MapReadingStep.MAP:
+        return [list(body[y * width:(y + 1) * width]) for y in range(height)]
+
+    lines = [line for line in body.decode("utf-8").split("\n") if line]
+    if step == MapReadingStep.META:
+        meta = {}
+        for line in lines:
+            values = line.split(' ')
+            if len(values) == 2:
+                meta[values[0]] = values[1]
+        return meta
+    else:
+        return lines
+
+
+# Reader for a map in the binary format, either from a file path or from bytes already in memory.
+# Only the header is read on creation. Each section is read and parsed the first time it's asked for.
+class BinaryMapReader:
+    def __init__(self, path=None, data=None):
+        self.path = path
+        self.data = data
+
+        header = self.read_bytes(0, header_format.size)
+        magic, self.version, self.width, self.height, num_sections = header_format.unpack(header)
+        if magic != BINARY_MAP_MAGIC or self.version > BINARY_MAP_VERSION:
+            raise IOError("Unsupported map format (version {})".format(self.version))
+
+        # sections[MapReadingStep] = (offset, length)
+        self.sections = {}
+        steps_by_id = {section_id: step for step, section_id in section_ids.items()}
+        table = self.read_bytes(header_format.size, section_format.size * num_sections)
+        for section_id, offset, length in section_format.iter_unpack(table):
+            # Unknown sections are from newer versions, and can be skipped
+            if section_id in steps_by_id:
+                self.sections[steps_by_id[section_id]] = (offset, length)
+
+        # Already parsed sections
+        self.parsed_sections = {}
+
+    # Read length bytes at the offset, from the in-memory data or the file
+    def read_bytes(self, offset, length):
+        if self.data is not None:
+            return self.data[offset:offset + length]
+        else:
+            with open(self.path, 'rb') as map_file:
+                map_file.seek(offset)
+                return map_file.read(length)
+
+    # Return the size of the map, as (width, height)
+    def get_size(self):
+        return self.width, self.height
+
+    # Return the parsed contents of a section, reading it if we haven't already
+    def get_section(self, step):
+        if step not in self.parsed_sections:
+            offset, length = self.sections.get(step, (0, 0))
+            body = self.read_bytes(offset, length) if length > 0 else b""
+            self.parsed_sections[step] = parse_section(step, body, self.width, self.height)
+
+        return self.parsed_sections[step]
+
+    # Return the full map, in the same form as parse_map_from_string
+    def read_map(self):
+        return tuple(self.get_section(step) for step in map_sections)
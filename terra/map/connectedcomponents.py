@@ -0,0 +1,115 @@
+import numpy as np
+
+
+# Label every passable tile with the smallest flat index (y * width + x) of any tile it's connected to.
+# Connected tiles are merged in bulk, hooking the larger of each pair of roots onto the smaller, then flattening
+# every tile's parent to its root, until no passable neighbors have different roots.
+# Impassable tiles are left as their own root. Returns the flat array of roots.
+def label_components(passable):
+    height, width = passable.shape
+    flat_passable = passable.ravel()
+    parents = np.arange(height * width)
+
+    # Pairs of passable tiles next to each other, horizontally then vertically
+    indexes = parents.reshape(height, width)
+    horizontal = passable[:, :-1] & passable[:, 1:]
+    vertical = passable[:-1, :] & passable[1:, :]
+    a = np.concatenate([indexes[:, :-1][horizontal], indexes[:-1, :][vertical]])
+    b = np.concatenate([indexes[:, 1:][horizontal], indexes[1:, :][vertical]])
+
+    while True:
+        root_a = parents[a]
+        root_b = parents[b]
+        is_split = root_a != root_b
+        if not is_split.any():
+            break
+
+        np.minimum.at(parents, np.maximum(root_a, root_b)[is_split], np.minimum(root_a, root_b)[is_split])
+
+        # Flatten, so every tile points straight at its root
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+
+    parents[~flat_passable] = np.flatnonzero(~flat_passable)
+    return parents
+
+
+# Connected regions of passable tiles for a single movement type.
+# Used to reject pathfinding requests between tiles that can never reach each other, before searching.
+# Newly opened tiles (e.g. mined meteors) are merged into their neighbors' regions with union-find.
+# Closing a tile can split a region, so the labels are rebuilt the next time they're used.
+class ConnectedComponents:
+    def __init__(self, map, movement_type):
+        self.map = map
+        self.movement_type = movement_type
+
+        # Union-find parent of each tile, by flat index (y * width + x)
+        self.parents = None
+        # Copy of the passable mask the labels are for
+        self.passable = None
+        self.is_dirty = True
+
+    # Relabel the whole map
+    def rebuild(self):
+        self.passable = self.map.passable_masks[self.movement_type].copy()
+        self.parents = label_components(self.passable).tolist()
+        self.is_dirty = False
+
+    # Update the labels after the tile at (gx, gy) has changed
+    def update_tile(self, gx, gy):
+        if self.is_dirty:
+            return
+
+        is_passable = bool(self.map.passable_masks[self.movement_type][gy, gx])
+        was_passable = bool(self.passable[gy, gx])
+        if is_passable == was_passable:
+            return
+
+        self.passable[gy, gx] = is_passable
+        if is_passable:
+            index = gy * self.map.width + gx
+            self.parents[index] = index
+            for x, y in self.get_passable_neighbors(gx, gy):
+                self.union(index, y * self.map.width + x)
+        else:
+            self.is_dirty = True
+
+    def get_passable_neighbors(self, gx, gy):
+        return [(x, y) for x, y in ((gx, gy - 1), (gx - 1, gy), (gx + 1, gy), (gx, gy + 1))
+                if 0 <= x < self.map.width and 0 <= y < self.map.height and self.passable[y, x]]
+
+    # Return the root of the tile's region, halving the path to it along the way
+    def find(self, index):
+        parents = self.parents
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    # Merge the regions of two tiles, keeping the smaller root
+    def union(self, a, b):
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a != root_b:
+            self.parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    # Return the regions a piece on the tile could move through: its own region if it's passable,
+    # otherwise the regions of its passable neighbors (pieces can always step off the tile they're on).
+    def get_regions(self, coord):
+        if self.is_dirty:
+            self.rebuild()
+
+        gx, gy = coord
+        if not (0 <= gx < self.map.width and 0 <= gy < self.map.height):
+            return set()
+        elif self.passable[gy, gx]:
+            return {self.find(gy * self.map.width + gx)}
+        else:
+            return {self.find(y * self.map.width + x) for x, y in self.get_passable_neighbors(gx, gy)}
+
+    # Return true if there could be a path between the two tiles. False means there's definitely no path.
+    def is_connected(self, a, b):
+        return a == b or not self.get_regions(a).isdisjoint(self.get_regions(b))
@@ -0,0 +1,209 @@
+import pickle
+from os import stat, replace
+from threading import Thread, Lock, current_thread
+
+from pygame import image
+
+from terra.map.mapreadingstep import MapReadingStep
+from terra.map.maputils import get_loadable_maps, open_map_reader
+from terra.map.minimap import generate_minimap, summarize_teams, draw_map_preview_from_summary
+from terra.resources.assetloading import AssetType, get_asset
+
+# Bump this when the catalog entry format changes, so stale catalogs are thrown away
+CATALOG_VERSION = 1
+CATALOG_FILENAME = "mapcatalog.cache"
+
+# Asset types the catalog keeps track of
+catalogued_asset_types = [
+    AssetType.MAP,
+    AssetType.SAVE,
+    AssetType.CAMPAIGN_MAP,
+    AssetType.CAMPAIGN_SAVE,
+]
+
+
+# Summary of a single map or save file: its size, teams, piece counts, and a pre-rendered minimap thumbnail.
+# Entries are keyed by path, and only valid for the modified time of the file they were built from.
+# Built from a map reader, reading only the map, pieces and teams sections.
+class MapCatalogEntry:
+    def __init__(self, path, mtime, reader):
+        self.path = path
+        self.mtime = mtime
+
+        self.width, self.height = reader.get_size()
+        bitmap = reader.get_section(MapReadingStep.MAP)
+        pieces = reader.get_section(MapReadingStep.PIECES)
+        teams = reader.get_section(MapReadingStep.TEAMS)
+        self.translated_teams, self.piece_totals = summarize_teams(pieces, teams)
+
+        # Thumbnails are stored as raw RGBA bytes so the entry can be saved to disk
+        thumbnail = generate_minimap(bitmap, pieces)
+        self.thumbnail_size = thumbnail.get_size()
+        self.thumbnail_bytes = image.tostring(thumbnail, "RGBA")
+
+        self.thumbnail = None
+        self.previews = {}
+
+    # Don't save any surfaces to disk, they're rebuilt from the thumbnail bytes on demand
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['thumbnail'] = None
+        state['previews'] = {}
+        return state
+
+    # Return the minimap thumbnail for the map
+    def get_thumbnail(self):
+        if self.thumbnail is None:
+            self.thumbnail = image.fromstring(self.thumbnail_bytes, self.thumbnail_size, "RGBA")
+        return self.thumbnail
+
+    # Return a full preview of the map at the provided size, rendering it only once
+    def get_preview(self, container_width, container_height):
+        key = (container_width, container_height)
+        if key not in self.previews:
+            self.previews[key] = draw_map_preview_from_summary(container_width, container_height, self.get_thumbnail(),
+                                                               self.translated_teams, self.piece_totals)
+        return self.previews[key]
+
+
+# Persistent catalog of every loadable map and save file.
+# Menus read map names and previews from here instead of walking directories and parsing map files.
+# The catalog is saved to disk, and refreshed incrementally in the background: only new or changed files are parsed.
+class MapCatalog:
+    def __init__(self):
+        self.catalog_path = get_asset(AssetType.ATTRIBUTES, CATALOG_FILENAME)
+
+        # entries[path] = MapCatalogEntry
+        self.entries = self.load_catalog_from_file()
+        # Cached map names for each asset type, and the directory modified time they were listed at
+        self.map_names = {}
+        self.directory_mtimes = {}
+
+        self.lock = Lock()
+        self.refresh_thread = None
+        self.refresh_requested = False
+
+    def load_catalog_from_file(self):
+        try:
+            with open(self.catalog_path, 'rb') as catalog_file:
+                version, entries = pickle.load(catalog_file)
+                if version == CATALOG_VERSION:
+                    return entries
+        except (IOError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError) as e:
+            print("Unable to load map catalog. Rebuilding it. Exception: {}".format(e))
+        return {}
+
+    def save_catalog_to_file(self):
+        try:
+            with self.lock:
+                data = pickle.dumps((CATALOG_VERSION, self.entries))
+
+            # Write to a temporary file first, so an interrupted save doesn't leave a broken catalog behind
+            temp_path = self.catalog_path + ".tmp"
+            with open(temp_path, 'wb') as catalog_file:
+                catalog_file.write(data)
+            replace(temp_path, self.catalog_path)
+        except (IOError, OSError) as e:
+            print("Unable to save map catalog. Exception: {}".format(e))
+
+    # Return a list of filenames of loadable maps. The directory is only re-listed when its contents change.
+    def get_loadable_maps(self, asset_type=AssetType.MAP):
+        try:
+            directory_mtime = stat(get_asset(asset_type, "")).st_mtime
+        except OSError:
+            directory_mtime = None
+
+        if asset_type not in self.map_names or self.directory_mtimes.get(asset_type) != directory_mtime:
+            self.map_names[asset_type] = get_loadable_maps(asset_type)
+            self.directory_mtimes[asset_type] = directory_mtime
+
+        # Pick up any changed files in the background
+        self.refresh_in_background()
+
+        return self.map_names[asset_type]
+
+    # Return the catalog entry for the provided map, building it now if we haven't seen the map before or it's
+    # changed since. Returns None if the map can't be read.
+    def get_entry(self, mapname, asset_type=AssetType.MAP):
+        return self.update_entry(get_asset(asset_type, mapname))
+
+    # Build a new entry for the map at the provided path if the file has changed since we last saw it.
+    # Returns the current entry, or None if the map can't be read. A malformed map can fail in all sorts of ways, so
+    # any exception just drops that map from the catalog.
+    def update_entry(self, path):
+        try:
+            mtime = stat(path).st_mtime
+            entry = self.entries.get(path)
+            if entry is None or entry.mtime != mtime:
+                entry = MapCatalogEntry(path, mtime, open_map_reader(path))
+                with self.lock:
+                    self.entries[path] = entry
+            return entry
+        except Exception as e:
+            print("Unable to catalog map {}. Exception: {}".format(path, e))
+            with self.lock:
+                self.entries.pop(path, None)
+            return None
+
+    # Bring the whole catalog up to date: catalog new or changed files, and drop deleted ones.
+    # Returns true if anything changed.
+    def refresh(self):
+        changed = False
+        paths = set()
+        for asset_type in catalogued_asset_types:
+            for mapname in get_loadable_maps(asset_type):
+                path = get_asset(asset_type, mapname)
+                paths.add(path)
+
+                previous_entry = self.entries.get(path)
+                if self.update_entry(path) is not previous_entry:
+                    changed = True
+
+        with self.lock:
+            for path in [path for path in self.entries if path not in paths]:
+                del self.entries[path]
+                changed = True
+
+        return changed
+
+    # Refresh the catalog on a background thread, saving it if anything changed.
+    # If a refresh is already running, it'll go around again once it's done.
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refresh_thread:
+                self.refresh_requested = True
+                return
+
+            self.refresh_requested = False
+            self.refresh_thread = Thread(target=self.do_background_refresh, daemon=True)
+            self.refresh_thread.start()
+
+    # Runs on the refresh thread. The thread is always cleared when it stops, even if refreshing fails, so later
+    # refreshes can start a new one.
+    def do_background_refresh(self):
+        try:
+            while True:
+                if self.refresh():
+                    self.save_catalog_to_file()
+
+                with self.lock:
+                    if not self.refresh_requested:
+                        self.refresh_thread = None
+                        return
+                    self.refresh_requested = False
+        finally:
+            with self.lock:
+                if self.refresh_thread is current_thread():
+                    self.refresh_thread = None
+
+
+# Shared map catalog, loaded from disk the first time it's needed
+map_catalog = None
+
+
+# Return the shared map catalog, loading it if needed
+def get_map_catalog():
+    global map_catalog
+    if map_catalog is None:
+        map_catalog = MapCatalog()
+    return map_catalog
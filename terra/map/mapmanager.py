@@ -1,12 +1,66 @@
+import numpy as np
+from pygame import Surface, SRCALPHA
+
+from terra.constants import GRID_WIDTH, GRID_HEIGHT, TERRAIN_CHUNK_SIZE
+from terra.engine.animatedgameobject import AnimatedGameObject
 from terra.engine.gameobject import GameObject
-from terra.event.event import EventType
+from terra.event.event import EventType, publish_game_event
+from terra.managers.session import Manager
+from terra.map.connectedcomponents import ConnectedComponents
 from terra.map.maputils import generate_bitmap_from_simplex_noise
-from terra.map.tile import Tile
+from terra.map.tile import tile_flyweights
 from terra.map.tiletype import TileType
 from terra.piece.movementtype import movement_types, MovementAttribute
 from terra.resources.assets import spr_grid
 from terra.settings import SETTINGS, Setting
 
+# Cache of (dx, dy) offsets for each (min_range, max_range) diamond. See get_range_offsets.
+range_offsets = {}
+
+
+# Return the offsets of all tiles within the min and max range (manhattan distance) of a center tile.
+# Offsets are ordered top to bottom, then left to right, matching a row-by-row scan of the map.
+def get_range_offsets(min_range, max_range):
+    offsets = range_offsets.get((min_range, max_range))
+    if offsets is None:
+        offsets = []
+        for dy in range(-max_range, max_range + 1):
+            for dx in range(-max_range, max_range + 1):
+                if min_range <= abs(dx) + abs(dy) <= max_range:
+                    offsets.append((dx, dy))
+
+        offsets = tuple(offsets)
+        range_offsets[(min_range, max_range)] = offsets
+
+    return offsets
+
+
+# Return a boolean lookup table indexed by tile code, True for each of the provided tile types.
+def build_tile_lookup(tile_types):
+    lookup = np.zeros(max(tile_type.value for tile_type in TileType) + 1, dtype=bool)
+    for tile_type in tile_types:
+        lookup[tile_type.value] = True
+
+    return lookup
+
+
+# Lookup tables for each movement type, from tile code to whether it's passable / traversable.
+passable_lookups = {movement_type: build_tile_lookup(attributes[MovementAttribute.PASSABLE])
+                    for movement_type, attributes in movement_types.items()}
+traversable_lookups = {movement_type: build_tile_lookup(attributes[MovementAttribute.TRAVERSABLE])
+                       for movement_type, attributes in movement_types.items()}
+
+# Tile types, indexed by their tile code
+tile_types_by_code = [None] * (max(tile_type.value for tile_type in TileType) + 1)
+for tile_type in TileType:
+    tile_types_by_code[tile_type.value] = tile_type
+
+# Tile codes that aren't generally passable, and don't count towards the map size
+impassable_tile_codes = [TileType.SEA.value, TileType.MOUNTAIN.value]
+
+# Tile codes that don't produce a coastline on adjacent SEA tiles
+edge_tile_codes = [TileType.SEA.value, TileType.COAST.value]
+
 
 # A single map containing tiles, organized into a grid.
 class MapManager(GameObject):
@@ -23,79 +77,134 @@ class MapManager(GameObject):
         self.height = len(self.bitmap)
         self.width = len(self.bitmap[0])
 
-        # Serialize the map to Tile objects (from integers)
-        self.tile_grid = self.convert_grid_from_bitmap(self.bitmap)
+        # Tile codes for the whole map, indexed [y, x]
+        self.terrain = np.array(self.bitmap, dtype=np.uint8)
 
-        # Adjust the grid opacity
-        spr_grid.set_alpha(256 * SETTINGS.get(Setting.GRID_OPACITY) / 100)
+        # Tiles can also be referred to by a single packed index (y * width + x), which is cheaper to hash and store
+        # than an (x, y) tuple. Pathfinding works with packed indexes internally. See pack_coord.
+        # self.coords[index] = (x, y)
+        self.coords = [(x, y) for y in range(self.height) for x in range(self.width)]
 
-    def destroy(self):
-        super().destroy()
-        for row in self.tile_grid:
-            for tile in row:
-                tile.destroy()
+        # Passability masks for each movement type, indexed [y, x]. Kept in sync with the terrain.
+        self.passable_masks = {}
+        self.traversable_masks = {}
+        self.update_movement_masks()
 
-            del row
+        # Incremented every time the terrain changes
+        self.terrain_version = 0
 
-        del self.tile_grid
-        self.tile_grid = []
+        # Connected regions of passable tiles for each movement type, built the first time they're needed
+        self.connected_components = {}
 
-    def register_handlers(self, event_bus):
-        event_bus.register_handler(EventType.E_TILE_MINED, self.mine_tile)
+        # Packed indexes of each tile's valid adjacent tiles, built the first time they're needed.
+        # self.neighbor_tables[(movement type, include traversable)][index] = [neighbor index, ...]
+        self.neighbor_tables = {}
 
-    # Given a 2D array of ints, convert it to a 2D array of Tile objects
-    def convert_grid_from_bitmap(self, bitmap):
-        grid = []
+        # Coast sprite indices for each tile, indexed [y, x]. See calculate_coast_index.
+        self.coast_indices = np.zeros((self.height, self.width), dtype=np.uint8)
+        self.update_coast_indices()
 
-        for y in range(self.height):
-            row = []
-            for x in range(self.width):
-                tile = Tile(self, bitmap[y][x], x, y)
-                row.append(tile)
-            grid.append(row)
+        # Pre-rendered terrain, split into chunks of TERRAIN_CHUNK_SIZE tiles.
+        # chunk_surfaces[(chunk_x, chunk_y)][animation_frame] = Surface
+        # Dirty chunks are dropped from the cache, and re-rendered the next time they're visible.
+        self.chunks_wide = (self.width + TERRAIN_CHUNK_SIZE - 1) // TERRAIN_CHUNK_SIZE
+        self.chunks_high = (self.height + TERRAIN_CHUNK_SIZE - 1) // TERRAIN_CHUNK_SIZE
+        self.chunk_surfaces = {}
 
-        return grid
+        # Adjust the grid opacity
+        self.grid_opacity = None
+        self.set_grid_opacity(SETTINGS.get(Setting.GRID_OPACITY))
+
+    def destroy(self):
+        super().destroy()
+        self.chunk_surfaces = {}
+
+    def register_handlers(self, event_bus):
+        event_bus.register_handler(EventType.E_TILE_MINED, self.mine_tile)
 
     # Serialize ourselves into a bitmap (2D array of ints)
     def convert_bitmap_from_grid(self):
-        bitmap = []
-        for y in range(self.height):
-            row = []
-            for x in range(self.width):
-                tile = self.get_tile_at(x, y)
-                row.append(tile.tile_type.value)
-            bitmap.append(row)
-
-        return bitmap
-
-    # Return a flattened list of all tiles in the map
-    def get_all_tiles(self):
-        all_tiles = []
-        for tiles in self.tile_grid:
-            for tile in tiles:
-                all_tiles.append(tile)
-        return all_tiles
-
-    # Return the tile at the specified grid location.
+        return self.terrain.tolist()
+
+    # Regenerate the passable and traversable masks for every movement type.
+    # If a tile is provided, only update the masks at that tile.
+    def update_movement_masks(self, gx=None, gy=None):
+        if gx is None or gy is None:
+            for movement_type in movement_types:
+                self.passable_masks[movement_type] = passable_lookups[movement_type][self.terrain]
+                self.traversable_masks[movement_type] = traversable_lookups[movement_type][self.terrain]
+        else:
+            tile_code = self.terrain[gy, gx]
+            for movement_type in movement_types:
+                self.passable_masks[movement_type][gy, gx] = passable_lookups[movement_type][tile_code]
+                self.traversable_masks[movement_type][gy, gx] = traversable_lookups[movement_type][tile_code]
+
+    # Return an index corresponding to the number of adjacent 'land' tiles.
+    # Use a 4-bit address to determine the coast sprite to use. Each direction is one binary place: NESW
+    # 0=no coast, 1=yes coast. The map border counts as sea.
+    def calculate_coast_index(self, gx, gy):
+        coast_index = 0
+        if gy > 0 and self.terrain[gy - 1, gx] not in edge_tile_codes:
+            coast_index += 8
+        if gx < self.width - 1 and self.terrain[gy, gx + 1] not in edge_tile_codes:
+            coast_index += 4
+        if gy < self.height - 1 and self.terrain[gy + 1, gx] not in edge_tile_codes:
+            coast_index += 2
+        if gx > 0 and self.terrain[gy, gx - 1] not in edge_tile_codes:
+            coast_index += 1
+
+        return coast_index
+
+    # Recalculate cached coast indices for the whole map.
+    # If a tile is provided, only recalculate that tile and its neighbors.
+    def update_coast_indices(self, gx=None, gy=None):
+        if gx is None or gy is None:
+            # Pad the map with sea tiles, so the border counts as sea
+            land = np.pad(~np.isin(self.terrain, edge_tile_codes), 1, constant_values=False)
+            self.coast_indices = (land[:-2, 1:-1] * 8 + land[1:-1, 2:] * 4 +
+                                  land[2:, 1:-1] * 2 + land[1:-1, :-2] * 1).astype(np.uint8)
+        else:
+            for x, y in ((gx, gy), (gx, gy - 1), (gx + 1, gy), (gx, gy + 1), (gx - 1, gy)):
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    self.coast_indices[y, x] = self.calculate_coast_index(x, y)
+
+    # Return the cached coast index for the tile at the specified grid location.
+    def get_coast_index(self, gx, gy):
+        return int(self.coast_indices[gy, gx])
+
+    # Return the shared Tile for the tile at the specified grid location.
     def get_tile_at(self, gx, gy):
         if 0 <= gx < self.width and 0 <= gy < self.height:
-            return self.tile_grid[gy][gx]
+            return tile_flyweights[tile_types_by_code[self.terrain[gy, gx]]]
         else:
             return None
 
     # Return the tile type at the specified grid location.
     def get_tile_type_at(self, gx, gy):
-        return getattr(self.get_tile_at(gx, gy), 'tile_type', None)
+        if 0 <= gx < self.width and 0 <= gy < self.height:
+            return tile_types_by_code[self.terrain[gy, gx]]
+        else:
+            return None
 
     # Return True if the tile is passable for the provided movement type. Tiles out of bounds are impassible.
     def is_tile_passable(self, gx, gy, movement_type):
         return 0 <= gx < self.width and 0 <= gy < self.height and \
-               self.get_tile_type_at(gx, gy) in movement_types[movement_type][MovementAttribute.PASSABLE]
+               bool(self.passable_masks[movement_type][gy, gx])
+
+    # Return true if the tile is on the map
+    def is_on_map(self, gx, gy):
+        return 0 <= gx < self.width and 0 <= gy < self.height
+
+    # Return the packed index of the tile, or None if it's off the map. Unpack with self.coords[index].
+    def pack_coord(self, gx, gy):
+        if 0 <= gx < self.width and 0 <= gy < self.height:
+            return gy * self.width + gx
+        return None
 
     # Return true if our movement type can pass over the tile, but not end movement on it
     def is_tile_traversable(self, gx, gy, movement_type):
         return 0 <= gx < self.width and 0 <= gy < self.height and \
-               self.get_tile_type_at(gx, gy) in movement_types[movement_type][MovementAttribute.TRAVERSABLE]
+               bool(self.traversable_masks[movement_type][gy, gx])
 
     # From the tiles adjacent to (gx, gy), return any that are passable for the provided movement type
     def get_valid_adjacent_tiles_for_movement_type(self, gx, gy, movement_type):
@@ -104,37 +213,136 @@ class MapManager(GameObject):
     def get_valid_adjacent_traversable_tiles(self, gx, gy, movement_type):
         return self.get_tiles_in_range(gx, gy, 1, 1, movement_type, include_traversable=True)
 
-    # Return tile types for all tiles within the min and max range of the center coord
+    # Return coordinates for all tiles within the min and max range of the center coord.
+    # Only the diamond around the center is visited. Tiles are returned in row-by-row order.
     def get_tiles_in_range(self, cx, cy, min_range, max_range, movement_type=None, include_traversable=False):
+        if min_range == 1 and max_range == 1:
+            return self.get_adjacent_tiles(cx, cy, movement_type, include_traversable)
+
+        if movement_type:
+            passable = self.passable_masks[movement_type]
+            traversable = self.traversable_masks[movement_type] if include_traversable else None
+        else:
+            passable = None
+            traversable = None
+
         tiles = []
-        for y in range(self.height):
-            for x in range(self.width):
-                within_range = min_range <= abs(cx - x) + abs(cy - y) <= max_range
-                is_passable = not movement_type or self.is_tile_passable(x, y, movement_type)
-                is_traversable = include_traversable and (not movement_type or self.is_tile_traversable(x, y, movement_type))
+        for dx, dy in get_range_offsets(min_range, max_range):
+            x = cx + dx
+            y = cy + dy
+            if 0 <= x < self.width and 0 <= y < self.height:
+                if passable is None:
+                    tiles.append((x, y))
+                elif passable[y, x] or (traversable is not None and traversable[y, x]):
+                    tiles.append((x, y))
+
+        return tiles
 
-                if within_range and (is_passable or is_traversable):
+    # Fast path for get_tiles_in_range with a range of exactly 1 (the four orthogonal neighbors).
+    # Reads the neighbor table for the movement type, if there is one.
+    def get_adjacent_tiles(self, cx, cy, movement_type=None, include_traversable=False):
+        if movement_type and 0 <= cx < self.width and 0 <= cy < self.height:
+            coords = self.coords
+            return [coords[index] for index in
+                    self.get_neighbor_table(movement_type, include_traversable)[cy * self.width + cx]]
+
+        return self.__get_adjacent_tiles_from_masks__(cx, cy, movement_type, include_traversable)
+
+    # Return the tiles adjacent to (cx, cy) that are valid for the movement type, straight from the movement masks
+    def __get_adjacent_tiles_from_masks__(self, cx, cy, movement_type=None, include_traversable=False):
+        if movement_type:
+            passable = self.passable_masks[movement_type]
+            traversable = self.traversable_masks[movement_type] if include_traversable else None
+        else:
+            passable = None
+            traversable = None
+
+        tiles = []
+        # Ordered N, W, E, S to match a row-by-row scan
+        for x, y in ((cx, cy - 1), (cx - 1, cy), (cx + 1, cy), (cx, cy + 1)):
+            if 0 <= x < self.width and 0 <= y < self.height:
+                if passable is None:
+                    tiles.append((x, y))
+                elif passable[y, x] or (traversable is not None and traversable[y, x]):
                     tiles.append((x, y))
 
         return tiles
 
+    # Return the packed indexes of every tile's valid adjacent tiles for the movement type, indexed by packed index.
+    # Neighbors are ordered N, W, E, S, the same as get_adjacent_tiles. The table is kept in sync with the terrain.
+    def get_neighbor_table(self, movement_type, include_traversable=False):
+        key = (movement_type, include_traversable)
+        table = self.neighbor_tables.get(key)
+        if table is None:
+            valid = self.passable_masks[movement_type]
+            if include_traversable:
+                valid = valid | self.traversable_masks[movement_type]
+            valid = valid.ravel()
+            indexes = np.arange(self.width * self.height).reshape(self.height, self.width)
+
+            table = [[] for _ in range(self.width * self.height)]
+            # (tiles, their neighbors) for the N, W, E, and S neighbors in turn
+            for tiles, neighbors in ((indexes[1:, :], indexes[:-1, :]), (indexes[:, 1:], indexes[:, :-1]),
+                                     (indexes[:, :-1], indexes[:, 1:]), (indexes[:-1, :], indexes[1:, :])):
+                is_valid = valid[neighbors]
+                for index, neighbor in zip(tiles[is_valid].tolist(), neighbors[is_valid].tolist()):
+                    table[index].append(neighbor)
+
+            self.neighbor_tables[key] = table
+
+        return table
+
+    # Update the neighbor tables around the tile at (gx, gy) after it has changed
+    def __update_neighbor_tables__(self, gx, gy):
+        for (movement_type, include_traversable), table in self.neighbor_tables.items():
+            for x, y in ((gx, gy - 1), (gx - 1, gy), (gx + 1, gy), (gx, gy + 1)):
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    table[y * self.width + x] = [ny * self.width + nx for nx, ny in
+                                                 self.__get_adjacent_tiles_from_masks__(x, y, movement_type,
+                                                                                        include_traversable)]
+
+    # Return false if there's definitely no path between the two tiles for the movement type, ignoring pieces.
+    # A piece can always step off of the tile it's on, even if it couldn't otherwise stop there.
+    def are_tiles_connected(self, a, b, movement_type):
+        if movement_type not in self.connected_components:
+            self.connected_components[movement_type] = ConnectedComponents(self, movement_type)
+        return self.connected_components[movement_type].is_connected(a, b)
+
     # Return the number of generally passable tiles (non-SEA, non-MOUNTAIN)
     def get_map_size(self):
-        return len([tile for tile in self.get_all_tiles() if tile.tile_type not in [TileType.SEA, TileType.MOUNTAIN]])
+        return int(np.count_nonzero(~np.isin(self.terrain, impassable_tile_codes)))
 
     # Return a list of coordinates of tiles of the specified type
     def find_tiles_by_type(self, tile_type):
-        coords = []
-        for y in range(self.height):
-            for x in range(self.width):
-                if self.get_tile_type_at(x, y) == tile_type:
-                    coords.append((x, y))
-
-        return coords
+        ys, xs = np.nonzero(self.terrain == tile_type.value)
+        return list(zip(xs.tolist(), ys.tolist()))
 
     # Update the tile at the specified location to the new type
     def update_tile_type(self, gx, gy, new_tile_type):
-        self.tile_grid[gy][gx] = Tile(self, new_tile_type, gx, gy)
+        self.__set_tile_type__(gx, gy, new_tile_type)
+        self.publish_terrain_changed([(gx, gy)])
+
+    # Update the tile at the specified location, without notifying anyone of the change
+    def __set_tile_type__(self, gx, gy, new_tile_type):
+        self.terrain[gy, gx] = TileType(new_tile_type).value
+        self.terrain_version += 1
+
+        self.update_movement_masks(gx, gy)
+        self.update_coast_indices(gx, gy)
+        self.__update_neighbor_tables__(gx, gy)
+        for components in self.connected_components.values():
+            components.update_tile(gx, gy)
+
+        # Neighboring tiles may have changed their coastlines, so redraw them too
+        for x, y in ((gx, gy), (gx, gy - 1), (gx + 1, gy), (gx, gy + 1), (gx - 1, gy)):
+            self.mark_chunk_dirty(x, y)
+
+    # Let anyone interested (like path caches) know which tiles have changed
+    def publish_terrain_changed(self, coords):
+        publish_game_event(EventType.E_TERRAIN_CHANGED, {
+            'coords': coords,
+            'version': self.terrain_version,
+        })
 
     # Mine out a tile according to an event
     def mine_tile(self, event):
@@ -143,22 +351,77 @@ class MapManager(GameObject):
 
     # Replace all tiles with the provided tiletype.
     def fill_map_with_tile(self, new_tile_type):
+        coords = []
         for x in range(self.width):
             for y in range(self.height):
-                self.update_tile_type(x, y, new_tile_type)
+                self.__set_tile_type__(x, y, new_tile_type)
+                coords.append((x, y))
+
+        self.publish_terrain_changed(coords)
 
     # Mirror the map across the specified axes, prioritizing the top-left-most tiles.
     def mirror_map(self, mirror_x=True, mirror_y=False):
+        coords = []
         for x in range(self.width):
             for y in range(self.height):
                 mx = self.width - 1 - x if mirror_x else x
                 my = self.height - 1 - y if mirror_y else y
-                self.update_tile_type(mx, my, self.get_tile_type_at(x, y))
+                self.__set_tile_type__(mx, my, self.get_tile_type_at(x, y))
+                coords.append((mx, my))
+
+        self.publish_terrain_changed(coords)
+
+    # Set the opacity of the gridlines, redrawing the terrain if it's changed
+    def set_grid_opacity(self, grid_opacity):
+        if grid_opacity != self.grid_opacity:
+            self.grid_opacity = grid_opacity
+            spr_grid.set_alpha(256 * grid_opacity / 100)
+            self.mark_all_chunks_dirty()
+
+    # Mark the chunk containing the tile at (gx, gy) as needing to be redrawn
+    def mark_chunk_dirty(self, gx, gy):
+        if 0 <= gx < self.width and 0 <= gy < self.height:
+            self.chunk_surfaces.pop((gx // TERRAIN_CHUNK_SIZE, gy // TERRAIN_CHUNK_SIZE), None)
+
+    def mark_all_chunks_dirty(self):
+        self.chunk_surfaces = {}
+
+    # Return the pre-rendered surface for the chunk at the animation frame, rendering it if necessary
+    def get_chunk_surface(self, chunk_x, chunk_y, frame):
+        frames = self.chunk_surfaces.setdefault((chunk_x, chunk_y), {})
+        surface = frames.get(frame)
+
+        if surface is None:
+            min_x = chunk_x * TERRAIN_CHUNK_SIZE
+            min_y = chunk_y * TERRAIN_CHUNK_SIZE
+            max_x = min(min_x + TERRAIN_CHUNK_SIZE, self.width)
+            max_y = min(min_y + TERRAIN_CHUNK_SIZE, self.height)
+
+            surface = Surface(((max_x - min_x) * GRID_WIDTH, (max_y - min_y) * GRID_HEIGHT), SRCALPHA, 32)
+            for y in range(min_y, max_y):
+                for x in range(min_x, max_x):
+                    tile = tile_flyweights[tile_types_by_code[self.terrain[y, x]]]
+                    tile.draw(surface, (x - min_x) * GRID_WIDTH, (y - min_y) * GRID_HEIGHT, frame,
+                              self.coast_indices[y, x])
+
+            frames[frame] = surface
+
+        return surface
 
     # Render the map to the screen
     def render(self, game_screen, ui_screen):
         super().render(game_screen, ui_screen)
 
-        for x in range(self.width):
-            for y in range(self.height):
-                self.tile_grid[y][x].render(game_screen, ui_screen)
+        self.set_grid_opacity(SETTINGS.get(Setting.GRID_OPACITY))
+
+        frame = int(AnimatedGameObject.global_animation_frame)
+        player_manager = self.get_manager(Manager.PLAYER)
+        chunk_width = TERRAIN_CHUNK_SIZE * GRID_WIDTH
+        chunk_height = TERRAIN_CHUNK_SIZE * GRID_HEIGHT
+
+        # Only render chunks within the camera view
+        for chunk_y in range(self.chunks_high):
+            for chunk_x in range(self.chunks_wide):
+                rect = (chunk_x * chunk_width, chunk_y * chunk_height, chunk_width, chunk_height)
+                if not player_manager or player_manager.is_within_camera_view(rect):
+                    game_screen.blit(self.get_chunk_surface(chunk_x, chunk_y, frame), (rect[0], rect[1]))
@@ -0,0 +1,23 @@
+from enum import Enum
+
+
+# Steps involved in reading in the map.
+class MapReadingStep(Enum):
+    META = "# Meta"
+    UPGRADES = "# Upgrades"
+    TEAMS = "# Teams"
+    PIECES = "# Pieces"
+    MAP = "# Map"
+
+    # Return the enum member corresponding to the provided string, if any. Returns None if no match.
+    @staticmethod
+    def safe_get_from_string(str):
+        return map_reading_steps.get(str)
+
+
+# Map reading steps, keyed by their header string
+map_reading_steps = {member.value: member for member in MapReadingStep}
+
+# Sections of a map, in the order they're returned when reading a whole map
+map_sections = [MapReadingStep.MAP, MapReadingStep.PIECES, MapReadingStep.TEAMS, MapReadingStep.UPGRADES,
+                MapReadingStep.META]
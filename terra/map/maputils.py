@@ -1,31 +1,15 @@
 import random
-from enum import Enum
 from io import StringIO
 from os import walk
 
-from opensimplex import OpenSimplex
+import numpy as np
 
+from terra.map.binarymap import BinaryMapReader, is_binary_map, BINARY_MAP_MAGIC
+from terra.map.mapreadingstep import MapReadingStep, map_reading_steps, map_sections
+from terra.map.simplexnoise import SimplexNoise
 from terra.resources.assetloading import AssetType, get_asset
 
 
-# Steps involved in reading in the map.
-class MapReadingStep(Enum):
-    META = "# Meta"
-    UPGRADES = "# Upgrades"
-    TEAMS = "# Teams"
-    PIECES = "# Pieces"
-    MAP = "# Map"
-
-    # Return the enum member corresponding to the provided string, if any. Returns None if no match.
-    @staticmethod
-    def safe_get_from_string(str):
-        for member in MapReadingStep:
-            if member.value == str:
-                return member
-
-        return None
-
-
 # Return a list of filenames of loadable maps
 def get_loadable_maps(asset_type=AssetType.MAP):
     maps = []
@@ -48,8 +32,9 @@ def parse_map_from_string(map_data):
     for line in StringIO(map_data):
         sline = line.rstrip()
 
-        if MapReadingStep.safe_get_from_string(sline):
-            step = MapReadingStep(sline)
+        new_step = map_reading_steps.get(sline)
+        if new_step:
+            step = new_step
         elif step == MapReadingStep.MAP:
             # Grab all non-newline chars, convert them to ints, and add them to the line list
             bitmap.append(list(map(int, sline.split(' '))))
@@ -76,15 +61,56 @@ def parse_map_from_string(map_data):
     return bitmap, pieces, teams, upgrades, meta
 
 
+# Reader for a map in the plain text format, with the same interface as BinaryMapReader.
+# Text maps have no section table, so the whole file is parsed the first time any part of it is asked for.
+class TextMapReader:
+    def __init__(self, path=None, data=None):
+        self.path = path
+        self.data = data
+        self.parsed_map = None
+
+    def __parse__(self):
+        if self.parsed_map is None:
+            if self.data is None:
+                with open(self.path, 'rb') as map_file:
+                    self.data = map_file.read().decode("utf-8")
+            self.parsed_map = parse_map_from_string(self.data)
+        return self.parsed_map
+
+    # Return the size of the map, as (width, height)
+    def get_size(self):
+        bitmap = self.__parse__()[0]
+        return len(bitmap[0]) if len(bitmap) > 0 else 0, len(bitmap)
+
+    # Return the parsed contents of a section
+    def get_section(self, step):
+        return self.__parse__()[map_sections.index(step)]
+
+    # Return the full map, in the same form as parse_map_from_string
+    def read_map(self):
+        return self.__parse__()
+
+
+# Return a reader for the map file at the provided path, in either the binary or the text format.
+# Only the start of the file is read here. Readers read sections as they're asked for (see BinaryMapReader).
+def open_map_reader(map_path):
+    with open(map_path, 'rb') as mapfile:
+        if is_binary_map(mapfile.read(len(BINARY_MAP_MAGIC))):
+            return BinaryMapReader(map_path)
+    return TextMapReader(map_path)
+
+
+# Read and parse the map file at the provided path. Maps may be in either the binary or the text format.
+def read_map_from_path(map_path):
+    return open_map_reader(map_path).read_map()
+
+
 # Load a map from the provided filename
 # Generate a bitmap for the Map to use, and generate a unit list for the PieceManager to use.
 def load_map_from_file(mapname, asset_type=AssetType.MAP):
     try:
-        map_path = get_asset(asset_type, mapname)
-
-        with open(map_path) as mapfile:
-            return parse_map_from_string(mapfile.read())
-    except IOError as e:
+        return read_map_from_path(get_asset(asset_type, mapname))
+    except (IOError, UnicodeDecodeError) as e:
         print("Unable to load file {}. Generating new map. Exception: {}".format(mapname, e))
         return generate_map()
 
@@ -131,61 +157,53 @@ def generate_bitmap(width, height, random_tiles=True):
 
 # Generate a bitmap using simplex noise and some fancy footwork
 # https://www.redblobgames.com/maps/terrain-from-noise/
-def generate_bitmap_from_simplex_noise(width, height, mirror_x=False, mirror_y=False):
-    generator = OpenSimplex(seed=random.randint(0, 100))
+# The whole map is generated at once as arrays. The same seed always produces the same map.
+def generate_bitmap_from_simplex_noise(width, height, mirror_x=False, mirror_y=False, seed=None):
+    if seed is None:
+        seed = random.randint(0, 2 ** 31 - 1)
 
-    # Generate a noise value from 0 to 1
+    generator = SimplexNoise(seed=seed)
+    rng = np.random.RandomState(seed)
+
+    # Generate noise values from 0 to 1
     def noise(noise_x, noise_y):
         return generator.noise2d(noise_x, noise_y) / 2.0 + 0.5
 
-    # Convert a height value to an integer representing a tile (1=SEA, 2=GRASS, etc.)
-    def get_tile_from_height(t_height):
-        if t_height <= 0.7:
-            return 1
-        elif t_height <= 1.1:
-            return 2
-        elif t_height <= 1.2:
-            return 7
-        else:
-            return 5
-
-    bitmap = []
-    for y in range(height):
-        row = []
-        for x in range(width):
-            nx = x / width - 0.5
-            ny = y / height - 0.5
-            elevation = 1 * noise(nx, ny) + 0.5 * noise(nx * 2, ny * 2) + 0.25 * noise(nx * 4, ny * 4)
-
-            distance_to_center = 2 * max(abs(nx), abs(ny))
-            base_height = 0.1
-            edge_height = 0.4
-            dropoff = 1.6
-
-            fuzziness = random.randint(10, 20) / 10
-
-            # Form islands
-            elevation += (base_height - edge_height * pow(distance_to_center, dropoff)) * fuzziness
-
-            tile = get_tile_from_height(round(elevation, 2))
-
-            # Randomly add features to existing plains tiles
-            if tile == 2:
-                feature_chance = random.randint(0, 9)
-                if feature_chance >= 9:
-                    tile = 4
-                elif feature_chance >= 8:
-                    tile = 3
-
-            row.append(tile)
-        bitmap.append(row)
-
-    if mirror_x or mirror_y:
-        for y in range(height):
-            for x in range(width):
-                mx = width - 1 - x if mirror_x else x
-                my = height - 1 - y if mirror_y else y
-
-                bitmap[y][x] = bitmap[my][mx]
-
-    return bitmap
+    ny, nx = np.mgrid[0:height, 0:width]
+    nx = nx / width - 0.5
+    ny = ny / height - 0.5
+    elevation = 1 * noise(nx, ny) + 0.5 * noise(nx * 2, ny * 2) + 0.25 * noise(nx * 4, ny * 4)
+
+    distance_to_center = 2 * np.maximum(np.abs(nx), np.abs(ny))
+    base_height = 0.1
+    edge_height = 0.4
+    dropoff = 1.6
+
+    fuzziness = rng.randint(10, 21, size=(height, width)) / 10
+
+    # Form islands
+    elevation += (base_height - edge_height * np.power(distance_to_center, dropoff)) * fuzziness
+    elevation = np.round(elevation, 2)
+
+    # Convert height values to integers representing tiles (1=SEA, 2=GRASS, etc.)
+    tiles = np.select([elevation <= 0.7, elevation <= 1.1, elevation <= 1.2], [1, 2, 7], default=5)
+
+    # Randomly add features to existing plains tiles
+    feature_chance = rng.randint(0, 10, size=(height, width))
+    is_plains = tiles == 2
+    tiles[is_plains & (feature_chance >= 9)] = 4
+    tiles[is_plains & (feature_chance == 8)] = 3
+
+    # Mirror the second half of the map onto the first half (point symmetry when mirroring both ways)
+    if mirror_x and mirror_y:
+        flat = tiles.ravel()
+        index = np.arange(flat.size)
+        tiles = flat[np.maximum(index, flat.size - 1 - index)].reshape(height, width)
+    elif mirror_x:
+        columns = np.arange(width)
+        tiles = tiles[:, np.maximum(columns, width - 1 - columns)]
+    elif mirror_y:
+        rows = np.arange(height)
+        tiles = tiles[np.maximum(rows, height - 1 - rows), :]
+
+    return tiles.tolist()
@@ -1,4 +1,5 @@
-from pygame import Surface, SRCALPHA
+import numpy as np
+from pygame import Surface, SRCALPHA, image
 
 from terra.map.maputils import load_map_from_file
 from terra.piece.piecetype import PieceType
@@ -9,17 +10,37 @@ from terra.strings import get_string, formatted_strings, draw_text
 from terra.team.team import Team
 
 
+# Size of a single tile on the minimap, in pixels
+MINIMAP_TILE_SIZE = 4
+
+# RGBA pixels for each minimap tile sprite, indexed [tile code, y, x, channel]. Built on first use.
+mini_tile_pixels = None
+
+
+def get_mini_tile_pixels():
+    global mini_tile_pixels
+    if mini_tile_pixels is None:
+        mini_tile_pixels = np.stack([
+            np.frombuffer(image.tostring(sprite, "RGBA"), dtype=np.uint8).reshape(
+                MINIMAP_TILE_SIZE, MINIMAP_TILE_SIZE, 4) for sprite in spr_tiles_mini])
+    return mini_tile_pixels
+
+
+# Generate a surface containing the terrain of the passed in bitmap, written in one go from the tile pixel data
+def generate_minimap_terrain(bitmap):
+    terrain = np.asarray(bitmap, dtype=np.intp)
+    height, width = terrain.shape
+
+    # [y, x, pixel y, pixel x, channel] -> [y, pixel y, x, pixel x, channel]
+    pixels = get_mini_tile_pixels()[terrain].transpose(0, 2, 1, 3, 4)
+    return image.fromstring(np.ascontiguousarray(pixels).tobytes(),
+                            (width * MINIMAP_TILE_SIZE, height * MINIMAP_TILE_SIZE), "RGBA")
+
+
 # Generate a surface containing a minimap of the passed in bitmap
 # Optionally, render blips for pieces
 def generate_minimap(bitmap, pieces=None):
-    height = len(bitmap)
-    width = len(bitmap[0])
-
-    minimap = Surface((width * 4, height * 4), SRCALPHA, 32)
-
-    for x in range(width):
-        for y in range(height):
-            minimap.blit(spr_tiles_mini[bitmap[y][x]], (x * 4, y * 4))
+    minimap = generate_minimap_terrain(bitmap)
 
     # Generate team-colored blips on the map for each piece
     if pieces:
@@ -33,10 +54,8 @@ def generate_minimap(bitmap, pieces=None):
     return minimap
 
 
-# Return a surface containing a preview of the map, with data about what kind of teams, pieces, and upgrades are present
-def draw_map_preview(container_width, container_height, bitmap, pieces, teams):
-    container = Surface((container_width, container_height), SRCALPHA, 32)
-
+# Summarize the teams in the map, returning {team: resource count} and {team: piece count}
+def summarize_teams(pieces, teams):
     translated_teams = {}
     piece_totals = {}
     # Determine the teams in the game
@@ -53,13 +72,24 @@ def draw_map_preview(container_width, container_height, bitmap, pieces, teams):
         if team in piece_totals:
             piece_totals[team] += 1
 
+    return translated_teams, piece_totals
+
+
+# Return a surface containing a preview of the map, with data about what kind of teams, pieces, and upgrades are present
+def draw_map_preview(container_width, container_height, bitmap, pieces, teams):
+    translated_teams, piece_totals = summarize_teams(pieces, teams)
+    return draw_map_preview_from_summary(container_width, container_height, generate_minimap(bitmap, pieces),
+                                         translated_teams, piece_totals)
+
+
+# Return a surface containing a preview of the map from an already rendered minimap and team summary
+def draw_map_preview_from_summary(container_width, container_height, minimap, translated_teams, piece_totals):
+    container = Surface((container_width, container_height), SRCALPHA, 32)
+
     # Render a container for the whole thing
     container.fill(light_color, (0, 0, container_width, container_height))
     container.fill(shadow_color[Team.RED], (1, 1, container_width - 2, container_height - 3))
 
-    # Render the minimap
-    minimap = generate_minimap(bitmap, pieces)
-
     # Trim giant maps to fit in the window
     if minimap.get_width() > container_width - 8:
         minimap = minimap.subsurface((0, 0, container_width - 8, minimap.get_height()))
@@ -88,6 +118,13 @@ def draw_map_preview(container_width, container_height, bitmap, pieces, teams):
 
 
 # Return a surface containing a preview of the map, with data about what kind of teams, pieces, and upgrades are present
+# Previews come from the map catalog, so the map file is only read when it changes.
 def draw_map_preview_from_file(container_width, container_height, mapname, asset_type=AssetType.MAP):
-    bitmap, pieces, teams, upgrades, meta = load_map_from_file(mapname, asset_type=asset_type)
-    return draw_map_preview(container_width, container_height, bitmap, pieces, teams)
+    from terra.map.mapcatalog import get_map_catalog
+
+    entry = get_map_catalog().get_entry(mapname, asset_type)
+    if entry:
+        return entry.get_preview(container_width, container_height)
+    else:
+        bitmap, pieces, teams, upgrades, meta = load_map_from_file(mapname, asset_type=asset_type)
+        return draw_map_preview(container_width, container_height, bitmap, pieces, teams)
@@ -0,0 +1,69 @@
+import numpy as np
+
+# Skewing and unskewing factors for 2D simplex noise
+SKEW_2D = 0.5 * (np.sqrt(3.0) - 1.0)
+UNSKEW_2D = (3.0 - np.sqrt(3.0)) / 6.0
+
+# Scale applied to the summed corner contributions. Keeps results within -1 to 1, with a similar spread to
+# the OpenSimplex noise maps were originally generated with.
+NOISE_SCALE_2D = 59
+
+# Gradient directions for each corner of a simplex
+gradients_2d = np.array([
+    [1, 1], [-1, 1], [1, -1], [-1, -1],
+    [1, 0], [-1, 0], [1, 0], [-1, 0],
+    [0, 1], [0, -1], [0, 1], [0, -1],
+], dtype=np.float64)
+
+
+# Seeded 2D simplex noise, evaluated over whole arrays of coordinates at once.
+# https://weber.itn.liu.se/~stegu/simplexnoise/simplexnoise.pdf
+class SimplexNoise:
+    def __init__(self, seed=0):
+        self.seed = seed
+
+        # Doubled permutation table, so lookups for neighbouring corners never need to wrap
+        permutation = np.random.RandomState(seed).permutation(256)
+        self.permutation = np.concatenate([permutation, permutation])
+
+    # Return the gradient index for each lattice corner
+    def __get_gradient_index__(self, i, j):
+        return self.permutation[i + self.permutation[j]] % len(gradients_2d)
+
+    # Return the contribution of one simplex corner to the noise value at each point
+    @staticmethod
+    def __get_corner_contribution__(gradient_index, x, y):
+        falloff = np.maximum(0.5 - x * x - y * y, 0)
+        gradient = gradients_2d[gradient_index]
+        return falloff ** 4 * (gradient[..., 0] * x + gradient[..., 1] * y)
+
+    # Return the noise value at each point, from -1 to 1. Accepts arrays (or scalars) of matching shape.
+    def noise2d(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+
+        # Find the simplex cell each point is in, and the point's position relative to its first corner
+        skew = (x + y) * SKEW_2D
+        i = np.floor(x + skew).astype(np.int64)
+        j = np.floor(y + skew).astype(np.int64)
+        unskew = (i + j) * UNSKEW_2D
+        x0 = x - (i - unskew)
+        y0 = y - (j - unskew)
+
+        # Determine which of the two triangles in the cell the point is in
+        i1 = (x0 > y0).astype(np.int64)
+        j1 = 1 - i1
+
+        x1 = x0 - i1 + UNSKEW_2D
+        y1 = y0 - j1 + UNSKEW_2D
+        x2 = x0 - 1 + 2 * UNSKEW_2D
+        y2 = y0 - 1 + 2 * UNSKEW_2D
+
+        ii = i & 255
+        jj = j & 255
+
+        total = self.__get_corner_contribution__(self.__get_gradient_index__(ii, jj), x0, y0) + \
+            self.__get_corner_contribution__(self.__get_gradient_index__(ii + i1, jj + j1), x1, y1) + \
+            self.__get_corner_contribution__(self.__get_gradient_index__(ii + 1, jj + 1), x2, y2)
+
+        return NOISE_SCALE_2D * total
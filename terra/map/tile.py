@@ -1,63 +1,51 @@
-from terra.constants import GRID_WIDTH, GRID_HEIGHT
-from terra.engine.animatedgameobject import AnimatedGameObject
-from terra.managers.session import Manager
+from terra.constants import GRID_WIDTH
 from terra.map.tiletype import TileType
 from terra.resources.assets import spr_tiles, spr_coast_detail, spr_grid
 
 
-# A single tile on the map.
-class Tile(AnimatedGameObject):
-    # Create a new Tile object at the provided grid coordinates
-    def __init__(self, game_map, tile_type=1, gx=0, gy=0):
-        self.game_map = game_map
-        self.tile_type = TileType(tile_type)
-        self.gx = gx
-        self.gy = gy
-
-        super().__init__(spr_tiles[self.tile_type], 24, 1, indexed=self.tile_type in [TileType.COAST],
-                         use_global_animation_frame=True)
+# Shared rendering data for a single type of tile.
+# The map only stores a tile code and coast index per cell, so one Tile exists per tile type (a flyweight),
+# rather than one per cell on the map.
+class Tile:
+    def __init__(self, tile_type):
+        self.tile_type = tile_type
+        self.image = spr_tiles[tile_type]
+        self.size = GRID_WIDTH
+
+        # Indexed tiles have a column of animation frames for each coast index.
+        # Otherwise, the sprite is a single horizontal strip of animation frames.
+        self.indexed = tile_type in [TileType.COAST]
+
+        # Pre-slice all sprites up front. sprites[animation_frame][index]
+        self.sprites = []
+        if self.indexed:
+            for frame in range(self.image.get_height() // self.size):
+                self.sprites.append([self.image.subsurface(self.size * index, self.size * frame, self.size, self.size)
+                                     for index in range(self.image.get_width() // self.size)])
+        else:
+            for frame in range(self.image.get_width() // self.size):
+                self.sprites.append([self.image.subsurface(self.size * frame, 0, self.size, self.size)])
 
     def __str__(self):
-        return "{} tile at ({}, {})".format(self.tile_type, self.gx, self.gy)
-
-    # Return an index corresponding to the number of adjacent 'land' tiles
-    def get_index(self):
-        coast_index = super().get_index()
-        edge_tiles = [TileType.SEA, TileType.COAST]
-
-        # Use a 4-bit address to determine the coast sprite to use.
-        # Each direction is one binary place: NESW
-        # 0=no coast, 1=yes coast
-        north_type = self.game_map.get_tile_type_at(self.gx, self.gy-1)
-        east_type = self.game_map.get_tile_type_at(self.gx+1, self.gy)
-        south_type = self.game_map.get_tile_type_at(self.gx, self.gy+1)
-        west_type = self.game_map.get_tile_type_at(self.gx-1, self.gy)
-
-        if north_type and north_type not in edge_tiles:
-            coast_index += 8
-        if east_type and east_type not in edge_tiles:
-            coast_index += 4
-        if south_type and south_type not in edge_tiles:
-            coast_index += 2
-        if west_type and west_type not in edge_tiles:
-            coast_index += 1
-
-        return coast_index
-
-    # Ask the Tile to render itself.
-    def render(self, game_screen, ui_screen):
-        # Only render if we're within the camera view
-
-        if self.get_manager(Manager.PLAYER).is_within_camera_view((self.gx * GRID_WIDTH, self.gy * GRID_HEIGHT, GRID_WIDTH, GRID_HEIGHT)):
-            super().render(game_screen, ui_screen)
-
-            game_screen.blit(self.sprite, (self.gx * GRID_WIDTH, self.gy * GRID_HEIGHT))
-
-            # For SEA tiles, render coastlines if adjacent to non-sea (map border counts as sea)
-            if self.tile_type == TileType.SEA:
-                coast_index = self.get_index()
-                if coast_index > 0:
-                    game_screen.blit(spr_coast_detail[coast_index], (self.gx * GRID_WIDTH, self.gy * GRID_HEIGHT))
-
-            # Render gridlines as appropriate
-            game_screen.blit(spr_grid, (self.gx * GRID_WIDTH, self.gy * GRID_HEIGHT))
+        return "{} tile".format(self.tile_type)
+
+    # Return the sprite to display for the global animation frame and coast index
+    def get_sprite(self, frame, index=0):
+        frames = self.sprites[min(int(frame), len(self.sprites) - 1)]
+        return frames[index] if self.indexed else frames[0]
+
+    # Draw the tile onto the provided surface at pixel coords (px, py), using the provided global animation frame.
+    # The index is the tile's coast index, as cached by the map.
+    def draw(self, surface, px, py, frame, index=0):
+        surface.blit(self.get_sprite(frame, index), (px, py))
+
+        # For SEA tiles, render coastlines if adjacent to non-sea (map border counts as sea)
+        if self.tile_type == TileType.SEA and index > 0:
+            surface.blit(spr_coast_detail[index], (px, py))
+
+        # Render gridlines as appropriate
+        surface.blit(spr_grid, (px, py))
+
+
+# Shared Tile flyweights for every tile type
+tile_flyweights = {tile_type: Tile(tile_type) for tile_type in TileType}
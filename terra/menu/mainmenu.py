@@ -3,7 +3,7 @@ from terra.control.inputcontroller import InputAction
 from terra.control.keybindings import Key
 from terra.event.event import EventType, publish_game_event
 from terra.managers.campaignmanager import get_open_maps, load_campaign_progress
-from terra.map.maputils import get_loadable_maps
+from terra.map.mapcatalog import get_map_catalog
 from terra.map.minimap import draw_map_preview_from_file
 from terra.menu.menu import Menu
 from terra.menu.option import Option
@@ -21,7 +21,7 @@ from terra.util.drawingutil import draw_text
 # Convert a list of loadable maps to selectable options: [(display name, filename), (...)]
 def convert_loadable_maps_to_options(asset_type):
     options = []
-    for mapname in get_loadable_maps(asset_type):
+    for mapname in get_map_catalog().get_loadable_maps(asset_type):
         options.append((mapname, []))
     return options
 
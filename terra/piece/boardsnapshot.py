@@ -0,0 +1,73 @@
+import numpy as np
+
+from terra.piece.piecetype import PieceType
+from terra.team.team import Team
+
+# Teams are stored in the snapshot by their position in the Team enum
+teams_by_code = list(Team)
+team_codes = {team: code for code, team in enumerate(teams_by_code)}
+
+# Piece types are stored by value
+piece_types_by_code = {piece_type.value: piece_type for piece_type in PieceType}
+
+
+# A copy of the board to send to a planning worker process: every piece, the terrain, and each team's resources and
+# upgrades. Pieces are stored as array columns (one row per piece), so snapshots are cheap to capture and pickle.
+# Snapshots aren't queried directly. Workers rebuild a session from them (see Session.set_up_planning_session).
+class BoardSnapshot:
+    def __init__(self, width, height, terrain, teams, piece_types, xs, ys, hps, resources, upgrades):
+        self.width = width
+        self.height = height
+
+        # Tile type values, packed row by row (see MapManager.pack_coord)
+        self.terrain = terrain
+
+        # Piece columns, in the same order as the PieceManager's pieces
+        self.teams = teams
+        self.piece_types = piece_types
+        self.xs = xs
+        self.ys = ys
+        self.hps = hps
+
+        # Teams in the game, and their resources and owned upgrades.
+        # Teams loaded without an upgrade tree have no entry in upgrades.
+        self.resources = resources
+        self.upgrades = upgrades
+
+    def __len__(self):
+        return len(self.teams)
+
+    # Return the terrain as a bitmap, like MapManager.convert_bitmap_from_grid
+    def convert_bitmap_from_grid(self):
+        return [list(self.terrain[y * self.width:(y + 1) * self.width]) for y in range(self.height)]
+
+    # Return string representations for all pieces, like PieceManager.serialize_pieces
+    def serialize_pieces(self):
+        return ["{} {} {} {} {}".format(x, y, teams_by_code[team].name, piece_types_by_code[piece_type].name, int(hp))
+                for team, piece_type, x, y, hp in zip(self.teams.tolist(), self.piece_types.tolist(),
+                                                      self.xs.tolist(), self.ys.tolist(), self.hps.tolist())]
+
+    # Return string representations of each team's resources, like TeamManager.serialize_teams
+    def serialize_teams(self):
+        return ["{} {}".format(team.name, resources) for team, resources in self.resources.items()]
+
+    # Return string representations of each team's owned upgrades, like TeamManager.serialize_upgrades
+    def serialize_upgrades(self):
+        return [team.name + "|" + "".join(upgrade.name + " " for upgrade in upgrades)
+                for team, upgrades in self.upgrades.items()]
+
+
+# Capture a snapshot of the board from the live piece, map and team managers
+def capture_board_snapshot(piece_manager, map_manager, team_manager):
+    pieces = piece_manager.__get_all_pieces__()
+
+    return BoardSnapshot(
+        map_manager.width, map_manager.height, map_manager.terrain.tobytes(),
+        np.array([team_codes[piece.team] for piece in pieces], dtype=np.uint8),
+        np.array([piece.piece_type.value for piece in pieces], dtype=np.uint8),
+        np.array([piece.gx for piece in pieces], dtype=np.int16),
+        np.array([piece.gy for piece in pieces], dtype=np.int16),
+        np.array([piece.hp for piece in pieces], dtype=np.float64),
+        {team: team_manager.resources[team] for team in team_manager.teams},
+        {team: tuple(team_manager.owned_upgrades[team]) for team in team_manager.teams
+         if team in team_manager.owned_upgrades})
@@ -0,0 +1,103 @@
+import numpy as np
+
+from terra.managers.session import Manager, SESSION
+from terra.piece.attribute import Attribute
+from terra.piece.piecesubtype import PieceSubtype
+
+# Move score penalties, added to the distance to the goal when pathfinding
+ALLY_BUILDING_PENALTY = 10
+CANT_ATTACK_BUILDING_PENALTY = 9999
+
+
+# Move score penalties for every tile on the map, for a single team and piece type.
+# Pathfinding reads these with an array index, instead of querying the piece and team managers at every tile.
+class MoveCostGrid:
+    def __init__(self, piece_manager, team_manager, width, height, team, piece_type):
+        # Penalty for ending up on each tile, indexed [y, x]
+        self.penalties = np.zeros((height, width), dtype=np.float64)
+        # Whether an enemy on each tile would stop our movement, indexed [y, x]
+        self.impeded = np.zeros((height, width), dtype=bool)
+
+        def attr(attribute):
+            return team_manager.attr(team, piece_type, attribute)
+
+        attack = attr(Attribute.ATTACK)
+        attack_multipliers = attr(Attribute.ATTACK_MULTIPLIER)
+        cant_attack_buildings = attr(Attribute.CANT_ATTACK_BUILDINGS)
+        ignore_impedance = attr(Attribute.IGNORE_IMPEDANCE)
+
+        # Flat views of the grids, indexed by packed tile index (y * width + x)
+        penalties = self.penalties.ravel()
+        impeded = self.impeded.ravel()
+
+        ally_building_indexes = set()
+        for index, pieces in piece_manager.pieces.items():
+            # Pieces off the map (which have no index) can't affect pathfinding
+            if index is None:
+                continue
+
+            for piece in pieces:
+                if piece.team == team:
+                    if piece.piece_subtype == PieceSubtype.BUILDING:
+                        ally_building_indexes.add(index)
+                    continue
+
+                impeded[index] = not ignore_impedance
+
+                # If this piece can't enter buildings, score appropriately
+                if piece.piece_subtype == PieceSubtype.BUILDING and cant_attack_buildings:
+                    penalties[index] += CANT_ATTACK_BUILDING_PENALTY
+
+                multiplier = attack_multipliers[piece.piece_archetype] * attack
+                if multiplier >= 1:
+                    penalties[index] -= 1 * multiplier
+                else:
+                    penalties[index] += 2 * multiplier
+
+        for index in ally_building_indexes:
+            penalties[index] += ALLY_BUILDING_PENALTY
+
+        # The same grids as lists, which are faster to read one tile at a time while pathfinding
+        self.flat_penalties = penalties.tolist()
+        self.flat_impeded = impeded.tolist()
+
+    # Return the move score for stepping onto tile b on the way to goal a: the distance to the goal plus penalties.
+    # Blocked tiles aren't penalized. The original score looked up (a, b) pairs in the blocked tiles, which never
+    # matched, and AI paths have always been planned without the penalty.
+    def get_move_score(self, a, b, blocked):
+        x2, y2 = b
+        distance = abs(a[0] - x2) + abs(a[1] - y2)
+        return distance + self.penalties[y2, x2]
+
+
+# Cached move cost grids for every team and piece type that has needed one.
+# Grids are rebuilt when pieces move or any team buys an upgrade, and at the start of each AI planning pass.
+class MoveCosts:
+    def __init__(self, piece_manager):
+        self.piece_manager = piece_manager
+
+        # self.grids[(team, piece type)] = MoveCostGrid
+        self.grids = {}
+        # Board and team attribute versions the grids were built for
+        self.version = None
+
+    # Throw out all grids, so they're rebuilt the next time they're needed
+    def clear(self):
+        self.grids = {}
+
+    # Return the move cost grid for the team and piece type on the current board
+    def get_grid(self, team, piece_type):
+        team_manager = SESSION.get(Manager.TEAM)
+        version = (self.piece_manager.board_version, team_manager.attribute_version)
+        if self.version != version:
+            self.grids = {}
+            self.version = version
+
+        key = (team, piece_type)
+        grid = self.grids.get(key)
+        if grid is None:
+            battle_map = SESSION.get(Manager.MAP)
+            grid = MoveCostGrid(self.piece_manager, team_manager, battle_map.width, battle_map.height, team, piece_type)
+            self.grids[key] = grid
+
+        return grid
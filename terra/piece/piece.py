@@ -1,6 +1,8 @@
 import pygame
 
-from terra.ai.pathfinder import get_path_to_destination, reconstruct_breadth_first_path
+from terra.ai.clustergraph import get_cluster_graph
+from terra.ai.pathfinder import navigate_to_nearest_indexes, reconstruct_path, unpack_path, \
+    use_hierarchical_pathfinding, get_path_to_destination
 from terra.constants import GRID_WIDTH, GRID_HEIGHT, NETWORK_ANIMATION_SPEED
 from terra.control.inputcontroller import InputAction
 from terra.control.keybindings import Key
@@ -376,33 +378,14 @@ class Piece(AnimatedGameObject):
                 'health': heal
             })
 
-    # Return a score for moving from tile A to tile B. Lower numbers are preferred.
-    def get_move_score(self, a, b, blocked):
-        piece_manager = self.get_manager(Manager.PIECE)
-        x1, y1 = a
-        x2, y2 = b
-
-        distance = abs(x1 - x2) + abs(y1 - y2)
-        ally_building_score = 10 if piece_manager.get_piece_at(x2, y2, self.team, PieceSubtype.BUILDING) else 0
-
-        enemies = piece_manager.get_enemy_pieces_at(x2, y2, self.team)
-        enemy_score = 0
-        for enemy in enemies:
-            # If this piece can't enter buildings, score appropriately
-            if enemy.piece_subtype == PieceSubtype.BUILDING and self.attr(Attribute.CANT_ATTACK_BUILDINGS):
-                enemy_score += 9999
-
-            multiplier = self.attr(Attribute.ATTACK_MULTIPLIER)[enemy.piece_archetype] * self.attr(Attribute.ATTACK)
-            if multiplier >= 1:
-                enemy_score -= 1 * multiplier
-            else:
-                enemy_score += 2 * multiplier
-
-        # Avoid blocked tiles whenever possible
-        avoid_score = 5 if (a, b) in blocked else 0
+    # Return the move cost grid for our team and piece type, used to score tiles while pathfinding
+    def get_move_cost_grid(self):
+        return self.get_manager(Manager.PIECE).move_costs.get_grid(self.team, self.piece_type)
 
-        # print("{} | {} {} {}".format(distance, ally_building_score, enemy_score, avoid_score))
-        return distance + ally_building_score + enemy_score + avoid_score
+    # Return a score for moving onto tile b on the way to tile a. Lower numbers are preferred.
+    # The score is the distance to a, plus penalties for tiles we'd rather avoid.
+    def get_move_score(self, a, b, blocked):
+        return self.get_move_cost_grid().get_move_score(a, b, set(blocked))
 
     def is_enemy_at_tile(self, tile):
         return len(self.get_manager(Manager.PIECE).get_enemy_pieces_at(tile[0], tile[1], self.team)) > 0 \
@@ -414,39 +397,63 @@ class Piece(AnimatedGameObject):
 
     # Find a path to the target.
     # If a minimum and maximum range is provided, will attempt to path to within that range of the target. 0=Exact tile.
-    # If blocked is provided, will navigate around the specified blocked tiles
+    # If blocked is provided, will navigate around the specified blocked tiles. Sets (or anything else with fast
+    # membership checks, like a ReservationTable) are used as-is, other collections are copied into a set.
     def get_path_to_target(self, target, path_cache=None, blocked=None, min_range=0, max_range=0, movement_type=None):
-        destinations = self.get_manager(Manager.MAP).get_tiles_in_range(target[0], target[1],
-                                                                        min_range, max_range, movement_type)
-        # Sort destinations by the closest
-        destinations.sort(key=lambda tile: abs(tile[0] - self.gx) + abs(tile[1] - self.gy))
+        battle_map = self.get_manager(Manager.MAP)
+        destinations = battle_map.get_tiles_in_range(target[0], target[1], min_range, max_range, movement_type)
 
         # Remove blocked tiles from the destinations
-        for blocker in blocked:
-            if blocker in destinations:
-                destinations.remove(blocker)
+        if blocked is None:
+            blocked = set()
+        elif isinstance(blocked, (list, tuple)):
+            blocked = set(blocked)
+        destinations = [destination for destination in destinations if destination not in blocked]
 
         if len(destinations) > 0:
-            potential_paths = []
-            for destination in destinations:
-                if path_cache:
-                    # Use the cached path and try to navigate
-                    came_from = path_cache.get_map(destination, movement_type)
-                    if not came_from:
-                        # Cache the new path
-                        came_from = path_cache.cache_path(destination, movement_type)
-
-                    potential_path = reconstruct_breadth_first_path(destination, (self.gx, self.gy), came_from)
+            start = (self.gx, self.gy)
+            if not path_cache:
+                movement_type = movement_type or self.attr(Attribute.MOVEMENT_TYPE)
+
+            # Skip searching for destinations we can never reach
+            reachable_destinations = [destination for destination in destinations
+                                      if battle_map.are_tiles_connected(start, destination, movement_type)]
+
+            # Search once for the nearest destinations (as packed tile indexes).
+            # Ties go to the destination closest as the crow flies.
+            start_index = battle_map.pack_coord(start[0], start[1])
+            goals = {battle_map.pack_coord(x, y) for x, y in reachable_destinations}
+            if len(reachable_destinations) == 0 or start_index is None:
+                nearest = []
+            elif path_cache:
+                # Cached paths only consider terrain, so they never start from a tile we couldn't stand on
+                if start in destinations or battle_map.is_tile_passable(start[0], start[1], movement_type):
+                    _, _, nearest = navigate_to_nearest_indexes(start_index, goals, battle_map, movement_type)
+                else:
+                    nearest = []
+            else:
+                came_from, _, nearest = navigate_to_nearest_indexes(start_index, goals, battle_map, movement_type,
+                                                                    self.get_move_cost_grid())
+
+            if len(nearest) > 0:
+                destination = min(unpack_path(nearest, battle_map),
+                                  key=lambda tile: (abs(tile[0] - self.gx) + abs(tile[1] - self.gy),
+                                                    destinations.index(tile)))
+                if use_hierarchical_pathfinding(battle_map):
+                    # On very large maps, the path to the chosen destination is found hierarchically instead.
+                    # With a path cache, it only considers terrain, the same as a cached path would.
+                    if path_cache:
+                        self.current_path = get_cluster_graph(battle_map, movement_type).get_path(start, destination)
+                    else:
+                        self.current_path = get_path_to_destination(start, destination, battle_map, self, blocked,
+                                                                    movement_type=movement_type)
+                elif path_cache:
+                    # Use the cached path
+                    self.current_path = path_cache.get_path(destination, start, movement_type)
                 else:
-                    # Do ad-hoc pathfinding
-                    potential_path = get_path_to_destination((self.gx, self.gy), destination,
-                                                             self.get_manager(Manager.MAP), self, blocked)
-                if potential_path:
-                    potential_paths.append(potential_path)
-
-            if len(potential_paths) > 0:
-                potential_paths.sort(key=lambda path: len(path))
-                self.current_path = potential_paths[0]
+                    path = reconstruct_path(start_index, battle_map.pack_coord(destination[0], destination[1]),
+                                            came_from)
+                    self.current_path = unpack_path(path, battle_map)
             else:
                 self.current_path = None
 
@@ -9,9 +9,11 @@ from terra.piece.attribute import Attribute
 from terra.piece.orders import MoveOrder, BuildOrder, UpgradeOrder
 from terra.piece.piece import Piece
 from terra.piece.piecearchetype import PieceArchetype
+from terra.piece.movecosts import MoveCosts
 from terra.piece.piececonflict import PieceConflict
 from terra.piece.piecesubtype import PieceSubtype
 from terra.piece.piecetype import PieceType
+from terra.piece.reachability import Reachability
 from terra.sound.soundtype import SoundType
 from terra.team.team import Team
 from terra.util.collectionutil import safe_get_from_list
@@ -23,10 +25,19 @@ class PieceManager(GameObject):
     def __init__(self, pieces=None):
         super().__init__()
 
-        # Hold the pieces located on this map
-        # Key pairs look like: (gx, gy): [unit1, unit2, building1...]
+        # Hold the pieces located on this map, keyed by packed tile index (see MapManager.pack_coord)
+        # Key pairs look like: index: [unit1, unit2, building1...]
         self.pieces = {}
 
+        # Incremented every time a piece is added to, removed from, or moved around the map
+        self.board_version = 0
+
+        # Shared, memoized movement ranges for all pieces
+        self.reachability = Reachability(self)
+
+        # Move score grids for pathfinding, shared by all pieces of the same team and type
+        self.move_costs = MoveCosts(self)
+
         # Generate units from the provided text roster, if any
         if pieces:
             for piece in pieces:
@@ -37,6 +48,7 @@ class PieceManager(GameObject):
 
     def destroy(self):
         super().destroy()
+        self.reachability.destroy()
 
         if self.pieces:
             pieces = self.__get_all_pieces__()
@@ -75,7 +87,8 @@ class PieceManager(GameObject):
     # Return a list of piece(s) at the specified grid location
     # If piece type or team is provided, only return pieces of that type.
     def get_pieces_at(self, gx, gy, piece_type=None, team=None, piece_subtype=None):
-        pieces = self.pieces.get((gx, gy))
+        index = self.get_manager(Manager.MAP).pack_coord(gx, gy)
+        pieces = self.pieces.get(index) if index is not None else None
         if not pieces:
             return []
         else:
@@ -129,7 +142,7 @@ class PieceManager(GameObject):
     # Return all pieces belonging to the specified team. Supports filtering down to a specific type or subtype.
     def get_all_pieces_for_team(self, team, piece_subtype=None, piece_type=None):
         all_pieces = []
-        for coordinate, pieces in self.pieces.items():
+        for index, pieces in self.pieces.items():
             all_pieces.extend(pieces)
 
         # Filter
@@ -156,7 +169,7 @@ class PieceManager(GameObject):
     # Return all pieces not belonging to the specified team. Supports filtering down to a specific type or subtype.
     def get_all_enemy_pieces(self, team, piece_subtype=None, piece_type=None):
         all_pieces = []
-        for coordinate, pieces in self.pieces.items():
+        for index, pieces in self.pieces.items():
             all_pieces.extend(pieces)
 
         # Filter
@@ -229,15 +242,19 @@ class PieceManager(GameObject):
 
     # Register a piece with the game map.
     def register_piece(self, piece):
-        if not self.pieces.get((piece.gx, piece.gy)):
-            self.pieces[(piece.gx, piece.gy)] = []
-        self.pieces[(piece.gx, piece.gy)].append(piece)
+        index = self.get_manager(Manager.MAP).pack_coord(piece.gx, piece.gy)
+        if not self.pieces.get(index):
+            self.pieces[index] = []
+        self.pieces[index].append(piece)
+        self.board_version += 1
 
     # Unregister a piece with the game map. Note that this does not destroy it, just removes it from the grid.
     def remove_piece(self, piece):
-        self.pieces[(piece.gx, piece.gy)].remove(piece)
-        if len(self.pieces[(piece.gx, piece.gy)]) == 0:
-            del self.pieces[(piece.gx, piece.gy)]
+        index = self.get_manager(Manager.MAP).pack_coord(piece.gx, piece.gy)
+        self.pieces[index].remove(piece)
+        if len(self.pieces[index]) == 0:
+            del self.pieces[index]
+        self.board_version += 1
 
     # Unregister a piece with the game map by looking it up with grid coordinates and a team.
     def remove_piece_by_coord(self, gx, gy, team):
@@ -289,8 +306,8 @@ class PieceManager(GameObject):
     # Get lists of all units and buildings, regardless of position or team
     def __get_all_pieces__(self):
         pieces = []
-        for coordinate in self.pieces:
-            for piece in self.pieces[coordinate]:
+        for index in self.pieces:
+            for piece in self.pieces[index]:
                 pieces.append(piece)
         return pieces
 
@@ -381,9 +398,9 @@ class PieceManager(GameObject):
     def resolve_unit_combat(self, event):
         # Find conflicting units (units occupying the same space)
         conflicting_pieces = []
-        for coordinate in self.pieces:
-            if len(self.pieces.get(coordinate)) > 1:
-                conflicting_pieces.append(self.pieces.get(coordinate))
+        for index in self.pieces:
+            if len(self.pieces.get(index)) > 1:
+                conflicting_pieces.append(self.pieces.get(index))
 
         # Conflict resolution
         if len(conflicting_pieces) > 0:
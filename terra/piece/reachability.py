@@ -0,0 +1,123 @@
+from collections import deque
+
+from terra.engine.gameobject import GameObject
+from terra.event.event import EventType
+from terra.managers.session import Manager
+from terra.piece.attribute import Attribute
+from terra.piece.piecesubtype import PieceSubtype
+from terra.piece.piecetype import PieceType
+
+
+# Shared answers to "which tiles can this piece reach within N moves", for the movement UI and the AI.
+# Follows the movement rules: pieces can pass over traversable tiles, enemy pieces stop movement for pieces that
+# can be impeded, and pieces can step from a friendly base straight to any friendly PORTAL piece.
+# Results are memoized until the board (pieces or terrain) changes, or any team buys an upgrade.
+class Reachability(GameObject):
+    def __init__(self, piece_manager):
+        super().__init__()
+
+        self.piece_manager = piece_manager
+
+        # Reachable tiles and their distances, for the current board only
+        # self.reachable[((gx, gy), movement type, max range, team, impeded, use portals)] = {(x, y): distance}
+        self.reachable = {}
+        self.board_version = None
+
+        # Coords with enemy pieces, and (friendly base coords, portal coords), for each team on the current board
+        self.enemy_coords = {}
+        self.portal_coords = {}
+
+    def register_handlers(self, event_bus):
+        super().register_handlers(event_bus)
+        event_bus.register_handler(EventType.START_PHASE_ORDERS, self.precompute_reachable_tiles)
+
+    # Return a version that changes whenever pieces move, the terrain changes, or any team's piece attributes change
+    # (an upgrade can change how far pieces move or which pieces are portals)
+    def get_board_version(self):
+        return self.piece_manager.board_version, self.get_manager(Manager.MAP).terrain_version, \
+            self.get_manager(Manager.TEAM).attribute_version
+
+    # Throw out everything we know about the board if it has changed
+    def __check_board_version__(self):
+        board_version = self.get_board_version()
+        if board_version != self.board_version:
+            self.reachable = {}
+            self.enemy_coords = {}
+            self.portal_coords = {}
+            self.board_version = board_version
+
+    def __get_enemy_coords__(self, team):
+        if team not in self.enemy_coords:
+            self.enemy_coords[team] = {(piece.gx, piece.gy) for piece in self.piece_manager.get_all_enemy_pieces(team)}
+        return self.enemy_coords[team]
+
+    def __get_portal_coords__(self, team):
+        if team not in self.portal_coords:
+            base_coords = {(piece.gx, piece.gy)
+                           for piece in self.piece_manager.get_all_pieces_for_team(team, piece_type=PieceType.BASE)}
+            portal_coords = [(piece.gx, piece.gy)
+                             for piece in self.piece_manager.get_all_pieces_with_attribute(team, Attribute.PORTAL)]
+            self.portal_coords[team] = (base_coords, portal_coords)
+        return self.portal_coords[team]
+
+    # Return a dict of every tile reachable from (gx, gy) within max_range moves, to its distance.
+    # Includes the starting tile, and tiles the piece can pass over but not stop on.
+    # Impedance and portals only apply if a piece type (and movement type) is provided.
+    # The returned dict is shared, and must not be modified.
+    def get_reachable_tiles(self, gx, gy, movement_type, max_range, team, piece_type=None):
+        is_piece_movement = bool(piece_type and movement_type)
+        impeded = is_piece_movement and \
+            not self.get_manager(Manager.TEAM).attr(team, piece_type, Attribute.IGNORE_IMPEDANCE)
+
+        self.__check_board_version__()
+        key = ((gx, gy), movement_type, max_range, team, impeded, is_piece_movement)
+        reachable = self.reachable.get(key)
+        if reachable is None:
+            reachable = self.__search__((gx, gy), movement_type, max_range, team, impeded, is_piece_movement)
+            self.reachable[key] = reachable
+
+        return reachable
+
+    # Breadth-first search outwards from the start, up to max_range moves
+    def __search__(self, start, movement_type, max_range, team, impeded, use_portals):
+        battle_map = self.get_manager(Manager.MAP)
+        enemy_coords = self.__get_enemy_coords__(team) if impeded else set()
+        base_coords, portal_coords = self.__get_portal_coords__(team) if use_portals else (set(), [])
+
+        distances = {start: 0}
+        frontier = deque([start])
+        while frontier:
+            current = frontier.popleft()
+            distance = distances[current] + 1
+            if distance > max_range:
+                continue
+
+            neighbors = battle_map.get_valid_adjacent_traversable_tiles(current[0], current[1], movement_type)
+            if current in base_coords:
+                neighbors.extend(portal_coords)
+
+            for next in neighbors:
+                if next not in distances:
+                    distances[next] = distance
+
+                    # Enemy pieces stop movement, so don't go any further past them
+                    if next not in enemy_coords:
+                        frontier.append(next)
+
+        return distances
+
+    # Return the tiles a piece at (gx, gy) could end its movement on, between min_range and max_range moves away.
+    # Doesn't include the starting tile.
+    def get_movable_tiles(self, gx, gy, movement_type, min_range, max_range, team, piece_type=None):
+        battle_map = self.get_manager(Manager.MAP)
+        return [tile for tile, distance in
+                self.get_reachable_tiles(gx, gy, movement_type, max_range, team, piece_type).items()
+                if distance >= min_range and tile != (gx, gy) and
+                battle_map.is_tile_passable(tile[0], tile[1], movement_type)]
+
+    # Work out where every unit can move at the start of the orders phase, so the movement UI opens instantly
+    def precompute_reachable_tiles(self, event):
+        for piece in self.piece_manager.__get_all_pieces__():
+            if piece.piece_subtype == PieceSubtype.UNIT:
+                self.get_reachable_tiles(piece.gx, piece.gy, piece.attr(Attribute.MOVEMENT_TYPE),
+                                         piece.get_movement_range(), piece.team, piece.piece_type)
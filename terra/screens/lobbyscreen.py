@@ -37,6 +37,9 @@ class LobbyScreen(GameScreen):
 
         self.lobby_menu = LobbyMenu(teams=self.teams, is_host=is_host)
 
+        # The map doesn't change while in the lobby, so only render its preview once
+        self.map_preview = draw_map_preview(menu_width - 24, 144, self.bitmap, self.pieces, self.team_data)
+
     def destroy(self):
         super().destroy()
 
@@ -60,8 +63,7 @@ class LobbyScreen(GameScreen):
         game_screen.blit(spr_title_text, (self.root_x - spr_title_text.get_width() // 2, 24))
 
         # Render a minimap preview of the current map
-        minimap = draw_map_preview(menu_width - 24, 144, self.bitmap, self.pieces, self.team_data)
-        game_screen.blit(minimap, (self.root_x - minimap.get_width() - 24, self.root_y))
+        game_screen.blit(self.map_preview, (self.root_x - self.map_preview.get_width() - 24, self.root_y))
 
         # Render the current lobby status-- open and filled teams for network games, human and AI teams for local
         if self.is_network_game():
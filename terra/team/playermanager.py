@@ -1,4 +1,5 @@
 from terra.ai.aiplayer import AIPlayer
+from terra.ai.planningscheduler import PlanningScheduler
 from terra.constants import RESOLUTION_WIDTH, RESOLUTION_HEIGHT
 from terra.engine.gameobject import GameObject
 from terra.event.event import publish_game_event, EventType
@@ -31,6 +32,9 @@ class PlayerManager(GameObject):
         for team in self.ai_teams:
             self.ais[team] = AIPlayer(team)
 
+        # Plans turns for all of the AI players at once
+        self.planning_scheduler = PlanningScheduler(self.ais)
+
         self.active_team = self.get_manager(Manager.NETWORK).team
 
     def destroy(self):
@@ -41,6 +45,8 @@ class PlayerManager(GameObject):
         for team, ai in self.ais.items():
             ai.destroy()
 
+        self.planning_scheduler.destroy()
+
     def register_handlers(self, event_bus):
         super().register_handlers(event_bus)
         event_bus.register_handler(EventType.E_TURN_SUBMITTED, self.pass_control_to_next_team_from_event)
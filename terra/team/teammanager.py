@@ -32,6 +32,8 @@ class TeamManager(GameObject):
         self.resources = {}
         self.owned_upgrades = {}
         self.piece_attributes = {}
+        # Incremented every time any team's piece attributes change (i.e. they buy an upgrade)
+        self.attribute_version = 0
 
         self.phase_bars = {}
         self.turn_submitted = {}
@@ -128,6 +130,10 @@ class TeamManager(GameObject):
     def serialize_upgrades(self):
         team_upgrade_strings = []
         for team in self.teams:
+            # Teams loaded without an upgrades line don't have an upgrade tree to save
+            if team not in self.owned_upgrades:
+                continue
+
             team_upgrades = str(team.name) + "|"
             for upgrade in self.owned_upgrades[team]:
                 team_upgrades += upgrade.name + " "
@@ -162,6 +168,8 @@ class TeamManager(GameObject):
 
     # Add an upgrade to a team, triggering any changes to the units + upgrade tree as necessary.
     def purchase_upgrade(self, team, upgrade_type):
+        self.attribute_version += 1
+
         # 1. Add the chosen upgrade to the team
         self.owned_upgrades[team].append(upgrade_type)
 
@@ -1,5 +1,3 @@
-from queue import PriorityQueue
-
 import pygame
 
 from terra.constants import GRID_WIDTH, GRID_HEIGHT
@@ -9,7 +7,6 @@ from terra.managers.session import Manager
 from terra.piece.attribute import Attribute
 from terra.piece.movementtype import MovementType
 from terra.piece.piecesubtype import PieceSubtype
-from terra.piece.piecetype import PieceType
 from terra.resources.assets import spr_tile_selectable
 
 
@@ -45,54 +42,14 @@ class TileSelection(GameObject):
         event_bus.register_handler(EventType.E_SELECT, self.confirm)
         event_bus.register_handler(EventType.E_CANCEL, self.cancel)
 
-    def __can_be_impeded__(self):
-        return self.piece_type and self.movement_type and not self.get_manager(Manager.TEAM).attr(self.team, self.piece_type, Attribute.IGNORE_IMPEDANCE)
-
-    # Use Dijkstra's algorithm to navigate the map for tile selection, with some rules caveats
-    # https://www.redblobgames.com/pathfinding/a-star/introduction.html
+    # Find the selectable tiles with the shared reachability service, which handles impedance and portals
     def __navigate__(self):
-        piece_manager = self.get_manager(Manager.PIECE)
-        battle_map = self.get_manager(Manager.MAP)
-
-        frontier = PriorityQueue()
-        frontier.put((self.gx, self.gy), 0)
-        cost_so_far = {(self.gx, self.gy): 0}
-        traversable = set()
         excluded_coordinates = self.__generate_excluded_coordinates__()
+        reachability = self.get_manager(Manager.PIECE).reachability
 
-        # If we have a piece with the 'PORTAL' attribute, we need to look out for potential portal tiles
-        portal_coords = self.__generate_portal_coordinates__()
-
-        while not frontier.empty():
-            current = frontier.get()
-            neighbors = battle_map.get_valid_adjacent_traversable_tiles(current[0], current[1], self.movement_type)
-
-            # If there's a friendly base on this tile, add any portal coords to the neighbors
-            if len(portal_coords) > 0 and len(piece_manager.get_pieces_at(current[0], current[1],
-                                                                          PieceType.BASE, self.team)) > 0:
-                neighbors.extend(portal_coords)
-
-            for next in neighbors:
-                new_cost = cost_so_far[current] + 1
-                if (next not in cost_so_far or new_cost < cost_so_far[next]) and new_cost <= self.max_range:
-                    cost_so_far[next] = new_cost
-                    traversable.add(next)
-
-                    # If there's an enemy on this tile, and we are susceptible to impedance, don't investigate past it
-                    if not (len(piece_manager.get_enemy_pieces_at(next[0], next[1], self.team)) > 0 and self.__can_be_impeded__()):
-                        frontier.put(next, new_cost)
-
-                    # If this tile is within our minimum range, add it to the exclusion list
-                    if new_cost < self.min_range:
-                        excluded_coordinates.add(next)
-
-        # Remove previously excluded coordinates from the list
-        traversable -= excluded_coordinates
-
-        # Remove tiles that are traversable but not passable
-        traversable = [tile for tile in traversable if battle_map.is_tile_passable(tile[0], tile[1], self.movement_type)]
-
-        return traversable
+        return [tile for tile in reachability.get_movable_tiles(self.gx, self.gy, self.movement_type, self.min_range,
+                                                                self.max_range, self.team, self.piece_type)
+                if tile not in excluded_coordinates]
 
     # Return the initial list of coordinates that cannot be selected
     def __generate_excluded_coordinates__(self):
@@ -119,13 +76,6 @@ class TileSelection(GameObject):
 
         return excluded_coordinates
 
-    # Return the list of coordinates where we have pieces with the 'PORTAL' attribute
-    def __generate_portal_coordinates__(self):
-        if self.movement_type and self.piece_type:
-            return [(piece.gx, piece.gy) for piece in self.get_manager(Manager.PIECE).get_all_pieces_with_attribute(self.team, Attribute.PORTAL)]
-        else:
-            return []
-
     def confirm(self, event):
         if (event.gx, event.gy) in self.coordinate_set and \
                 event.team == self.team and event.selecting_movement:
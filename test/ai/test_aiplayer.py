@@ -0,0 +1,130 @@
+import random
+import unittest
+from queue import Queue
+
+import pygame
+
+from terra.ai import aiplayer, planningworker
+from terra.ai.assignmentengine import AssignmentEngine
+from terra.ai.personality import PersonalityType, personality_method
+from terra.ai.planningworker import capture_planning_snapshot, plan_orders_from_snapshot, analyze_snapshot
+from terra.ai.task import Task, TaskType, Assignment
+from terra.managers.session import Session, SESSION, Manager
+from terra.piece.orders import MoveOrder
+from terra.piece.piecetype import PieceType
+from terra.resources.assets import load_assets
+from terra.team.team import Team
+
+
+class AIPlayerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+        load_assets()
+
+    # Pieces that would stop on a reserved tile should be moved somewhere nearby, instead of dropping the assignment
+    def test_repair_reserved_end_position(self):
+        Session.set_up_local_game("bristle_plains.map")
+        ai = SESSION.get(Manager.PLAYER).ais[Team.BLUE]
+        colonist = SESSION.get(Manager.PIECE).get_all_pieces_for_team(Team.BLUE, piece_type=PieceType.COLONIST)[0]
+        coord = (colonist.gx, colonist.gy)
+
+        ai.parse_board_state()
+        ai.reservations.reserve(coord)
+        task = Task(Team.BLUE, TaskType.MOVE_TO_RESOURCE, tx=coord[0], ty=coord[1])
+        assigned_pieces, _ = ai.confirm_assignments(AssignmentEngine([Assignment(colonist, task, 1)]))
+
+        self.assertIn(colonist, assigned_pieces)
+        self.assertIsInstance(colonist.current_order, MoveOrder)
+        destination = (colonist.current_order.dx, colonist.current_order.dy)
+        self.assertEqual(abs(destination[0] - coord[0]) + abs(destination[1] - coord[1]), 1)
+        self.assertIn(destination, ai.reservations)
+
+    # With a crowding penalty, attacking an enemy should score worse for each piece already confirmed to attack it
+    def test_rescore_crowded_attack(self):
+        Session.set_up_local_game("bristle_plains.map")
+        ai = SESSION.get(Manager.PLAYER).ais[Team.BLUE]
+        ai.parse_board_state()
+        enemy = SESSION.get(Manager.PIECE).get_all_pieces_for_team(Team.RED)[0]
+        task = Task(Team.BLUE, TaskType.ATTACK_ENEMY, tx=enemy.gx, ty=enemy.gy, target=enemy)
+
+        default_penalty = aiplayer.attacker_crowding_penalty
+        aiplayer.attacker_crowding_penalty = 2
+        try:
+            assignments = ai.assign_tasks([])
+            for piece in SESSION.get(Manager.PIECE).get_all_pieces_for_team(Team.BLUE)[:2]:
+                score, _ = task.score_piece_for_task(piece, ai.path_cache)
+                assignments.add(Assignment(piece, task, score))
+
+            assignments.confirm(assignments.pop_next())
+            second = assignments.pop_next()
+        finally:
+            aiplayer.attacker_crowding_penalty = default_penalty
+
+        score, _ = task.score_piece_for_task(second.piece, ai.path_cache)
+        self.assertEqual(second.value, score + 2)
+
+    # Planning from a snapshot of the game should return an order (or None) for each of the team's pieces
+    def test_plan_orders_from_snapshot(self):
+        Session.set_up_local_game("bristle_plains.map")
+        pieces = SESSION.get(Manager.PIECE).get_all_pieces_for_team(Team.BLUE)
+        expected = sorted((piece.gx, piece.gy, piece.piece_type.name) for piece in pieces)
+
+        personality = personality_method[PersonalityType.DEFAULT]()
+        orders, stats = plan_orders_from_snapshot(capture_planning_snapshot(), Team.BLUE, personality)
+
+        self.assertEqual(sorted((gx, gy, piece_type.name) for gx, gy, piece_type, _ in orders), expected)
+        self.assertTrue(any(order for _, _, _, order in orders))
+        self.assertFalse(stats['out_of_budget'])
+        self.assertEqual(stats['tasks_scored'], stats['tasks'])
+
+    # Running out of planning budget should still leave every piece with a valid order set
+    def test_plan_orders_out_of_budget(self):
+        Session.set_up_local_game("bristle_plains.map")
+        ai = SESSION.get(Manager.PLAYER).ais[Team.BLUE]
+        ai.personality.planning_budget = 0
+
+        ai.do_preplanning()
+        ai.plan_orders()
+
+        self.assertTrue(ai.planning_stats['out_of_budget'])
+        self.assertEqual(ai.planning_stats['tasks_scored'], 0)
+        self.assertEqual(ai.planning_stats['assignments_confirmed'], 0)
+        self.assertTrue(SESSION.get(Manager.PIECE).validate_orders(Team.BLUE))
+
+    # Partial orders should be a valid order set, and publishing them shouldn't change the orders planning ends up with
+    def test_partial_orders(self):
+        Session.set_up_local_game("bristle_plains.map")
+        snapshot = capture_planning_snapshot()
+        random.seed(0)
+        orders, _ = plan_orders_from_snapshot(snapshot, Team.BLUE, personality_method[PersonalityType.DEFAULT]())
+
+        planningworker.partial_orders_queue = Queue()
+        try:
+            random.seed(0)
+            personality = personality_method[PersonalityType.DEFAULT]()
+            published_orders, _ = plan_orders_from_snapshot(snapshot, Team.BLUE, personality, planning_id=1)
+            partial_orders = planningworker.collect_partial_orders()
+        finally:
+            planningworker.partial_orders_queue = None
+
+        self.assertEqual(published_orders, orders)
+        self.assertEqual(list(partial_orders), [(1, Team.BLUE)])
+
+        Session.set_up_local_game("bristle_plains.map")
+        SESSION.get(Manager.PLAYER).ais[Team.BLUE].apply_planned_orders(partial_orders[(1, Team.BLUE)])
+        self.assertTrue(SESSION.get(Manager.PIECE).validate_orders(Team.BLUE))
+
+    # Sharing board analysis between teams shouldn't change the orders each team plans
+    def test_plan_orders_with_shared_analysis(self):
+        Session.set_up_local_game("cross_strait.map")
+        snapshot = capture_planning_snapshot()
+        analysis, _ = analyze_snapshot(snapshot, [Team.RED, Team.BLUE])
+
+        for team in [Team.RED, Team.BLUE]:
+            random.seed(0)
+            orders, _ = plan_orders_from_snapshot(snapshot, team, personality_method[PersonalityType.DEFAULT]())
+            random.seed(0)
+            shared_orders, _ = plan_orders_from_snapshot(snapshot, team, personality_method[PersonalityType.DEFAULT](),
+                                                         analysis)
+            self.assertEqual(shared_orders, orders)
@@ -0,0 +1,75 @@
+import itertools
+import random
+import unittest
+
+from terra.ai.assignmentengine import AssignmentEngine, match_assignments, solve_min_cost_matching
+from terra.ai.task import Task, TaskType, Assignment
+from terra.team.team import Team
+
+
+class AssignmentEngineTest(unittest.TestCase):
+    def create_task(self, task_type=TaskType.HEAL_SELF):
+        return Task(Team.RED, task_type, tx=0, ty=0)
+
+    # Candidates should come out best first, skipping pieces and tasks that are already taken, and infeasible ones
+    def test_pop_next(self):
+        piece_a, piece_b, piece_c = "a", "b", "c"
+        task_x, task_y = self.create_task(), self.create_task()
+        attack = self.create_task(TaskType.ATTACK_ENEMY)
+        engine = AssignmentEngine([
+            Assignment(piece_a, task_x, 1),
+            Assignment(piece_b, task_x, 2),
+            Assignment(piece_a, task_y, 3),
+            Assignment(piece_b, attack, 4),
+            Assignment(piece_c, attack, 5),
+            Assignment(piece_c, task_y, 99999),
+        ])
+
+        popped = []
+        assignment = engine.pop_next()
+        while assignment:
+            popped.append((assignment.piece, assignment.value))
+            engine.confirm(assignment)
+            assignment = engine.pop_next()
+
+        self.assertEqual(popped, [("a", 1), ("b", 4), ("c", 5)])
+
+    # Stale candidates should be rescored before they're handed out, and give way to better candidates
+    def test_lazy_rescoring(self):
+        attack_x, attack_y = self.create_task(TaskType.ATTACK_ENEMY), self.create_task(TaskType.ATTACK_ENEMY)
+        engine = AssignmentEngine([
+            Assignment("a", attack_x, 1),
+            Assignment("b", attack_x, 2),
+            Assignment("b", attack_y, 3),
+        ], rescore=lambda assignment, assignees: assignment.value + 5 * assignees)
+
+        engine.confirm(engine.pop_next())
+        assignment = engine.pop_next()
+        self.assertEqual((assignment.piece, assignment.task), ("b", attack_y))
+
+    # The Hungarian algorithm should find the same total cost as trying every matching
+    def test_solve_min_cost_matching(self):
+        rng = random.Random(0)
+        for rows, columns in [(3, 3), (3, 5), (5, 5)]:
+            costs = [[rng.uniform(-10, 10) for _ in range(columns)] for _ in range(rows)]
+            matches = solve_min_cost_matching(costs)
+
+            self.assertEqual(len(set(matches)), rows)
+            best = min(sum(costs[row][column] for row, column in enumerate(permutation))
+                       for permutation in itertools.permutations(range(columns), rows))
+            self.assertAlmostEqual(sum(costs[row][column] for row, column in enumerate(matches)), best)
+
+    # Matching should respect each task's capacity, even where greedily picking the best pairs wouldn't
+    def test_match_assignments(self):
+        attack_x, attack_y = self.create_task(TaskType.ATTACK_ENEMY), self.create_task(TaskType.ATTACK_ENEMY)
+        assignments = [
+            Assignment("a", attack_x, 1),
+            Assignment("a", attack_y, 2),
+            Assignment("b", attack_x, 1),
+            Assignment("b", attack_y, 5),
+        ]
+
+        matched = match_assignments(assignments, 1)
+        self.assertEqual(sorted((assignment.piece, assignment.value) for assignment in matched), [("a", 2), ("b", 1)])
+        self.assertEqual(len(match_assignments(assignments, 2)), 2)
+        self.assertEqual(sum(assignment.value for assignment in match_assignments(assignments, 2)), 2)
@@ -0,0 +1,58 @@
+import unittest
+from random import Random
+
+import pygame
+
+from terra.ai.clustergraph import ClusterGraph
+from terra.ai.pathfinder import navigate_all, manhattan_distance
+from terra.map.mapmanager import MapManager
+from terra.map.maputils import generate_bitmap_from_simplex_noise
+from terra.map.tiletype import TileType
+from terra.piece.movementtype import MovementType
+
+
+class ClusterGraphTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+
+    # Assert that the graph finds a valid path between every pair of tiles that can reach each other, and no others
+    def assert_valid_paths(self, manager, graph, pairs):
+        for start, goal in pairs:
+            _, distance = navigate_all(goal, manager, MovementType.GROUND)
+            path = graph.get_path(start, goal)
+
+            if start not in distance:
+                self.assertIsNone(path)
+                continue
+
+            self.assertEqual(path[0], start)
+            self.assertEqual(path[-1], goal)
+            self.assertGreaterEqual(len(path) - 1, distance[start])
+            for current, next in zip(path, path[1:]):
+                self.assertEqual(manhattan_distance(current, next), 1)
+                self.assertTrue(manager.is_tile_passable(next[0], next[1], MovementType.GROUND))
+
+    def test_get_path(self):
+        manager = MapManager(generate_bitmap_from_simplex_noise(40, 30, seed=3))
+        graph = ClusterGraph(manager, MovementType.GROUND, cluster_size=8)
+
+        tiles = manager.find_tiles_by_type(TileType.GRASS)
+        rng = Random(1)
+        self.assert_valid_paths(manager, graph, [(rng.choice(tiles), rng.choice(tiles)) for _ in range(20)])
+
+    # Changed clusters should be rebuilt to match a graph built from scratch
+    def test_terrain_changed(self):
+        manager = MapManager(generate_bitmap_from_simplex_noise(40, 30, seed=3))
+        graph = ClusterGraph(manager, MovementType.GROUND, cluster_size=8)
+
+        rng = Random(2)
+        for _ in range(30):
+            manager.update_tile_type(rng.randrange(40), rng.randrange(30),
+                                     rng.choice([TileType.GRASS, TileType.SEA, TileType.MOUNTAIN]))
+        graph.update()
+
+        self.assertEqual(graph.edges, ClusterGraph(manager, MovementType.GROUND, cluster_size=8).edges)
+
+        tiles = manager.find_tiles_by_type(TileType.GRASS)
+        self.assert_valid_paths(manager, graph, [(rng.choice(tiles), rng.choice(tiles)) for _ in range(20)])
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+import pygame
+
+from terra.ai.distancefield import compute_distance_fields, compute_nearest_sources, compute_path_directions, \
+    FieldPaths, UNREACHABLE
+from terra.ai.pathfinder import navigate_all, reconstruct_breadth_first_path
+from terra.map.mapmanager import MapManager
+from terra.map.maputils import generate_bitmap_from_simplex_noise
+from terra.piece.movementtype import MovementType
+
+
+class DistanceFieldTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+
+    def setUp(self):
+        self.manager = MapManager(generate_bitmap_from_simplex_noise(30, 20, seed=5))
+        self.passable = self.manager.passable_masks[MovementType.GROUND]
+        self.sources = [(3, 4), (25, 15), (10, 10), (0, 0)]
+
+    # Each field should match navigating from its source with navigate_all
+    def test_distance_fields_match_navigate_all(self):
+        fields = compute_distance_fields(self.passable, self.sources)
+
+        for index, source in enumerate(self.sources):
+            _, expected = navigate_all(source, self.manager, MovementType.GROUND)
+            actual = {(x, y): int(fields[index, y, x]) for y, x in zip(*np.nonzero(fields[index] != UNREACHABLE))}
+            self.assertEqual(actual, expected)
+
+    # Following the field's paths should take the shortest route to the source
+    def test_field_paths(self):
+        fields = compute_distance_fields(self.passable, self.sources)
+        came_from = FieldPaths(compute_path_directions(fields[0]), 30, 20)
+
+        for y, x in zip(*np.nonzero(fields[0] != UNREACHABLE)):
+            path = reconstruct_breadth_first_path(self.sources[0], (x, y), came_from)
+            self.assertEqual(len(path) - 1, fields[0, y, x])
+        self.assertNotIn((-1, 0), came_from)
+
+    # Every tile should be labelled with its closest source
+    def test_nearest_sources(self):
+        fields = compute_distance_fields(self.passable, self.sources)
+        distances, labels = compute_nearest_sources(self.passable, self.sources)
+
+        reachable = fields.max(axis=0) != UNREACHABLE
+        nearest = np.where(fields == UNREACHABLE, 9999, fields).min(axis=0)
+        self.assertTrue(np.array_equal(distances[reachable], nearest[reachable]))
+        self.assertTrue(np.all(distances[~reachable] == UNREACHABLE))
+
+        for y, x in zip(*np.nonzero(reachable)):
+            self.assertEqual(fields[labels[y, x], y, x], distances[y, x])
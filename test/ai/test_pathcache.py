@@ -0,0 +1,120 @@
+import unittest
+
+import numpy as np
+import pygame
+
+from terra.ai.distancefield import compute_distance_fields, compute_path_directions, UNREACHABLE
+from terra.ai.pathcache import PathCache, CachedPaths
+from terra.ai.pathfinder import navigate_all, reconstruct_breadth_first_path
+from terra.map.mapmanager import MapManager
+from terra.map.tiletype import TileType
+from terra.piece.movementtype import MovementType
+
+
+# Piece manager for a board with no pieces on it
+class EmptyPieceManager:
+    def get_all_pieces_for_team(self, team):
+        return []
+
+    def get_all_enemy_pieces(self, team):
+        return []
+
+
+class PathCacheTest(unittest.TestCase):
+    bitmap = [
+        [2, 2, 2, 8, 2, 2],
+        [2, 1, 1, 8, 1, 2],
+        [2, 1, 2, 2, 1, 2],
+        [2, 8, 2, 1, 1, 2],
+        [2, 2, 2, 8, 2, 2],
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+
+    def setUp(self):
+        self.map_manager = MapManager(self.bitmap)
+        self.path_cache = PathCache(EmptyPieceManager(), self.map_manager, None)
+
+    def tearDown(self):
+        self.path_cache.destroy()
+
+    # Cached paths should follow the shortest route to the target
+    def test_cached_paths(self):
+        target = (0, 0)
+        self.assertIsNone(self.path_cache.get_map(target, MovementType.GROUND))
+        came_from = self.path_cache.cache_path(target, MovementType.GROUND)
+
+        _, expected_distance = navigate_all(target, self.map_manager, MovementType.GROUND)
+        for start, distance in expected_distance.items():
+            path = reconstruct_breadth_first_path(target, start, came_from)
+            self.assertEqual(len(path) - 1, distance)
+            self.assertEqual(self.path_cache.get_distance(target, MovementType.GROUND)[start[1], start[0]], distance)
+
+        self.assertEqual(self.path_cache.misses, 1)
+        self.assertEqual(self.path_cache.hits, len(expected_distance))
+
+    # Least recently used paths should be evicted once the cache is over budget
+    def test_eviction(self):
+        paths_size = 30 * 3
+        self.path_cache.memory_budget = paths_size * 2
+
+        self.path_cache.cache_path((0, 0), MovementType.GROUND)
+        self.path_cache.cache_path((5, 0), MovementType.GROUND)
+        self.path_cache.get_map((0, 0), MovementType.GROUND)
+        self.path_cache.cache_path((5, 4), MovementType.GROUND)
+
+        self.assertEqual(self.path_cache.evictions, 1)
+        self.assertIsNone(self.path_cache.get_map((5, 0), MovementType.GROUND))
+        self.assertIsNotNone(self.path_cache.get_map((0, 0), MovementType.GROUND))
+        self.assertEqual(self.path_cache.memory_used, paths_size * 2)
+
+    # Paths cached for several movement types should only count against the budget once
+    def test_shared_paths_memory(self):
+        paths_size = 30 * 3
+        self.path_cache.compute_paths([(0, 0)], [MovementType.GROUND, MovementType.HOVER])
+        self.assertEqual(self.path_cache.memory_used, paths_size)
+
+        # Replacing one movement type's paths leaves the other's in place
+        self.path_cache.cache_path((0, 0), MovementType.GROUND)
+        self.assertEqual(self.path_cache.memory_used, paths_size * 2)
+        self.path_cache.cache_path((0, 0), MovementType.HOVER)
+        self.assertEqual(self.path_cache.memory_used, paths_size * 2)
+
+    # Distances too long for 16 bits should be kept exactly
+    def test_long_distances(self):
+        paths = CachedPaths(np.array([[0, 1], [40000, UNREACHABLE]], dtype=np.int32))
+        self.assertEqual(int(paths.distances[1, 0]), 40000)
+        self.assertEqual(CachedPaths(np.array([[0, 1]], dtype=np.int32)).distances.dtype, np.int16)
+
+    # Notify the path cache that tiles have changed, like the map manager does
+    def change_tiles(self, *changes):
+        for x, y, tile_type in changes:
+            self.map_manager.update_tile_type(x, y, tile_type)
+            self.path_cache.handle_terrain_changed(pygame.event.Event(pygame.USEREVENT, {
+                'coords': [(x, y)],
+                'version': self.map_manager.terrain_version,
+            }))
+
+    # Terrain changes should keep unaffected paths, repair paths through opened tiles, and throw out paths through
+    # closed tiles
+    def test_terrain_changed(self):
+        target = (0, 0)
+        movement_types = [MovementType.GROUND, MovementType.FLYING]
+        for movement_type in movement_types:
+            self.path_cache.cache_path(target, movement_type)
+
+        # Opening tiles lowers distances through them, the same as computing the paths again
+        self.change_tiles((1, 1, TileType.GRASS), (3, 0, TileType.GRASS))
+        for movement_type in movement_types:
+            expected_distances = compute_distance_fields(self.map_manager.passable_masks[movement_type], [target])[0]
+            self.assertTrue((self.path_cache.get_distance(target, movement_type) == expected_distances).all())
+            self.assertEqual(self.path_cache.get_map(target, movement_type).directions,
+                             compute_path_directions(expected_distances))
+
+        # Closing a tile that paths went through throws those paths out. Flying paths can still go over the sea.
+        flying_distances = self.path_cache.get_distance(target, MovementType.FLYING)
+        self.change_tiles((0, 1, TileType.SEA))
+        self.assertIsNone(self.path_cache.get_map(target, MovementType.GROUND))
+        self.assertIs(self.path_cache.get_distance(target, MovementType.FLYING), flying_distances)
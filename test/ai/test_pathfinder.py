@@ -0,0 +1,95 @@
+import unittest
+from types import SimpleNamespace
+
+import pygame
+
+from terra.ai import pathfinder
+from terra.ai.pathfinder import navigate, navigate_all, navigate_to_nearest, reconstruct_path, get_hierarchical_path, \
+    manhattan_distance, unpack_path
+from terra.managers.session import Session, SESSION, Manager
+from terra.map.mapmanager import MapManager
+from terra.map.maputils import generate_bitmap_from_simplex_noise
+from terra.map.tiletype import TileType
+from terra.piece.movementtype import MovementType
+from terra.piece.piecetype import PieceType
+from terra.resources.assets import load_assets
+from terra.team.team import Team
+
+
+class PathfinderTest(unittest.TestCase):
+    bitmap = [
+        [2, 2, 2, 8, 2, 2],
+        [2, 1, 1, 8, 1, 2],
+        [2, 1, 2, 2, 1, 2],
+        [2, 8, 2, 1, 1, 2],
+        [2, 2, 2, 8, 2, 2],
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+
+    # A* should find shortest paths, without expanding the whole map to do it
+    def test_navigate_shortest_path(self):
+        manager = MapManager(generate_bitmap_from_simplex_noise(40, 40, seed=3))
+        goal = manager.find_tiles_by_type(TileType.GRASS)[0]
+        _, expected_distance = navigate_all(goal, manager, MovementType.GROUND)
+
+        for start in list(expected_distance)[::25]:
+            stats = {}
+            came_from, cost_so_far = navigate(start, goal, manager, movement_type=MovementType.GROUND, stats=stats)
+            path = reconstruct_path(start, goal, came_from)
+
+            self.assertEqual(len(path) - 1, expected_distance[start])
+            self.assertEqual(cost_so_far[goal], expected_distance[start])
+            self.assertLessEqual(stats['expanded'], len(expected_distance))
+
+    # Only the goals at the shortest distance should be returned, with a shortest path to each of them
+    def test_navigate_to_nearest(self):
+        manager = MapManager(self.bitmap)
+        goals = [(5, 0), (2, 2), (2, 0), (0, 2)]
+
+        came_from, distance, nearest = navigate_to_nearest((0, 0), goals, manager, MovementType.GROUND)
+        self.assertEqual(sorted(nearest), [(0, 2), (2, 0)])
+        self.assertEqual(reconstruct_path((0, 0), (2, 0), came_from), [(0, 0), (1, 0), (2, 0)])
+
+        _, _, nearest = navigate_to_nearest((0, 0), [(4, 2)], manager, MovementType.GROUND)
+        self.assertEqual(nearest, [])
+
+    # Hierarchical paths should stay off of tiles that would impede the piece, even when that's the long way round
+    def test_hierarchical_path_move_costs(self):
+        manager = MapManager([[2] * 40 for _ in range(30)])
+        impeded = [x == 20 and y != 25 for y in range(30) for x in range(40)]
+        cost_grid = SimpleNamespace(flat_penalties=[0] * len(impeded), flat_impeded=impeded)
+
+        path = unpack_path(get_hierarchical_path(manager.pack_coord(5, 5), manager.pack_coord(35, 5), manager,
+                                                 MovementType.GROUND, cost_grid), manager)
+        self.assertEqual(path[0], (5, 5))
+        self.assertEqual(path[-1], (35, 5))
+        self.assertIn((20, 25), path)
+        for current, next in zip(path, path[1:]):
+            self.assertEqual(manhattan_distance(current, next), 1)
+            self.assertFalse(impeded[manager.pack_coord(next[0], next[1])])
+
+    # Pathing to a target hierarchically should end up at the same destination as searching tile by tile
+    def test_hierarchical_path_to_target(self):
+        load_assets()
+        Session.set_up_local_game("cross_strait.map")
+        manager = SESSION.get(Manager.MAP)
+        ai = SESSION.get(Manager.PLAYER).ais[Team.BLUE]
+        ai.parse_board_state()
+        colonist = SESSION.get(Manager.PIECE).get_all_pieces_for_team(Team.BLUE, piece_type=PieceType.COLONIST)[0]
+        targets = manager.find_tiles_by_type(TileType.GRASS)[::7]
+
+        def get_destinations(path_cache):
+            return [(path or [None])[-1] for path in
+                    [colonist.get_path_to_target(target, path_cache, min_range=1, max_range=2) for target in targets]]
+
+        expected = get_destinations(None), get_destinations(ai.path_cache)
+        min_tiles = pathfinder.hierarchical_pathfinding_min_tiles
+        pathfinder.hierarchical_pathfinding_min_tiles = 1
+        try:
+            self.assertEqual((get_destinations(None), get_destinations(ai.path_cache)), expected)
+        finally:
+            pathfinder.hierarchical_pathfinding_min_tiles = min_tiles
+        self.assertTrue(any(expected[0]))
@@ -1,7 +1,16 @@
+import threading
 import unittest
 
+import pygame
+
+from terra.map.binarymap import BinaryMapReader, encode_binary_map, is_binary_map
+from terra.map.mapcatalog import MapCatalog
 from terra.map.mapmanager import *
+from terra.map.minimap import generate_minimap
 from terra.map.maputils import *
+from terra.piece.movementtype import MovementType
+from terra.resources.assets import spr_tiles_mini, team_color, clear_color
+from terra.team.team import Team
 
 
 class MapManagerTest(unittest.TestCase):
@@ -25,6 +34,11 @@ class MapManagerTest(unittest.TestCase):
         "BLUE 10 10 10"
     ]
 
+    # Terrain changes publish events, which needs pygame to be running
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+
     # Getting loadable maps should return a list of map file names
     def test_get_loadable_maps(self):
         maps = get_loadable_maps()
@@ -71,19 +85,35 @@ class MapManagerTest(unittest.TestCase):
                 if not column == 1:
                     self.fail("Wanted tile type 1, found {}".format(column))
 
-    # A MapManager should be able to convert a bitmap to a structure of Tile objects
+    # Simplex maps should be reproducible from their seed, and be of the provided width and height
+    def test_generate_bitmap_from_simplex_noise_seeded(self):
+        bitmap = generate_bitmap_from_simplex_noise(12, 9, seed=42)
+        self.assertEqual(len(bitmap), 9)
+        self.assertEqual(len(bitmap[0]), 12)
+        self.assertEqual(bitmap, generate_bitmap_from_simplex_noise(12, 9, seed=42))
+
+    # Mirrored simplex maps should be symmetrical
+    def test_generate_bitmap_from_simplex_noise_mirrored(self):
+        width, height = 11, 8
+        mirrored_x = generate_bitmap_from_simplex_noise(width, height, mirror_x=True, seed=7)
+        mirrored_y = generate_bitmap_from_simplex_noise(width, height, mirror_y=True, seed=7)
+        mirrored_xy = generate_bitmap_from_simplex_noise(width, height, mirror_x=True, mirror_y=True, seed=7)
+        for y in range(height):
+            for x in range(width):
+                self.assertEqual(mirrored_x[y][x], mirrored_x[y][width - 1 - x])
+                self.assertEqual(mirrored_y[y][x], mirrored_y[height - 1 - y][x])
+                self.assertEqual(mirrored_xy[y][x], mirrored_xy[height - 1 - y][width - 1 - x])
+
+    # A MapManager should be able to convert a bitmap to its grid of tiles
     def test_convert_grid_from_bitmap(self):
         bitmap, _, _ = load_map_from_file("test_map.map")
         manager = MapManager(bitmap)
 
-        y = 0
-        for row in manager.tile_grid:
-            x = 0
-            for column in row:
-                if not column.tile_type.value == self.expected_bitmap[y][x]:
-                    self.fail("Wanted tile type {}, found {}".format(column.tile_type, self.expected_bitmap[y][x]))
-                x += 1
-            y += 1
+        for y in range(manager.height):
+            for x in range(manager.width):
+                tile_type = manager.get_tile_type_at(x, y)
+                if not tile_type.value == self.expected_bitmap[y][x]:
+                    self.fail("Wanted tile type {}, found {}".format(tile_type, self.expected_bitmap[y][x]))
 
     # A MapManager should be able to serialize itself back into a bitmap for saving
     def test_convert_bitmap_from_grid(self):
@@ -101,3 +131,181 @@ class MapManagerTest(unittest.TestCase):
         self.assertEqual(manager.get_tile_at(1, 1).tile_type.value, 2)
         self.assertEqual(manager.get_tile_at(3, 2).tile_type.value, 3)
         self.assertEqual(manager.get_tile_at(4, 4).tile_type.value, 1)
+
+    # Range queries should return the same tiles, in the same order, as checking every tile on the map
+    def test_get_tiles_in_range(self):
+        manager = MapManager(self.expected_bitmap)
+
+        for movement_type in [None, MovementType.GROUND, MovementType.HEAVY, MovementType.HOVER]:
+            for include_traversable in [False, True]:
+                for min_range, max_range in [(0, 0), (1, 1), (0, 2), (2, 3), (1, 10)]:
+                    for cx, cy in [(0, 0), (2, 2), (4, 1), (-1, 2)]:
+                        expected = []
+                        for y in range(manager.height):
+                            for x in range(manager.width):
+                                in_range = min_range <= abs(cx - x) + abs(cy - y) <= max_range
+                                is_passable = not movement_type or manager.is_tile_passable(x, y, movement_type)
+                                is_traversable = include_traversable and \
+                                    (not movement_type or manager.is_tile_traversable(x, y, movement_type))
+                                if in_range and (is_passable or is_traversable):
+                                    expected.append((x, y))
+
+                        self.assertEqual(manager.get_tiles_in_range(cx, cy, min_range, max_range, movement_type,
+                                                                    include_traversable), expected)
+
+    # Passability masks should stay in sync with the terrain as tiles change
+    def test_movement_masks_follow_tile_updates(self):
+        manager = MapManager(self.expected_bitmap)
+        self.assertFalse(manager.is_tile_passable(0, 0, MovementType.GROUND))
+        self.assertTrue(manager.is_tile_traversable(0, 0, MovementType.HOVER))
+
+        manager.update_tile_type(0, 0, TileType.GRASS)
+        self.assertTrue(manager.is_tile_passable(0, 0, MovementType.GROUND))
+        self.assertFalse(manager.is_tile_traversable(0, 0, MovementType.HOVER))
+        self.assertEqual(manager.convert_bitmap_from_grid()[0][0], TileType.GRASS.value)
+        self.assertEqual(manager.find_tiles_by_type(TileType.GRASS)[0], (0, 0))
+
+    # Connected regions should merge as tiles are mined, and split as tiles close
+    def test_connected_components(self):
+        manager = MapManager([
+            [2, 2, 8, 2, 2],
+            [2, 2, 8, 2, 2],
+            [1, 1, 1, 1, 1],
+        ])
+        self.assertTrue(manager.are_tiles_connected((0, 0), (1, 1), MovementType.GROUND))
+        self.assertFalse(manager.are_tiles_connected((0, 0), (4, 0), MovementType.GROUND))
+        self.assertTrue(manager.are_tiles_connected((0, 0), (4, 0), MovementType.FLYING))
+
+        # Pieces standing on tiles they can't stop on can still step off them
+        self.assertTrue(manager.are_tiles_connected((2, 0), (4, 0), MovementType.GROUND))
+
+        manager.update_tile_type(2, 1, TileType.GRASS)
+        self.assertTrue(manager.are_tiles_connected((0, 0), (4, 0), MovementType.GROUND))
+
+        manager.update_tile_type(2, 1, TileType.SEA)
+        self.assertFalse(manager.are_tiles_connected((0, 0), (4, 0), MovementType.GROUND))
+
+    # Neighbor tables should match the adjacent tiles from the movement masks, including after the terrain changes
+    def test_neighbor_table(self):
+        manager = MapManager(self.expected_bitmap)
+        self.assertEqual(manager.coords[manager.pack_coord(3, 2)], (3, 2))
+        self.assertIsNone(manager.pack_coord(5, 0))
+
+        table = manager.get_neighbor_table(MovementType.HEAVY, include_traversable=True)
+        manager.update_tile_type(2, 2, TileType.SEA)
+        manager.update_tile_type(0, 1, TileType.GRASS)
+        for y in range(manager.height):
+            for x in range(manager.width):
+                expected = manager.__get_adjacent_tiles_from_masks__(x, y, MovementType.HEAVY, True)
+                self.assertEqual([manager.coords[index] for index in table[manager.pack_coord(x, y)]], expected)
+
+    # Cached coast indices should match a fresh calculation, including after the terrain changes
+    def test_coast_indices(self):
+        manager = MapManager(self.expected_bitmap)
+        self.assertEqual(manager.get_coast_index(0, 0), 2)
+        self.assertEqual(manager.get_coast_index(4, 4), 9)
+
+        manager.update_tile_type(3, 4, TileType.SEA)
+        manager.update_tile_type(1, 0, TileType.GRASS)
+        for y in range(manager.height):
+            for x in range(manager.width):
+                self.assertEqual(manager.get_coast_index(x, y), manager.calculate_coast_index(x, y))
+
+    # Draw every terrain chunk for the frame onto a single surface, the same way render does
+    def draw_terrain(self, manager, frame=0):
+        surface = pygame.Surface((manager.width * GRID_WIDTH, manager.height * GRID_HEIGHT), pygame.SRCALPHA, 32)
+        for chunk_y in range(manager.chunks_high):
+            for chunk_x in range(manager.chunks_wide):
+                surface.blit(manager.get_chunk_surface(chunk_x, chunk_y, frame),
+                             (chunk_x * TERRAIN_CHUNK_SIZE * GRID_WIDTH, chunk_y * TERRAIN_CHUNK_SIZE * GRID_HEIGHT))
+        return pygame.image.tostring(surface, "RGBA")
+
+    # Changing a tile should only re-render its chunk and the chunks of neighbors whose coastlines changed, and the
+    # result should match redrawing the whole map
+    def test_terrain_chunks(self):
+        size = TERRAIN_CHUNK_SIZE * 2
+        manager = MapManager([[TileType.SEA.value] * size] + [[TileType.GRASS.value] * size for _ in range(size - 1)])
+        self.draw_terrain(manager)
+        chunks = dict(manager.chunk_surfaces)
+        self.assertEqual(len(chunks), 4)
+
+        # The tile's right and bottom neighbors are across chunk boundaries
+        edge = TERRAIN_CHUNK_SIZE - 1
+        manager.update_tile_type(edge, edge, TileType.SEA)
+        dirty_chunks = {(0, 0), (1, 0), (0, 1)}
+        self.assertEqual(set(chunks) - set(manager.chunk_surfaces), dirty_chunks)
+
+        terrain = self.draw_terrain(manager)
+        for chunk, frames in chunks.items():
+            if chunk in dirty_chunks:
+                self.assertIsNot(manager.chunk_surfaces[chunk][0], frames[0])
+            else:
+                self.assertIs(manager.chunk_surfaces[chunk][0], frames[0])
+
+        manager.mark_all_chunks_dirty()
+        self.assertEqual(terrain, self.draw_terrain(manager))
+
+    # Maps encoded in the binary format should read back the same as the text format
+    def test_binary_map_round_trip(self):
+        upgrades = ["RED SPEED_1"]
+        meta = {"Turn": "3", "Phase": "ORDERS"}
+        data = encode_binary_map(self.expected_bitmap, self.expected_pieces, self.expected_teams, upgrades, meta)
+        self.assertTrue(is_binary_map(data))
+
+        reader = BinaryMapReader(data=data)
+        self.assertEqual(reader.get_size(), (5, 5))
+        self.assertEqual(reader.get_section(MapReadingStep.TEAMS), self.expected_teams)
+        self.assertEqual(list(reader.parsed_sections), [MapReadingStep.TEAMS])
+        self.assertEqual(reader.read_map(), (self.expected_bitmap, self.expected_pieces, self.expected_teams,
+                                             upgrades, meta))
+
+    # Catalog entries should summarize the map file, and be reused until the file changes
+    def test_map_catalog_entry(self):
+        catalog = MapCatalog()
+        mapname = get_loadable_maps()[0]
+        bitmap, pieces, teams, _, _ = load_map_from_file(mapname)
+
+        entry = catalog.get_entry(mapname)
+        self.assertEqual((entry.width, entry.height), (len(bitmap[0]), len(bitmap)))
+        self.assertEqual(entry.get_thumbnail().get_size(), (entry.width * 4, entry.height * 4))
+        self.assertEqual(sum(entry.piece_totals.values()), len(pieces))
+        self.assertEqual(len(entry.translated_teams), len(teams))
+
+        self.assertIs(catalog.get_entry(mapname), entry)
+
+        # Pretend the file was edited after the entry was built
+        entry.mtime -= 1
+        self.assertIsNot(catalog.get_entry(mapname), entry)
+
+    # A background refresh that fails should still let later refreshes start
+    def test_map_catalog_failed_refresh(self):
+        catalog = MapCatalog()
+
+        def fail_refresh():
+            raise TypeError("malformed map")
+        catalog.refresh = fail_refresh
+
+        threading.excepthook, excepthook = lambda args: None, threading.excepthook
+        try:
+            catalog.refresh_in_background()
+            thread = catalog.refresh_thread
+            if thread:
+                thread.join()
+        finally:
+            threading.excepthook = excepthook
+
+        self.assertIsNone(catalog.refresh_thread)
+
+    # Minimaps written from tile pixel data in one go should match blitting each mini tile sprite
+    def test_generate_minimap(self):
+        pieces = ["1 1 RED BASE", "3 3 BLUE BASE"]
+        expected = pygame.Surface((5 * 4, 5 * 4), pygame.SRCALPHA, 32)
+        for y, row in enumerate(self.expected_bitmap):
+            for x, tile_code in enumerate(row):
+                expected.blit(spr_tiles_mini[tile_code], (x * 4, y * 4))
+        for x, y, team in [(1, 1, Team.RED), (3, 3, Team.BLUE)]:
+            expected.fill(team_color[team], (x * 4 + 1, y * 4 + 1, 2, 2))
+            expected.fill(clear_color[team], (x * 4 + 1, y * 4 + 3, 2, 1))
+
+        minimap = generate_minimap(self.expected_bitmap, pieces)
+        self.assertEqual(pygame.image.tostring(minimap, "RGBA"), pygame.image.tostring(expected, "RGBA"))
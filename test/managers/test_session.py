@@ -1,9 +1,14 @@
 import unittest
+from os import remove
 
 import pygame
 from memory_profiler import profile
 
-from terra.managers.session import Session
+from terra.managers import session
+from terra.managers.session import Session, SESSION
+from terra.map.binarymap import is_binary_map
+from terra.mode import Mode
+from terra.resources.assetloading import AssetType
 from terra.resources.assets import load_assets
 
 
@@ -24,3 +29,26 @@ class SessionTest(unittest.TestCase):
             Session.set_up_local_game("bristle_plains.map")
 
         pass
+
+    # A game saved in the binary format should load back to the same game state
+    def test_binary_save_round_trip(self):
+        pygame.init()
+        load_assets()
+
+        SESSION.set_mode(Mode.BATTLE)
+        Session.set_up_local_game("bristle_plains.map")
+        expected = SESSION.serialize_game_state()
+
+        SESSION.map_name = "test-binary-save.map"
+        save_path = SESSION.get_save_path()
+        session.use_binary_saves, use_binary_saves = True, session.use_binary_saves
+        try:
+            SESSION.save_game_to_file()
+            with open(save_path, 'rb') as save_file:
+                self.assertTrue(is_binary_map(save_file.read()))
+
+            Session.set_up_local_game("test-binary-save.sav", AssetType.SAVE)
+            self.assertEqual(SESSION.serialize_game_state(), expected)
+        finally:
+            session.use_binary_saves = use_binary_saves
+            remove(save_path)
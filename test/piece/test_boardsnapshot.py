@@ -0,0 +1,61 @@
+import pickle
+import unittest
+
+import pygame
+
+from terra.managers.session import Session, SESSION, Manager
+from terra.map.tiletype import TileType
+from terra.piece.boardsnapshot import capture_board_snapshot
+from terra.piece.piecetype import PieceType
+from terra.resources.assets import load_assets
+from terra.team.team import Team
+
+
+class BoardSnapshotTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+        load_assets()
+
+    def setUp(self):
+        Session.set_up_local_game("bristle_plains.map")
+        self.piece_manager = SESSION.get(Manager.PIECE)
+        self.map_manager = SESSION.get(Manager.MAP)
+        self.team_manager = SESSION.get(Manager.TEAM)
+
+    def capture(self):
+        return capture_board_snapshot(self.piece_manager, self.map_manager, self.team_manager)
+
+    # Return the map, pieces, teams and upgrades of the current session
+    def serialize_board(self):
+        return SESSION.get(Manager.MAP).convert_bitmap_from_grid(), SESSION.get(Manager.PIECE).serialize_pieces(), \
+            SESSION.get(Manager.TEAM).serialize_teams(), SESSION.get(Manager.TEAM).serialize_upgrades()
+
+    # A planning session rebuilt from a pickled snapshot should match the game it was captured from, including
+    # partial HP
+    def test_planning_session_round_trip(self):
+        colonist = self.piece_manager.get_all_pieces_for_team(Team.RED, piece_type=PieceType.COLONIST)[0]
+        colonist.hp -= 0.5
+        x, y, hp = colonist.gx, colonist.gy, colonist.hp
+        expected_board = self.serialize_board()
+
+        board = pickle.loads(pickle.dumps(self.capture()))
+        self.assertEqual(len(board), len(self.piece_manager.__get_all_pieces__()))
+        Session.set_up_planning_session((SESSION.map_name, SESSION.current_mode, board))
+
+        self.assertEqual(self.serialize_board(), expected_board)
+        self.assertEqual(SESSION.get(Manager.PIECE).get_pieces_at(x, y, PieceType.COLONIST, Team.RED)[0].hp, hp)
+
+    # Changes to the live board after capturing shouldn't show up in the snapshot
+    def test_snapshot_is_unaffected_by_board_changes(self):
+        board = self.capture()
+        pieces = board.serialize_pieces()
+        bitmap = board.convert_bitmap_from_grid()
+
+        colonist = self.piece_manager.get_all_pieces_for_team(Team.RED, piece_type=PieceType.COLONIST)[0]
+        self.piece_manager.destroy_piece(colonist)
+        new_tile_type = TileType.SEA if bitmap[0][0] != TileType.SEA.value else TileType.GRASS
+        self.map_manager.update_tile_type(0, 0, new_tile_type)
+
+        self.assertEqual(board.serialize_pieces(), pieces)
+        self.assertEqual(board.convert_bitmap_from_grid(), bitmap)
@@ -0,0 +1,52 @@
+import unittest
+
+import pygame
+
+from terra.managers.session import Session, SESSION, Manager
+from terra.piece.attribute import Attribute
+from terra.piece.movecosts import ALLY_BUILDING_PENALTY
+from terra.piece.piece import Piece
+from terra.piece.piecetype import PieceType
+from terra.resources.assets import load_assets
+from terra.team.team import Team
+
+
+class MoveCostsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+        load_assets()
+
+    def test_move_score(self):
+        Session.set_up_local_game("bristle_plains.map")
+        piece_manager = SESSION.get(Manager.PIECE)
+        colonist = piece_manager.get_all_pieces_for_team(Team.RED, piece_type=PieceType.COLONIST)[0]
+        base = piece_manager.get_all_pieces_for_team(Team.RED, piece_type=PieceType.BASE)[0]
+        goal = (0, 0)
+
+        # Ally buildings are penalized on top of the distance to the goal. Blocked tiles aren't.
+        self.assertEqual(colonist.get_move_score(goal, (base.gx, base.gy), []),
+                         base.gx + base.gy + ALLY_BUILDING_PENALTY)
+        self.assertEqual(colonist.get_move_score(goal, (2, 2), [(2, 2)]), 4)
+
+        # Grids are rebuilt once pieces move, and enemies we can attack well are preferred
+        trooper = Piece(PieceType.TROOPER, Team.BLUE, 2, 2)
+        piece_manager.register_piece(trooper)
+        multiplier = colonist.attr(Attribute.ATTACK_MULTIPLIER)[trooper.piece_archetype] * \
+            colonist.attr(Attribute.ATTACK)
+        expected = 4 - multiplier if multiplier >= 1 else 4 + 2 * multiplier
+
+        self.assertAlmostEqual(colonist.get_move_score(goal, (2, 2), []), expected)
+        self.assertTrue(colonist.get_move_cost_grid().impeded[2, 2])
+
+    # Grids should be rebuilt once the team buys an upgrade, even if no pieces have moved
+    def test_upgrade_invalidates_grids(self):
+        Session.set_up_local_game("bristle_plains.map")
+        team_manager = SESSION.get(Manager.TEAM)
+        colonist = SESSION.get(Manager.PIECE).get_all_pieces_for_team(Team.RED, piece_type=PieceType.COLONIST)[0]
+        grid = colonist.get_move_cost_grid()
+        self.assertIs(colonist.get_move_cost_grid(), grid)
+
+        base = SESSION.get(Manager.PIECE).get_all_pieces_for_team(Team.RED, piece_type=PieceType.BASE)[0]
+        team_manager.purchase_upgrade(Team.RED, base.attr(Attribute.PURCHASEABLE_UPGRADES)[0])
+        self.assertIsNot(colonist.get_move_cost_grid(), grid)
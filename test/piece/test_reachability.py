@@ -0,0 +1,58 @@
+import unittest
+
+import pygame
+
+from terra.ai.pathfinder import navigate_all
+from terra.managers.session import Session, SESSION, Manager
+from terra.piece.attribute import Attribute
+from terra.piece.piece import Piece
+from terra.piece.piecetype import PieceType
+from terra.resources.assets import load_assets
+from terra.team.team import Team
+
+
+class ReachabilityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+        load_assets()
+
+    def setUp(self):
+        Session.set_up_local_game("bristle_plains.map")
+        self.piece_manager = SESSION.get(Manager.PIECE)
+        self.reachability = self.piece_manager.reachability
+        self.colonist = self.piece_manager.get_all_pieces_for_team(Team.RED, piece_type=PieceType.COLONIST)[0]
+
+    def get_reachable_tiles(self, piece, max_range):
+        return self.reachability.get_reachable_tiles(piece.gx, piece.gy, piece.attr(Attribute.MOVEMENT_TYPE),
+                                                     max_range, piece.team, piece.piece_type)
+
+    # With no enemies around, reachable tiles are every tile within range
+    def test_reachable_tiles(self):
+        reachable = self.get_reachable_tiles(self.colonist, 3)
+
+        _, distance = navigate_all((self.colonist.gx, self.colonist.gy), SESSION.get(Manager.MAP),
+                                   self.colonist.attr(Attribute.MOVEMENT_TYPE), max_distance=4)
+        self.assertEqual(reachable, distance)
+        self.assertIs(reachable, self.get_reachable_tiles(self.colonist, 3))
+
+    # Enemies can be moved onto, but not past
+    def test_impedance(self):
+        unimpeded = self.get_reachable_tiles(self.colonist, 3)
+
+        coord = (self.colonist.gx, self.colonist.gy - 1)
+        self.piece_manager.register_piece(Piece(PieceType.TROOPER, Team.BLUE, coord[0], coord[1]))
+        impeded = self.get_reachable_tiles(self.colonist, 3)
+
+        self.assertEqual(impeded[coord], 1)
+        self.assertLess(len(impeded), len(unimpeded))
+        for tile, distance in impeded.items():
+            self.assertGreaterEqual(distance, unimpeded[tile])
+
+    # Buying an upgrade should throw out memoized results, even if no pieces have moved
+    def test_upgrade_invalidates_results(self):
+        reachable = self.get_reachable_tiles(self.colonist, 3)
+
+        base = self.piece_manager.get_all_pieces_for_team(Team.RED, piece_type=PieceType.BASE)[0]
+        SESSION.get(Manager.TEAM).purchase_upgrade(Team.RED, base.attr(Attribute.PURCHASEABLE_UPGRADES)[0])
+        self.assertIsNot(self.get_reachable_tiles(self.colonist, 3), reachable)